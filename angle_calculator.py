@@ -1,5 +1,49 @@
+from collections import namedtuple
+
 import numpy as np
 
+# Offset/sign convention applied to the raw three-point angle of each joint,
+# i.e. reported angle = offset + sign * raw angle. These mirror the
+# conventions used by the calculate_*_angle functions below.
+JOINT_ANGLE_CONVENTIONS = {
+    "left_shoulder_flexion": (0.0, 1.0),
+    "right_shoulder_flexion": (0.0, 1.0),
+    "left_shoulder_abduction": (180.0, -1.0),
+    "right_shoulder_abduction": (180.0, -1.0),
+    "left_elbow": (180.0, -1.0),
+    "right_elbow": (180.0, -1.0),
+    "left_hip": (180.0, -1.0),
+    "right_hip": (180.0, -1.0),
+    "left_knee": (180.0, -1.0),
+    "right_knee": (180.0, -1.0),
+    "left_ankle": (-90.0, 1.0),
+    "right_ankle": (-90.0, 1.0),
+}
+
+# Anatomical plane each joint is measured in from 3D world landmarks (see
+# calculate_world_joint_angles): flexion/extension in the sagittal plane and
+# abduction/adduction in the frontal plane. Hinge joints not listed here
+# (elbow, knee, ankle) use the full 3D angle.
+JOINT_PLANES = {
+    "left_shoulder_flexion": "sagittal",
+    "right_shoulder_flexion": "sagittal",
+    "left_shoulder_abduction": "frontal",
+    "right_shoulder_abduction": "frontal",
+    "left_hip": "sagittal",
+    "right_hip": "sagittal",
+}
+PLANE_CODES = {None: 0, "sagittal": 1, "frontal": 2}
+# A limb vector that keeps less than this fraction of its length when projected
+# onto the joint's plane (e.g. an abducted arm seen in the sagittal plane) is
+# mostly depth noise, so the joint is not measured
+MIN_PROJECTED_FRACTION = 0.5
+
+# Compiled form of a joint -> landmark mapping used by calculate_joint_angles.
+# names: tuple of joint identifiers, indices: (J, 3) landmark indices
+# (first point, vertex, end point), offsets/signs: (J,) angle conventions,
+# planes: (J,) PLANE_CODES of the plane each joint is measured in from 3D.
+JointTable = namedtuple("JointTable", ["names", "indices", "offsets", "signs", "planes"])
+
 def calculate_angle(a, b, c):
     """
     Calculates the angle between three points (a, b, c), where b is the vertex.
@@ -134,4 +178,112 @@ def calculate_right_ankle_angle(landmarks):
     knee = [landmarks[25].x, landmarks[25].y]
     ankle = [landmarks[27].x, landmarks[27].y]
     foot_index = [landmarks[31].x, landmarks[31].y] # Right foot index
-    return calculate_angle(knee, ankle, foot_index) - 90
\ No newline at end of file
+    return calculate_angle(knee, ankle, foot_index) - 90
+
+def compile_joint_table(joint_landmark_map, joints=None):
+    """
+    Compiles a joint table for calculate_joint_angles from a mapping of joint
+    identifiers to their three landmark indices (first point, vertex, end point).
+    Only the joints listed in `joints` are included (all joints by default).
+    Joints without an entry in JOINT_ANGLE_CONVENTIONS report the raw angle.
+    """
+    if joints is None:
+        joints = joint_landmark_map.keys()
+    names = tuple(joint for joint in joints if joint in joint_landmark_map)
+    conventions = [JOINT_ANGLE_CONVENTIONS.get(joint, (0.0, 1.0)) for joint in names]
+
+    indices = np.array([joint_landmark_map[joint] for joint in names], dtype=np.intp).reshape(-1, 3)
+    offsets = np.array([offset for offset, _ in conventions], dtype=np.float64)
+    signs = np.array([sign for _, sign in conventions], dtype=np.float64)
+    planes = np.array([PLANE_CODES[JOINT_PLANES.get(joint)] for joint in names], dtype=np.intp)
+    return JointTable(names, indices, offsets, signs, planes)
+
+def landmarks_to_array(landmarks):
+    """
+    Converts a sequence of MediaPipe landmarks into an (N, 4) array
+    of x, y, z and visibility values.
+    """
+    return np.array([(lm.x, lm.y, lm.z, lm.visibility) for lm in landmarks], dtype=np.float64)
+
+def calculate_angles(a, b, c):
+    """
+    Vectorized version of calculate_angle. a, b and c are arrays of points
+    with the coordinates on the last axis; b holds the vertices.
+    Returns the angles in degrees with the coordinate axis removed.
+    """
+    ba = a - b
+    bc = c - b
+
+    dot_product = np.sum(ba * bc, axis=-1)
+    norms = np.linalg.norm(ba, axis=-1) * np.linalg.norm(bc, axis=-1)
+
+    # Degenerate (zero-length) vectors yield NaN, as in calculate_angle
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cosine_angle = np.clip(dot_product / norms, -1.0, 1.0)
+
+    return np.degrees(np.arccos(cosine_angle))
+
+def calculate_joint_angles(landmark_array, joint_table, visibility_threshold=0.7):
+    """
+    Calculates every joint angle in a compiled joint table in one vectorized pass.
+
+    landmark_array is a (33, 4) array from landmarks_to_array, or an (N, 33, 4)
+    stack of frames. Returns (angles, visible) with shape (J,) or (N, J), where
+    visible is True when all three landmarks of a joint reach the visibility
+    threshold.
+    """
+    landmark_array = np.asarray(landmark_array, dtype=np.float64)
+    points = landmark_array[..., joint_table.indices, :]  # (..., J, 3, 4)
+
+    raw = calculate_angles(points[..., 0, :2], points[..., 1, :2], points[..., 2, :2])
+    angles = joint_table.offsets + joint_table.signs * raw
+    visible = np.all(points[..., 3] >= visibility_threshold, axis=-1)
+    return angles, visible
+
+def body_frame(world_array):
+    """
+    Returns the unit normals of the body's sagittal plane (the left-right
+    axis through the shoulders and hips) and frontal plane (the front-back
+    axis) for a (33, >=3) world landmark array or an (N, 33, >=3) stack.
+    """
+    points = np.asarray(world_array, dtype=np.float64)[..., :3]
+    lateral = (points[..., 11, :] - points[..., 12, :]) + (points[..., 23, :] - points[..., 24, :])
+    up = (points[..., 11, :] + points[..., 12, :]) - (points[..., 23, :] + points[..., 24, :])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lateral = lateral / np.linalg.norm(lateral, axis=-1, keepdims=True)
+        forward = np.cross(lateral, up)
+        forward = forward / np.linalg.norm(forward, axis=-1, keepdims=True)
+    return lateral, forward
+
+def calculate_world_joint_angles(world_array, joint_table, visibility_threshold=0.7,
+                                 min_projected_fraction=MIN_PROJECTED_FRACTION):
+    """
+    3D counterpart of calculate_joint_angles for MediaPipe world landmarks
+    (metric x, y, z; landmarks_to_array of pose_world_landmarks).
+
+    The angle at each vertex is taken between the 3D limb vectors, so it does
+    not depend on how the limb is turned relative to the camera. Joints with
+    a plane in the joint table are measured after projecting both vectors
+    onto that plane of the body frame (see body_frame); a joint whose
+    projected vectors keep less than min_projected_fraction of their length
+    is reported as not visible. Returns (angles, visible) like
+    calculate_joint_angles.
+    """
+    world_array = np.asarray(world_array, dtype=np.float64)
+    points = world_array[..., joint_table.indices, :]  # (..., J, 3, 4)
+    ba = points[..., 0, :3] - points[..., 1, :3]
+    bc = points[..., 2, :3] - points[..., 1, :3]
+
+    # Plane normal of each joint, zero for the full 3D angle
+    lateral, forward = body_frame(world_array)
+    normals = np.stack([np.zeros_like(lateral), lateral, forward], axis=-2)[..., joint_table.planes, :]
+    lengths = np.linalg.norm(np.stack([ba, bc]), axis=-1)
+    ba = ba - np.sum(ba * normals, axis=-1, keepdims=True) * normals
+    bc = bc - np.sum(bc * normals, axis=-1, keepdims=True) * normals
+    projected = np.linalg.norm(np.stack([ba, bc]), axis=-1)
+
+    raw = calculate_angles(ba, np.zeros_like(ba), bc)
+    angles = joint_table.offsets + joint_table.signs * raw
+    visible = np.all(points[..., 3] >= visibility_threshold, axis=-1)
+    visible &= np.all(projected >= min_projected_fraction * lengths, axis=0)
+    return angles, visible
@@ -0,0 +1,147 @@
+import glob
+import logging
+import os
+import threading
+
+import numpy as np
+
+from joints import JOINT_TABLE
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_FRAMES = 900 # 30 seconds at 30 FPS
+DEFAULT_CHUNKS = 4 # Ring buffer capacity in chunks
+
+
+class AngleRecorder:
+    """
+    Records every frame's joint angles, validity mask and timestamp into a
+    preallocated NumPy ring buffer. A background thread writes each completed
+    chunk of chunk_frames frames to an .npz file, so record() never touches
+    the disk and memory stays bounded however long the session runs.
+    """
+
+    def __init__(self, output_dir, joints=JOINT_TABLE.names,
+                 chunk_frames=DEFAULT_CHUNK_FRAMES, chunks=DEFAULT_CHUNKS):
+        self.output_dir = output_dir
+        self.joints = tuple(joints)
+        self.chunk_frames = chunk_frames
+        self.capacity = chunk_frames * chunks
+
+        self._timestamps = np.zeros(self.capacity, dtype=np.float64)
+        self._angles = np.zeros((self.capacity, len(self.joints)), dtype=np.float32)
+        self._valid = np.zeros((self.capacity, len(self.joints)), dtype=bool)
+
+        self._written = 0 # Frames recorded so far
+        self._flushed = 0 # Frames written to disk so far
+        self.dropped = 0 # Frames lost because the flusher fell a whole ring behind
+        self.chunks_written = 0
+
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = None
+
+    def start(self):
+        """
+        Creates the output directory and starts the background flusher.
+        Raises FileExistsError if the directory already exists, so an earlier
+        recording's chunks are never overwritten or mixed into this one.
+        """
+        os.makedirs(self.output_dir)
+        self._thread = threading.Thread(target=self._flush_loop, name="angle-recorder", daemon=True)
+        self._thread.start()
+        return self
+
+    def record(self, timestamp, angles, valid):
+        """
+        Records one frame. angles and valid are (J,) arrays in joint order;
+        pass NaN angles and a False mask for frames without a pose.
+        """
+        if self._written - self._flushed >= self.capacity:
+            self.dropped += 1
+            return
+
+        i = self._written % self.capacity
+        self._timestamps[i] = timestamp
+        self._angles[i] = angles
+        self._valid[i] = valid
+        self._written += 1
+
+        if self._written % self.chunk_frames == 0:
+            with self._cond:
+                self._cond.notify()
+
+    def stop(self):
+        """Stops the flusher after writing all remaining frames, including a partial chunk."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        return {
+            "frames": self._written,
+            "flushed": self._flushed,
+            "dropped": self.dropped,
+            "chunks": self.chunks_written,
+            "output_dir": self.output_dir,
+        }
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                while self._written - self._flushed < self.chunk_frames and not self._stopping:
+                    self._cond.wait()
+                stopping = self._stopping
+
+            # Write every complete chunk, and the remainder once stopping
+            while self._written - self._flushed >= self.chunk_frames:
+                self._write_chunk(self.chunk_frames)
+            if stopping:
+                remaining = self._written - self._flushed
+                if remaining:
+                    self._write_chunk(remaining)
+                return
+
+    def _write_chunk(self, count):
+        # Chunks never wrap: the capacity is a whole number of chunks
+        start = self._flushed % self.capacity
+        end = start + count
+        path = os.path.join(self.output_dir, f"chunk_{self.chunks_written:05d}.npz")
+        try:
+            np.savez(path,
+                     timestamps=self._timestamps[start:end],
+                     angles=self._angles[start:end],
+                     valid=self._valid[start:end],
+                     joints=np.array(self.joints))
+        except OSError:
+            logger.exception("Could not write recording chunk %s", path)
+        self.chunks_written += 1
+        self._flushed += count
+
+
+def load_recording(output_dir):
+    """
+    Loads all chunks of a recording in order. Returns a dict with
+    "timestamps" (N,), "angles" (N, J), "valid" (N, J) and "joints".
+    """
+    timestamps, angles, valid = [], [], []
+    joints = ()
+    for path in sorted(glob.glob(os.path.join(output_dir, "chunk_*.npz"))):
+        with np.load(path) as chunk:
+            timestamps.append(chunk["timestamps"])
+            angles.append(chunk["angles"])
+            valid.append(chunk["valid"])
+            joints = tuple(chunk["joints"].tolist())
+
+    if not timestamps:
+        return {"timestamps": np.empty(0), "angles": np.empty((0, 0), dtype=np.float32),
+                "valid": np.empty((0, 0), dtype=bool), "joints": joints}
+    return {
+        "timestamps": np.concatenate(timestamps),
+        "angles": np.concatenate(angles),
+        "valid": np.concatenate(valid),
+        "joints": joints,
+    }
@@ -1,279 +1,757 @@
-from flask import Flask, render_template, Response, request, jsonify
-import cv2
-import csv
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from collections import namedtuple
 from datetime import datetime
+from functools import partial
 
-import cv2
-import mediapipe as mp
 import numpy as np
-import csv
-from datetime import datetime
-from flask import Flask, render_template, Response, request
-
-from pose_detector import PoseDetector
-from angle_calculator import (
-    calculate_left_shoulder_flexion_angle,
-    calculate_right_shoulder_flexion_angle,
-    calculate_left_shoulder_abduction_angle,
-    calculate_right_shoulder_abduction_angle,
-    calculate_left_elbow_angle,
-    calculate_right_elbow_angle,
-    calculate_left_hip_angle,
-    calculate_right_hip_angle,
-    calculate_left_knee_angle,
-    calculate_right_knee_angle,
-    calculate_left_ankle_angle,
-    calculate_right_ankle_angle
-)
+from flask import Flask, render_template, Response, request, jsonify
+
+from pose_detector import PoseDetector, TierController
+from camera_stream import CameraStream
+from frame_pipeline import InferenceScheduler
+from measurement_store import MeasurementStore
+from angle_recorder import AngleRecorder
+from snapshot_writer import SnapshotWriter
+from sessions import SessionManager
+from frame_encoder import AdaptiveController, FrameEncoder
+from angle_calculator import landmarks_to_array
+from landmark_filter import OneEuroFilter
+from metrics import PipelineMetrics, render_prometheus, start_periodic_log
+from overlay_renderer import CURRENT_LABEL_COLOR, MAX_LABEL_COLOR, OverlayRenderer
+from joints import ALL_JOINTS_PLAN, JOINT_LANDMARK_MAP, JOINT_TABLE, compile_joint_plan, measure_joint_angles
+
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
-# Define a mapping from joint identifiers to MediaPipe landmark indices
-# This map is used to determine which landmarks are associated with each joint
-# and will be crucial for conditional drawing and angle calculation.
-JOINT_LANDMARK_MAP = {
-    "left_shoulder_flexion": [mp.solutions.pose.PoseLandmark.LEFT_HIP.value, mp.solutions.pose.PoseLandmark.LEFT_SHOULDER.value, mp.solutions.pose.PoseLandmark.LEFT_ELBOW.value],
-    "right_shoulder_flexion": [mp.solutions.pose.PoseLandmark.RIGHT_HIP.value, mp.solutions.pose.PoseLandmark.RIGHT_SHOULDER.value, mp.solutions.pose.PoseLandmark.RIGHT_ELBOW.value],
-    "left_shoulder_abduction": [mp.solutions.pose.PoseLandmark.LEFT_EAR.value, mp.solutions.pose.PoseLandmark.LEFT_SHOULDER.value, mp.solutions.pose.PoseLandmark.LEFT_ELBOW.value],
-    "right_shoulder_abduction": [mp.solutions.pose.PoseLandmark.RIGHT_EAR.value, mp.solutions.pose.PoseLandmark.RIGHT_SHOULDER.value, mp.solutions.pose.PoseLandmark.RIGHT_ELBOW.value],
-    "left_elbow": [mp.solutions.pose.PoseLandmark.LEFT_SHOULDER.value, mp.solutions.pose.PoseLandmark.LEFT_ELBOW.value, mp.solutions.pose.PoseLandmark.LEFT_WRIST.value],
-    "right_elbow": [mp.solutions.pose.PoseLandmark.RIGHT_SHOULDER.value, mp.solutions.pose.PoseLandmark.RIGHT_ELBOW.value, mp.solutions.pose.PoseLandmark.RIGHT_WRIST.value],
-    "left_hip": [mp.solutions.pose.PoseLandmark.LEFT_SHOULDER.value, mp.solutions.pose.PoseLandmark.LEFT_HIP.value, mp.solutions.pose.PoseLandmark.LEFT_KNEE.value],
-    "right_hip": [mp.solutions.pose.PoseLandmark.RIGHT_SHOULDER.value, mp.solutions.pose.PoseLandmark.RIGHT_HIP.value, mp.solutions.pose.PoseLandmark.RIGHT_KNEE.value],
-    "left_knee": [mp.solutions.pose.PoseLandmark.LEFT_HIP.value, mp.solutions.pose.PoseLandmark.LEFT_KNEE.value, mp.solutions.pose.PoseLandmark.LEFT_ANKLE.value],
-    "right_knee": [mp.solutions.pose.PoseLandmark.RIGHT_HIP.value, mp.solutions.pose.PoseLandmark.RIGHT_KNEE.value, mp.solutions.pose.PoseLandmark.RIGHT_ANKLE.value],
-    "left_ankle": [mp.solutions.pose.PoseLandmark.LEFT_KNEE.value, mp.solutions.pose.PoseLandmark.LEFT_ANKLE.value, mp.solutions.pose.PoseLandmark.LEFT_FOOT_INDEX.value],
-    "right_ankle": [mp.solutions.pose.PoseLandmark.RIGHT_KNEE.value, mp.solutions.pose.PoseLandmark.RIGHT_ANKLE.value, mp.solutions.pose.PoseLandmark.RIGHT_FOOT_INDEX.value]
-}
-
-# Initialize PoseDetector
-detector = PoseDetector()
-
-# Global variables for video feed and angle tracking
-last_frame = None
-last_angles = {}
-max_angles = {} # Global dictionary to store max angles
-active_joints = list(JOINT_LANDMARK_MAP.keys()) # Initialize with all joints active
-
-# Constants
-VISIBILITY_THRESHOLD = 0.7
-VIEW_THRESHOLD = 0.1 # Threshold for determining frontal vs. sagittal body view (shoulder x-difference)
-
-# Function to check if all required landmarks are visible
-def are_landmarks_visible(landmarks, indices):
-    for index in indices:
-        if landmarks[index].visibility < VISIBILITY_THRESHOLD:
-            return False
-    return True
-
-def generate_frames():
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        print("Error: Could not open camera.")
+# Video stream encoding: widest frame sent, JPEG quality, and whether quality and
+# resolution adapt to the viewers' connection speed and the encode time
+STREAM_MAX_WIDTH = 960
+STREAM_JPEG_QUALITY = 80
+STREAM_ADAPTIVE = True
+STREAM_TARGET_FPS = 20
+
+# Pose inference: track the person with a cropped region of interest and cap the
+# size of the image handed to MediaPipe (None keeps the full camera resolution)
+INFERENCE_ROI_TRACKING = True
+INFERENCE_SIZE = 480
+
+# Pose model: complexity (0 lite, 1 full, 2 heavy) and confidence thresholds. With
+# POSE_AUTO_TIER, each camera uses the heaviest complexity whose inference time
+# still allows POSE_TARGET_FPS. All of these can be changed through /model_settings.
+POSE_MODEL_COMPLEXITY = 1
+POSE_DETECTION_CONFIDENCE = 0.5
+POSE_TRACKING_CONFIDENCE = 0.5
+POSE_AUTO_TIER = False
+POSE_TARGET_FPS = 15
+
+# Frame skipping: run inference on every INFERENCE_INTERVAL-th frame and extrapolate
+# landmarks in between; with a motion threshold, infer whenever the image changes
+INFERENCE_INTERVAL = 1
+INFERENCE_MOTION_THRESHOLD = None
+
+# Temporal smoothing of the landmarks before angles are calculated; rejects
+# single-frame detection spikes so they cannot inflate the max angles
+LANDMARK_SMOOTHING = True
+
+# Measure angles in 3D from MediaPipe's world landmarks, in the planes of the
+# body frame, instead of from image coordinates with a guessed camera view
+WORLD_LANDMARK_ANGLES = False
+
+# Hot-path stage timings and counters, served at /metrics; with a log interval
+# (seconds) a summary line per camera is also logged periodically
+METRICS_ENABLED = True
+METRICS_LOG_INTERVAL = None
+
+# Cameras opened by the app: camera ID -> OpenCV source (device index, video file
+# or stream URL). More can be added at runtime through /cameras.
+CAMERA_SOURCES = {"default": 0}
+DEFAULT_CAMERA = "default"
+
+# Load each camera's pose model in the background when the server starts (and
+# when a camera is added later), instead of on its first frame; /ready reports
+# when all models are loaded. Importing the app never loads a model.
+MODEL_WARMUP = True
+
+# Inference threads shared by all cameras; each camera has at most one frame
+# in flight, and cameras are served round-robin
+INFERENCE_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+scheduler = InferenceScheduler(INFERENCE_WORKERS)
+
+# Captured measurements are appended to a fixed-schema SQLite store (path can be
+# overridden with the MEASUREMENT_DB_PATH environment variable); the store and the
+# writer of captured images are only opened on first use
+MEASUREMENT_DB_PATH = os.environ.get("MEASUREMENT_DB_PATH", "measurements.db")
+SNAPSHOT_DIR = "static/images"
+measurement_store = None
+snapshot_writer = None
+store_lock = threading.Lock()
+
+def get_measurement_store():
+    """Opens the measurement store and starts the snapshot writer on first use."""
+    global measurement_store, snapshot_writer
+    with store_lock:
+        if measurement_store is None:
+            measurement_store = MeasurementStore(MEASUREMENT_DB_PATH)
+            snapshot_writer = SnapshotWriter(SNAPSHOT_DIR, measurement_store).start()
+    return measurement_store
+
+def get_snapshot_writer():
+    get_measurement_store()
+    return snapshot_writer
+
+# Burn angle labels into the video stream (the web UI renders them client-side)
+DRAW_SERVER_LABELS = False
+
+# Inference result of one frame, published with the encoded frame: the (33, 4)
+# smoothed landmark array (None without a pose) and per-joint (J,) angle,
+# validity and measured-in-this-view arrays
+FrameResult = namedtuple("FrameResult", ["landmarks", "angles", "valid", "measured", "timestamp"])
+
+# Assessment sessions not used for this long are closed
+SESSION_IDLE_TIMEOUT = 30 * 60
+DEFAULT_SESSION = "default" # Used by requests that do not give a session_id
+
+class Camera:
+    """
+    State kept per camera: its own pose detector (tracking state belongs to
+    one video stream), JPEG encoder, continuous recorder, the assessment
+    sessions measuring on it and the shared producer that
+    /video_feed/<camera_id> viewers subscribe to.
+    """
+
+    def __init__(self, camera_id, source):
+        self.camera_id = camera_id
+        self.source = source
+        self.detector = PoseDetector(complexity=POSE_MODEL_COMPLEXITY, detection_con=POSE_DETECTION_CONFIDENCE,
+                                     track_con=POSE_TRACKING_CONFIDENCE,
+                                     roi_tracking=INFERENCE_ROI_TRACKING, inference_size=INFERENCE_SIZE,
+                                     inference_interval=INFERENCE_INTERVAL,
+                                     motion_threshold=INFERENCE_MOTION_THRESHOLD,
+                                     tier_controller=TierController(POSE_TARGET_FPS) if POSE_AUTO_TIER else None)
+        self.encoder = FrameEncoder(STREAM_MAX_WIDTH, STREAM_JPEG_QUALITY,
+                                    controller=(AdaptiveController(STREAM_TARGET_FPS, max_quality=STREAM_JPEG_QUALITY)
+                                                if STREAM_ADAPTIVE else None))
+        self.landmark_filter = OneEuroFilter() if LANDMARK_SMOOTHING else None
+        self.world_filter = OneEuroFilter(world=True) if LANDMARK_SMOOTHING and WORLD_LANDMARK_ANGLES else None
+        self.metrics = PipelineMetrics() if METRICS_ENABLED else None
+        self.renderer = OverlayRenderer() # Used by the camera's encode thread only
+        # Replaced as a whole when sessions change, so the inference thread
+        # reads them without locking
+        self.sessions = ()
+        self.draw_plan = ALL_JOINTS_PLAN
+        self.recorder = None # AngleRecorder while continuous recording is on
+        self.stream = CameraStream(source, partial(process_frame, self), partial(render_frame, self),
+                                   on_delivery=self.encoder.report_delivery, scheduler=scheduler)
+
+    def info(self):
+        return {"camera_id": self.camera_id, "source": self.source,
+                "subscribers": self.stream.subscribers, "recording": self.recorder is not None}
+
+cameras = {} # camera ID -> Camera
+cameras_lock = threading.Lock()
+
+def add_camera(camera_id, source):
+    """Registers a camera; it is opened when its first viewer connects."""
+    with cameras_lock:
+        if camera_id in cameras:
+            raise ValueError(f"Camera {camera_id!r} already exists")
+        camera = cameras[camera_id] = Camera(camera_id, source)
+    if MODEL_WARMUP and warmup_started:
+        start_warm_up(camera)
+    return camera
+
+warmup_started = False # Set by start_model_warmup() when the server starts
+
+def start_model_warmup():
+    """Starts loading the pose model of every camera, and of cameras added later."""
+    global warmup_started
+    warmup_started = True
+    if MODEL_WARMUP:
+        with cameras_lock:
+            pending = list(cameras.values())
+        for camera in pending:
+            start_warm_up(camera)
+
+def start_warm_up(camera):
+    threading.Thread(target=warm_up, args=(camera,), name=f"warmup-{camera.camera_id}", daemon=True).start()
+
+def warm_up(camera):
+    try:
+        camera.detector.load()
+    except Exception:
+        # The first frame retries the load
+        logger.exception("Could not load the pose model of camera %s", camera.camera_id)
+
+def remove_camera(camera_id):
+    """Unregisters a camera, stopping its stream and recording."""
+    with cameras_lock:
+        camera = cameras.pop(camera_id, None)
+    if camera is not None:
+        for session in camera.sessions:
+            session_manager.close(session.session_id)
+        camera.stream.stop()
+        if camera.recorder is not None:
+            camera.recorder.stop()
+    return camera
+
+def camera_not_found(camera_id):
+    return jsonify({"status": "error", "message": f"Unknown camera {camera_id!r}."}), 404
+
+def refresh_camera_sessions(camera_id):
+    """
+    Updates which sessions a camera feeds and recompiles the plan of the
+    joints it draws (those active in any of its sessions, or all joints
+    when it has none). The pinned default session is only drawn while no
+    other session is open on the camera, so it does not keep every joint
+    on screen once a page has opened its own session.
+    """
+    camera = cameras.get(camera_id)
+    if camera is None:
         return
-
-    global last_frame, last_angles, max_angles
-
-    while True:
-        success, frame = cap.read()
-        if not success:
-            break
-
-        # Find pose and draw landmarks, conditionally based on active_joints
-        frame = detector.find_pose(frame, active_joints, JOINT_LANDMARK_MAP)
-        landmarks = detector.results.pose_landmarks
-
-        current_angles = {}
-        if landmarks and len(landmarks.landmark) > 30: # Ensure all necessary landmarks are present
-            # Determine view (frontal or sagittal)
-            left_shoulder_x = landmarks.landmark[12].x
-            right_shoulder_x = landmarks.landmark[11].x
-            
-            # Calculate the absolute difference in x-coordinates of shoulders
-            shoulder_x_diff = abs(left_shoulder_x - right_shoulder_x)
-
-            is_frontal_view = shoulder_x_diff > VIEW_THRESHOLD
-
-            # Shoulder Flexion/Abduction (Conditional based on view)
-            if not is_frontal_view: # If not frontal, it's sagittal
-                # Display Flexion/Extension in sagittal view
-                if "right_shoulder_flexion" in active_joints and are_landmarks_visible(landmarks.landmark, [23, 11, 13]): # Anatomical RIGHT landmarks
-                    current_angles["right_shoulder_flexion"] = calculate_right_shoulder_flexion_angle(landmarks.landmark) # Assign to internal 'left' for display as 'Right'
-                else:
-                    current_angles["right_shoulder_flexion"] = None
-
-                if "left_shoulder_flexion" in active_joints and are_landmarks_visible(landmarks.landmark, [24, 12, 14]): # Anatomical LEFT landmarks
-                    current_angles["left_shoulder_flexion"] = calculate_left_shoulder_flexion_angle(landmarks.landmark) # Assign to internal 'right' for display as 'Left'
-                else:
-                    current_angles["left_shoulder_flexion"] = None
-            else: # If frontal
-                # Display Abduction/Adduction in frontal view
-                if "left_shoulder_abduction" in active_joints and are_landmarks_visible(landmarks.landmark, [8, 12, 14]): # Ear, Shoulder, Elbow
-                    current_angles["left_shoulder_abduction"] = calculate_left_shoulder_abduction_angle(landmarks.landmark)
-                else:
-                    current_angles["left_shoulder_abduction"] = None
-
-                if "right_shoulder_abduction" in active_joints and are_landmarks_visible(landmarks.landmark, [7, 11, 13]): # Ear, Shoulder, Elbow
-                    current_angles["right_shoulder_abduction"] = calculate_right_shoulder_abduction_angle(landmarks.landmark)
-                else:
-                    current_angles["right_shoulder_abduction"] = None
-
-            # Elbow (Left)
-            if "left_elbow" in active_joints and are_landmarks_visible(landmarks.landmark, [12, 14, 16]):
-                current_angles["left_elbow"] = calculate_left_elbow_angle(landmarks.landmark)
-                if current_angles["left_elbow"] > 155:
-                    current_angles["left_elbow"] = None
-            else:
-                current_angles["left_elbow"] = None
-
-            # Elbow (Right)
-            if "right_elbow" in active_joints and are_landmarks_visible(landmarks.landmark, [11, 13, 15]):
-                current_angles["right_elbow"] = calculate_right_elbow_angle(landmarks.landmark)
-                if current_angles["right_elbow"] > 155:
-                    current_angles["right_elbow"] = None
-            else:
-                current_angles["right_elbow"] = None
-
-            # Hip (Left) - Anatomical Left (appears on right of mirrored screen)
-            if "left_hip" in active_joints and are_landmarks_visible(landmarks.landmark, [12, 24, 26]): # Shoulder, Hip, Knee
-                current_angles["right_hip"] = calculate_left_hip_angle(landmarks.landmark) # Assign to 'right_hip' for display as 'Left Hip'
-            else:
-                current_angles["right_hip"] = None
-
-            # Hip (Right) - Anatomical Right (appears on left of mirrored screen)
-            if "right_hip" in active_joints and are_landmarks_visible(landmarks.landmark, [11, 23, 25]): # Shoulder, Hip, Knee
-                current_angles["left_hip"] = calculate_right_hip_angle(landmarks.landmark) # Assign to 'left_hip' for display as 'Right Hip'
-            else:
-                current_angles["left_hip"] = None
-
-            # Knee (Left) - Anatomical Left (appears on right of mirrored screen)
-            if "left_knee" in active_joints and are_landmarks_visible(landmarks.landmark, [24, 26, 28]): # Hip, Knee, Ankle
-                current_angles["right_knee"] = calculate_left_knee_angle(landmarks.landmark) # Assign to 'right_knee' for display as 'Left Knee'
-            else:
-                current_angles["right_knee"] = None
-
-            # Knee (Right) - Anatomical Right (appears on left of mirrored screen)
-            if "right_knee" in active_joints and are_landmarks_visible(landmarks.landmark, [23, 25, 27]): # Hip, Knee, Ankle
-                current_angles["left_knee"] = calculate_right_knee_angle(landmarks.landmark) # Assign to 'left_knee' for display as 'Right Knee'
-            else:
-                current_angles["left_knee"] = None
-
-            # Ankle (Left) - Anatomical Left (appears on right of mirrored screen)
-            if "left_ankle" in active_joints and are_landmarks_visible(landmarks.landmark, [26, 28, 30]): # Knee, Ankle, Heel
-                current_angles["right_ankle"] = calculate_left_ankle_angle(landmarks.landmark) # Assign to 'right_ankle' for display as 'Left Ankle'
-            else:
-                current_angles["right_ankle"] = None
-
-            # Ankle (Right) - Anatomical Right (appears on left of mirrored screen)
-            if "right_ankle" in active_joints and are_landmarks_visible(landmarks.landmark, [25, 27, 29]): # Knee, Ankle, Heel
-                current_angles["left_ankle"] = calculate_right_ankle_angle(landmarks.landmark) # Assign to 'left_ankle' for display as 'Right Ankle'
-            else:
-                current_angles["left_ankle"] = None
-
-            # Update max angles
-            for joint, angle in current_angles.items():
-                if angle is not None:
-                    if joint not in max_angles or angle > max_angles[joint]:
-                        max_angles[joint] = angle
-
-            # Display angles on the frame
-            y_offset = 30
-            for joint in active_joints:
-                display_joint_name = joint.replace("left_", "Left ").replace("right_", "Right ").replace("_flexion", " Flexion").replace("_abduction", " Abduction").title()
-                
-                # Display current angle in white if available
-                if current_angles.get(joint) is not None:
-                    cv2.putText(frame, f"{display_joint_name}: {int(current_angles[joint])}", 
-                                (10, y_offset), 
-                                cv2.FONT_HERSHEY_SIMPLEX, 1.5, (255, 255, 255), 3, cv2.LINE_AA)
-                    y_offset += 40
-                
-                # Display max angle in green if available
-                if joint in max_angles:
-                    cv2.putText(frame, f"Max {display_joint_name}: {int(max_angles[joint])}", 
-                                (10, y_offset), 
-                                cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 255, 0), 3, cv2.LINE_AA) # Green color
-                    y_offset += 40
-
-        # Store the last processed frame and angles
-        last_frame = frame.copy()
-        last_angles = current_angles
-
-        # Encode the frame in JPEG format
-        ret, buffer = cv2.imencode('.jpg', frame)
-        frame = buffer.tobytes()
-
-        # Yield the frame in the response
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-
-    cap.release()
+    attached = tuple(session for session in session_manager.sessions() if session.camera_id == camera_id)
+    shown = [session for session in attached if session.session_id != DEFAULT_SESSION] or attached
+    drawn = set(JOINT_TABLE.names)
+    if shown:
+        drawn = set().union(*(session.active_joints for session in shown))
+    camera.sessions = attached
+    camera.draw_plan = compile_joint_plan(drawn)
+
+def close_session(session):
+    session.closed = True
+    refresh_camera_sessions(session.camera_id)
+
+# Every assessment (patient) has its own active joints, max/min angles and captures
+session_manager = SessionManager(SESSION_IDLE_TIMEOUT, on_close=close_session)
+
+def session_not_found(session_id):
+    return jsonify({"status": "error", "message": f"Unknown session {session_id!r}."}), 404
+
+def invalid_setting(message):
+    return jsonify({"status": "error", "message": message}), 400
+
+def is_integer(value):
+    # JSON true/false would otherwise pass as 1/0
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def process_frame(camera, frame):
+    """
+    Inference stage: runs the camera's pose detection on a frame, calculates
+    every joint angle and folds them into the max/min of the camera's sessions.
+    """
+    # Stages are only timed when metrics are enabled
+    metrics = camera.metrics
+    if metrics is not None:
+        start = time.perf_counter()
+
+    # Find pose without drawing; the encode stage draws the overlay
+    camera.detector.process(frame)
+    landmarks = camera.detector.results.pose_landmarks
+    if metrics is not None:
+        start = metrics.lap("pose", start)
+
+    if landmarks and len(landmarks.landmark) > 30: # Ensure all necessary landmarks are present
+        landmark_array = landmarks_to_array(landmarks.landmark)
+        world_array = None
+        world_landmarks = getattr(camera.detector.results, "pose_world_landmarks", None)
+        if WORLD_LANDMARK_ANGLES and world_landmarks:
+            world_array = landmarks_to_array(world_landmarks.landmark)
+        # Max tracking only ever sees smoothed, spike-free landmarks
+        if camera.landmark_filter is not None:
+            now = time.perf_counter()
+            landmark_array = camera.landmark_filter.filter(landmark_array, now)
+            if world_array is not None:
+                world_array = camera.world_filter.filter(world_array, now)
+            if metrics is not None:
+                start = metrics.lap("filter", start)
+
+        # Calculate every joint angle and its landmark visibility in one pass;
+        # each session picks its own active joints
+        angles, valid, measured = measure_joint_angles(landmark_array, world_array=world_array)
+        if metrics is not None:
+            metrics.lap("angles", start)
+        # The filter reuses its output array, so publish a copy
+        landmarks = np.array(landmark_array)
+    else:
+        landmarks = None
+        if camera.landmark_filter is not None:
+            camera.landmark_filter.reset()
+        if camera.world_filter is not None:
+            camera.world_filter.reset()
+        angles = np.full(len(JOINT_TABLE.names), np.nan)
+        valid = np.zeros(len(JOINT_TABLE.names), dtype=bool)
+        measured = valid
+
+    if metrics is not None:
+        metrics.count_frame(landmarks is not None, measured & ~valid)
+
+    # Update each session's max/min angles
+    for session in camera.sessions:
+        session.update(angles, valid)
+
+    # Continuous recording keeps every frame; the recorder never does file I/O here
+    active_recorder = camera.recorder
+    if active_recorder is not None:
+        active_recorder.record(time.time(), angles, valid)
+
+    return FrameResult(landmarks, angles, valid, measured, time.time())
+
+def current_angles(session, result):
+    """
+    Returns {joint: angle} for the session's active joints measured in the
+    frame's view, with None for joints whose landmarks are not visible.
+    """
+    plan = session.plan
+    return {joint: float(result.angles[i]) if result.valid[i] else None
+            for joint, i in zip(plan.names, plan.indices) if result.measured[i]}
+
+def angle_payload(session, result):
+    """
+    Builds the compact JSON pushed to /angles subscribers: one
+    [joint, angle, max angle] entry per active joint of the session, in
+    display order, with null for angles that are not currently visible.
+    Non-finite angles are sent as null too, since NaN is not valid JSON.
+    """
+    plan = session.plan
+    joints = []
+    for joint, i in zip(plan.names, plan.indices):
+        angle = result.angles[i]
+        max_angle = session.max_angles[i]
+        joints.append([joint,
+                       round(float(angle), 1) if result.valid[i] and np.isfinite(angle) else None,
+                       round(float(max_angle), 1) if np.isfinite(max_angle) else None])
+    return json.dumps({"time": round(result.timestamp, 3), "pose": result.landmarks is not None,
+                       "joints": joints}, separators=(',', ':'), allow_nan=False)
+
+def angle_labels(session, result):
+    """
+    Returns the current and max angle labels of the session's active joints
+    for OverlayRenderer.draw_labels. Each joint has fixed label rows in the
+    plan's layout, so the renderer can cache the glyphs.
+    """
+    plan = session.plan
+    max_angles = session.max_angles
+    labels = []
+    for i, (current_label, max_label), (current_origin, max_origin) in zip(
+            plan.indices, plan.labels, plan.label_origins):
+        current = result.angles[i] if result.measured[i] and result.valid[i] else None
+        max_angle = None if np.isnan(max_angles[i]) else max_angles[i]
+        labels.append((current_label, current, current_origin, CURRENT_LABEL_COLOR))
+        labels.append((max_label, max_angle, max_origin, MAX_LABEL_COLOR))
+    return labels
+
+def render_frame(camera, frame, result):
+    """
+    Annotate/encode stage: draws the skeleton (and, if enabled, the angle
+    labels) onto the frame and encodes it as a multipart JPEG chunk.
+    """
+    metrics = camera.metrics
+    if metrics is not None:
+        start = time.perf_counter()
+
+    landmarks = result.landmarks
+    if landmarks is not None:
+        camera.renderer.draw_skeleton(frame, landmarks, camera.draw_plan)
+    if metrics is not None:
+        start = metrics.lap("overlay", start)
+
+    # The browser draws the labels from /angles; burning them in is only needed
+    # for clients that watch the bare MJPEG stream (labels follow the camera's first session)
+    if landmarks is not None and DRAW_SERVER_LABELS and camera.sessions:
+        camera.renderer.draw_labels(frame, angle_labels(camera.sessions[0], result))
+        if metrics is not None:
+            start = metrics.lap("labels", start)
+
+    # Encode the frame in JPEG format (scaled, quality-controlled, None if unchanged)
+    data = camera.encoder.encode(frame)
+    if metrics is not None:
+        metrics.lap("jpeg", start)
+        metrics.count_encoded(data)
+
+    # The published frame is shared with captures by reference instead of
+    # being copied every frame, so freeze it against later modification
+    frame.flags.writeable = False
+
+    if data is None:
+        return None
+    return (b'--frame\r\n'
+            b'Content-Type: image/jpeg\r\n\r\n' + data + b'\r\n')
+
+# One shared capture/inference/encode producer per camera; every
+# /video_feed/<camera_id> viewer subscribes to it instead of opening the camera again
+for camera_id, source in CAMERA_SOURCES.items():
+    add_camera(camera_id, source)
+session_manager.create(DEFAULT_CAMERA, session_id=DEFAULT_SESSION, pinned=True)
+refresh_camera_sessions(DEFAULT_CAMERA)
+
+if METRICS_ENABLED and METRICS_LOG_INTERVAL:
+    start_periodic_log(METRICS_LOG_INTERVAL,
+                       lambda: {camera.camera_id: camera.metrics.summary() for camera in list(cameras.values())})
+
+def generate_frames(camera):
+    # Yield each new frame in the response; slow viewers skip frames
+    yield from camera.stream.subscribe()
 
 @app.route('/')
 def index():
     """Main route that renders the index.html template."""
     return render_template('index.html')
 
+@app.route('/ready')
+def ready():
+    """
+    Reports whether every camera's pose model is loaded, with status 503
+    while any is still loading.
+    """
+    with cameras_lock:
+        loaded = {camera.camera_id: camera.detector.ready for camera in cameras.values()}
+    is_ready = all(loaded.values())
+    return jsonify({"ready": is_ready, "cameras": loaded}), 200 if is_ready else 503
+
 @app.route('/get_all_joints')
 def get_all_joints():
     return jsonify(list(JOINT_LANDMARK_MAP.keys()))
 
 @app.route('/update_active_joints', methods=['POST'])
 def update_active_joints():
-    global active_joints
-    data = request.get_json()
-    active_joints = data.get('active_joints', [])
-    print(f"Active joints updated to: {active_joints}") # For debugging
+    data = request.get_json(silent=True) or {}
+    session_id = data.get('session_id') or DEFAULT_SESSION
+    session = session_manager.get(session_id)
+    if session is None:
+        return session_not_found(session_id)
+    session.set_active_joints(data.get('active_joints', []))
+    refresh_camera_sessions(session.camera_id)
+    logger.debug("Active joints of session %s updated to: %s", session_id, session.active_joints)
+    return jsonify(status='success')
+
+@app.route('/sessions', methods=['GET', 'POST'])
+def session_list():
+    """
+    Lists the open assessment sessions. A POST opens a new one on camera_id
+    (default camera otherwise) for patient_id with the given active_joints.
+    """
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        camera_id = data.get('camera_id', DEFAULT_CAMERA)
+        if camera_id not in cameras:
+            return camera_not_found(camera_id)
+        session = session_manager.create(camera_id, patient_id=data.get('patient_id'),
+                                         active_joints=data.get('active_joints'))
+        refresh_camera_sessions(camera_id)
+        return jsonify(session.summary())
+    return jsonify([session.summary() for session in session_manager.sessions()])
+
+@app.route('/sessions/<session_id>')
+def session_detail(session_id):
+    """Returns a session's active joints, max/min angles, ROM and captures."""
+    session = session_manager.get(session_id)
+    if session is None:
+        return session_not_found(session_id)
+    return jsonify(session.summary())
+
+@app.route('/sessions/<session_id>/reset', methods=['POST'])
+def reset_session(session_id):
+    """Clears a session's max/min angles to start measuring a new movement."""
+    session = session_manager.get(session_id)
+    if session is None:
+        return session_not_found(session_id)
+    session.reset()
+    return jsonify(session.summary())
+
+@app.route('/sessions/<session_id>/close', methods=['POST'])
+def close_session_route(session_id):
+    session = session_manager.close(session_id)
+    if session is None:
+        return session_not_found(session_id)
+    return jsonify(session.summary())
+
+CAMERA_ID = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+@app.route('/cameras', methods=['GET', 'POST'])
+def camera_list():
+    """
+    Lists the registered cameras. A POST with camera_id and source adds one;
+    a numeric source is a device index, anything else a file or stream URL.
+    """
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        camera_id, source = data.get('camera_id'), data.get('source')
+        if not camera_id or source is None:
+            return jsonify({"status": "error", "message": "camera_id and source are required."}), 400
+        if not isinstance(camera_id, str) or not CAMERA_ID.fullmatch(camera_id):
+            return jsonify({"status": "error", "message": "camera_id may only contain up to 64 letters, "
+                                                          "digits, '_' and '-'."}), 400
+        if not (is_integer(source) or isinstance(source, str)):
+            return jsonify({"status": "error",
+                            "message": "source must be a device index or a file or stream URL."}), 400
+        if isinstance(source, str) and source.isdigit():
+            source = int(source)
+        try:
+            add_camera(camera_id, source)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+    with cameras_lock:
+        return jsonify([camera.info() for camera in cameras.values()])
+
+@app.route('/cameras/<camera_id>', methods=['DELETE'])
+def delete_camera(camera_id):
+    if remove_camera(camera_id) is None:
+        return camera_not_found(camera_id)
     return jsonify(status='success')
 
-@app.route('/video_feed')
-def video_feed():
-    return Response(generate_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
+@app.route('/video_feed', defaults={'camera_id': DEFAULT_CAMERA})
+@app.route('/video_feed/<camera_id>')
+def video_feed(camera_id):
+    camera = cameras.get(camera_id)
+    if camera is None:
+        return camera_not_found(camera_id)
+    return Response(generate_frames(camera), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+@app.route('/angles')
+def angles_stream():
+    """
+    Streams the per-frame angle payloads of a session (?session_id=, default
+    session otherwise) as server-sent events. Streaming keeps the session open.
+    """
+    session_id = request.args.get('session_id') or DEFAULT_SESSION
+    session = session_manager.get(session_id)
+    if session is None:
+        return session_not_found(session_id)
+    camera = cameras.get(session.camera_id)
+    if camera is None:
+        return camera_not_found(session.camera_id)
+    def events():
+        for packet in camera.stream.subscribe_packets():
+            if session.closed:
+                break
+            session.touch()
+            yield f"data: {angle_payload(session, packet.result)}\n\n"
+    return Response(events(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+@app.route('/pipeline_stats')
+def pipeline_stats():
+    """
+    Returns per-stage throughput and the inference rate of a camera's producer
+    (?camera_id=, default camera otherwise) and the shared worker pool usage.
+    """
+    camera_id = request.args.get('camera_id', DEFAULT_CAMERA)
+    camera = cameras.get(camera_id)
+    if camera is None:
+        return camera_not_found(camera_id)
+    stats = camera.stream.stats()
+    stats["inference_policy"] = camera.detector.inference_stats()
+    if camera.landmark_filter is not None:
+        stats["rejected_landmarks"] = camera.landmark_filter.rejected
+    stats["scheduler"] = scheduler.stats()
+    return jsonify(stats)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Exposes per-camera stage timings and frame counters in the Prometheus text format."""
+    if not METRICS_ENABLED:
+        return jsonify({"status": "error", "message": "Metrics are disabled."}), 404
+    with cameras_lock:
+        samples = [(camera.camera_id, camera.metrics, camera.stream.stats()) for camera in cameras.values()]
+    return Response(render_prometheus(samples, scheduler.stats()), mimetype='text/plain; version=0.0.4')
+
+RECORDING_NAME = re.compile(r"[A-Za-z0-9_-]+")
+
+@app.route('/recording/start', methods=['POST'])
+def start_recording():
+    """Starts recording every frame's angles of a camera to recordings/<name>/."""
+    data = request.get_json(silent=True) or {}
+    camera_id = data.get('camera_id', DEFAULT_CAMERA)
+    camera = cameras.get(camera_id)
+    if camera is None:
+        return camera_not_found(camera_id)
+    if camera.recorder is not None:
+        return jsonify({"status": "error", "message": "Recording already in progress."}), 400
+
+    name = data.get('session_id') or datetime.now().strftime("%Y%m%d_%H%M%S")
+    if camera_id != DEFAULT_CAMERA:
+        name = f"{name}_{camera_id}"
+    # The name becomes a directory under recordings/, so it must not contain a path
+    if not isinstance(name, str) or not RECORDING_NAME.fullmatch(name):
+        return jsonify({"status": "error",
+                        "message": "session_id and camera_id may only contain letters, digits, '_' and '-'."}), 400
+    try:
+        camera.recorder = AngleRecorder(os.path.join("recordings", name), JOINT_TABLE.names).start()
+    except FileExistsError:
+        return jsonify({"status": "error", "message": f"A recording named {name!r} already exists."}), 409
+    return jsonify({"status": "success", "output_dir": camera.recorder.output_dir})
+
+@app.route('/recording/stop', methods=['POST'])
+def stop_recording():
+    """Stops a camera's continuous recording and writes the remaining frames."""
+    data = request.get_json(silent=True) or {}
+    camera_id = data.get('camera_id', DEFAULT_CAMERA)
+    camera = cameras.get(camera_id)
+    if camera is None:
+        return camera_not_found(camera_id)
+    if camera.recorder is None:
+        return jsonify({"status": "error", "message": "No recording in progress."}), 400
+
+    stopped, camera.recorder = camera.recorder, None
+    stopped.stop()
+    return jsonify({"status": "success", **stopped.stats()})
+
+@app.route('/stream_settings', methods=['GET', 'POST'])
+def stream_settings():
+    """
+    Returns a camera's video encoder settings and statistics (?camera_id=,
+    default camera otherwise). A POST with any of max_width, quality,
+    adaptive or backend changes them on the running stream.
+    """
+    camera_id = request.args.get('camera_id', DEFAULT_CAMERA)
+    camera = cameras.get(camera_id)
+    if camera is None:
+        return camera_not_found(camera_id)
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        max_width, quality = data.get('max_width'), data.get('quality')
+        # Bad values would otherwise only fail in the encode thread and stop the stream
+        if max_width is not None and (not is_integer(max_width) or max_width < 0):
+            return invalid_setting("max_width must be a non-negative integer (0 for the full width).")
+        if quality is not None and (not is_integer(quality) or not 1 <= quality <= 100):
+            return invalid_setting("quality must be an integer between 1 and 100.")
+        try:
+            camera.encoder.configure(max_width=max_width, quality=quality,
+                              adaptive=data.get('adaptive'), backend=data.get('backend'))
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+    return jsonify(camera.encoder.stats())
+
+@app.route('/model_settings', methods=['GET', 'POST'])
+def model_settings():
+    """
+    Returns a camera's pose model settings and inference time (?camera_id=,
+    default camera otherwise). A POST with any of complexity,
+    detection_confidence, tracking_confidence, auto or target_fps changes
+    them on the running stream; the new model is loaded before the request
+    returns.
+    """
+    camera_id = request.args.get('camera_id', DEFAULT_CAMERA)
+    camera = cameras.get(camera_id)
+    if camera is None:
+        return camera_not_found(camera_id)
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            camera.detector.configure(complexity=data.get('complexity'),
+                                      detection_con=data.get('detection_confidence'),
+                                      track_con=data.get('tracking_confidence'), auto=data.get('auto'),
+                                      target_fps=data.get('target_fps', POSE_TARGET_FPS if data.get('auto') else None))
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        except RuntimeError as e:
+            return jsonify({"status": "error", "message": str(e)}), 503
+    return jsonify(camera.detector.model_stats())
 
 @app.route('/capture_measurement', methods=['POST'])
 def capture_measurement():
-    global last_frame, last_angles, max_angles
-    if last_frame is None or not last_angles:
+    data = request.get_json(silent=True) or {}
+    session_id = data.get('session_id') or DEFAULT_SESSION
+    session = session_manager.get(session_id)
+    if session is None:
+        return session_not_found(session_id)
+    camera = cameras.get(session.camera_id)
+    if camera is None:
+        return camera_not_found(session.camera_id)
+
+    # Frame and angles come from one published packet, so they always match
+    packet = camera.stream.latest()
+    captured_angles = current_angles(session, packet.result) if packet is not None else {}
+    if not captured_angles:
         return jsonify({"status": "error", "message": "No frame or angle data available to capture."}), 400
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    
-    # Save image
-    image_filename = f"captured_image_{timestamp}.jpg"
-    cv2.imwrite(f"static/images/{image_filename}", last_frame)
-
-    # Save angles to CSV
-    csv_filename = "measurements.csv"
-    file_exists = False
+    # Hand the published (read-only) frame to the background writer; the JPEG
+    # and the measurement row are saved off the request thread. The streamed
+    # frame has no angle labels (the browser draws them), so the writer burns
+    # this session's labels into the saved image.
     try:
-        with open(csv_filename, 'r') as f:
-            file_exists = True
-    except FileNotFoundError:
-        pass
-
-    with open(csv_filename, 'a', newline='') as csvfile:
-        # Dynamically create fieldnames based on active_joints
-        fieldnames = ['timestamp', 'image_file']
-        for joint_name in active_joints:
-            fieldnames.append(joint_name + '_angle')
-            fieldnames.append('max_' + joint_name + '_angle')
-
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-
-        if not file_exists:
-            writer.writeheader()
-
-        row_data = {
-            'timestamp': timestamp,
-            'image_file': image_filename,
-        }
-        for joint_name in active_joints:
-            row_data[joint_name + '_angle'] = (int(last_angles.get(joint_name, 0)) if last_angles.get(joint_name) is not None else '')
-            row_data['max_' + joint_name + '_angle'] = (int(max_angles.get(joint_name, 0)) if max_angles.get(joint_name) is not None else '')
-
-        writer.writerow(row_data)
-
-    return jsonify({"status": "success", "message": "Measurement captured and saved!"})
+        capture_id = get_snapshot_writer().submit(
+            packet.frame,
+            captured_angles,
+            session.angle_dict(session.max_angles),
+            patient_id=data.get('patient_id', session.patient_id),
+            session_id=session.session_id,
+            labels=None if DRAW_SERVER_LABELS else angle_labels(session, packet.result),
+        )
+    except queue.Full:
+        return jsonify({"status": "error", "message": "Too many captures pending, please try again."}), 503
+    session.add_capture(capture_id)
+
+    return jsonify({"status": "success", "message": "Measurement captured!", "capture_id": capture_id})
+
+@app.route('/capture_status/<capture_id>')
+def capture_status(capture_id):
+    """Returns whether a capture is still pending, saved or failed."""
+    status = get_snapshot_writer().status(capture_id)
+    if status is None:
+        return jsonify({"status": "error", "message": "Unknown capture ID."}), 404
+    return jsonify({"capture_id": capture_id, "status": status})
+
+@app.route('/measurements')
+def get_measurements():
+    """
+    Returns stored measurements, optionally filtered by patient_id, session_id
+    and a start/end timestamp range (seconds since the epoch).
+    """
+    start = request.args.get('start', type=float)
+    end = request.args.get('end', type=float)
+    rows = get_measurement_store().query_rows(
+        patient_id=request.args.get('patient_id'),
+        session_id=request.args.get('session_id'),
+        start=start,
+        end=end,
+    )
+    return jsonify(rows)
+
+@app.route('/reports/sessions')
+def session_reports():
+    """
+    Returns the ROM reports of stored sessions, optionally filtered by
+    patient_id and a start/end range of session start times.
+    """
+    return jsonify(get_measurement_store().session_reports(
+        patient_id=request.args.get('patient_id'),
+        start=request.args.get('start', type=float),
+        end=request.args.get('end', type=float),
+    ))
+
+@app.route('/reports/sessions/<session_id>')
+def session_report(session_id):
+    """
+    Returns a session's per-joint ROM, min/max, time to peak and repetitions
+    and its left/right asymmetry, computed from the stored measurements.
+    """
+    report = get_measurement_store().session_report(session_id)
+    if report is None:
+        return jsonify({"status": "error", "message": f"No measurements for session {session_id!r}."}), 404
+    return jsonify(report)
+
+@app.route('/reports/patients/<patient_id>')
+def patient_report(patient_id):
+    """
+    Returns a patient's visits and per-joint percentiles of ROM and max
+    angle across them (?percentiles=25,50,75).
+    """
+    try:
+        percentiles = [float(p) for p in request.args.get('percentiles', '25,50,75').split(',')]
+    except ValueError:
+        return jsonify({"status": "error", "message": "percentiles must be comma-separated numbers."}), 400
+    if not all(0 <= p <= 100 for p in percentiles):
+        return jsonify({"status": "error", "message": "percentiles must be between 0 and 100."}), 400
+    return jsonify(get_measurement_store().patient_report(patient_id, percentiles))
 
 if __name__ == '__main__':
+    # Shows the INFO lines of the modules' loggers, e.g. the METRICS_LOG_INTERVAL summaries
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s: %(message)s")
+    start_model_warmup()
     app.run(debug=True)
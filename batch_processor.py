@@ -0,0 +1,169 @@
+"""
+Offline re-measurement of recorded session videos.
+
+Each video is split into frame segments that are processed across a pool of
+worker processes, one MediaPipe Pose instance per worker. Landmarks are merged
+back in frame order and all joint angles of a video are calculated in a single
+batch call.
+
+Usage:
+    python batch_processor.py session1.mp4 session2.mp4 --output-dir results
+"""
+import argparse
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import cv2
+import numpy as np
+
+from joints import JOINT_TABLE, measure_joint_angles
+
+DEFAULT_SEGMENT_FRAMES = 300
+
+# Per-process PoseDetector, created once by the pool initializer
+_worker_detector = None
+
+
+def _init_worker(complexity):
+    global _worker_detector
+    from pose_detector import PoseDetector
+    _worker_detector = PoseDetector(complexity=complexity)
+
+
+def split_segments(path, segment_frames=DEFAULT_SEGMENT_FRAMES):
+    """
+    Splits a video into (path, start_frame, end_frame) segments of at most
+    segment_frames frames. Returns an empty list if the video cannot be read.
+    """
+    cap = cv2.VideoCapture(path)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) if cap.isOpened() else 0
+    cap.release()
+    return [(path, start, min(start + segment_frames, frame_count))
+            for start in range(0, frame_count, segment_frames)]
+
+
+def process_segment(segment):
+    """
+    Runs pose detection over one video segment in a worker process.
+    Returns the segment's (n, 33, 4) landmark array, NaN for frames
+    without a detected pose.
+    """
+    path, start, end = segment
+    # Start every segment from a clean tracking state
+    _worker_detector.load().reset()
+
+    cap = cv2.VideoCapture(path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    landmarks = np.full((end - start, 33, 4), np.nan, dtype=np.float32)
+    for i in range(end - start):
+        success, frame = cap.read()
+        if not success:
+            landmarks = landmarks[:i]
+            break
+        array = _worker_detector.find_landmark_array(frame)
+        if array is not None:
+            landmarks[i] = array
+    cap.release()
+    return landmarks
+
+
+def summarize_angles(angles, valid, names=JOINT_TABLE.names):
+    """
+    Returns per-joint max, min, range of motion and valid frame count
+    over the valid entries of an (N, J) angle array.
+    """
+    summary = {}
+    for j, joint in enumerate(names):
+        values = angles[valid[:, j], j]
+        if values.size:
+            summary[joint] = {
+                "max": float(values.max()),
+                "min": float(values.min()),
+                "rom": float(values.max() - values.min()),
+                "frames": int(values.size),
+            }
+        else:
+            summary[joint] = {"max": None, "min": None, "rom": None, "frames": 0}
+    return summary
+
+
+def process_videos(paths, workers=None, segment_frames=DEFAULT_SEGMENT_FRAMES, complexity=1):
+    """
+    Measures every video in paths across a process pool.
+
+    Returns a dict keyed by path with per-frame "angles" (N, J) and "valid"
+    (N, J) arrays, the "fps" of the video and a per-joint "summary".
+    """
+    segments = {path: split_segments(path, segment_frames) for path in paths}
+    all_segments = [segment for path in paths for segment in segments[path]]
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"),
+                             initializer=_init_worker, initargs=(complexity,)) as executor:
+        # map returns results in submission order, so segments merge in frame order
+        segment_landmarks = iter(executor.map(process_segment, all_segments))
+        landmarks_by_path = {
+            path: [next(segment_landmarks) for _ in segments[path]] for path in paths
+        }
+
+    results = {}
+    for path in paths:
+        parts = landmarks_by_path[path]
+        landmarks = np.concatenate(parts) if parts else np.empty((0, 33, 4), dtype=np.float32)
+        angles, valid, _ = measure_joint_angles(landmarks)
+        # Frames without a detected pose have NaN landmarks and are never valid
+        valid &= ~np.isnan(angles)
+
+        cap = cv2.VideoCapture(path)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        cap.release()
+
+        results[path] = {
+            "angles": angles,
+            "valid": valid,
+            "fps": fps,
+            "summary": summarize_angles(angles, valid),
+        }
+    return results
+
+
+def write_results(path, result, output_dir):
+    """
+    Writes the per-frame angles of a video to <name>_angles.csv and its
+    per-joint summary to <name>_summary.json in output_dir.
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    os.makedirs(output_dir, exist_ok=True)
+
+    with open(os.path.join(output_dir, f"{name}_angles.csv"), 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(['frame', 'time_s'] + [joint + '_angle' for joint in JOINT_TABLE.names])
+        fps = result["fps"]
+        for i, (row, row_valid) in enumerate(zip(result["angles"], result["valid"])):
+            writer.writerow([i, round(i / fps, 3) if fps else ''] +
+                            [round(float(angle), 1) if ok else '' for angle, ok in zip(row, row_valid)])
+
+    with open(os.path.join(output_dir, f"{name}_summary.json"), 'w') as f:
+        json.dump({"video": path, "frames": len(result["angles"]), "joints": result["summary"]}, f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-measure recorded session videos.")
+    parser.add_argument("videos", nargs="+", help="video files to process")
+    parser.add_argument("--output-dir", default="batch_results", help="directory for CSV/JSON results")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--segment-frames", type=int, default=DEFAULT_SEGMENT_FRAMES,
+                        help="frames per work segment")
+    parser.add_argument("--complexity", type=int, default=1, choices=(0, 1, 2), help="MediaPipe model complexity")
+    args = parser.parse_args(argv)
+
+    results = process_videos(args.videos, args.workers, args.segment_frames, args.complexity)
+    for path, result in results.items():
+        write_results(path, result, args.output_dir)
+        print(f"{path}: {len(result['angles'])} frames processed")
+
+
+if __name__ == '__main__':
+    main()
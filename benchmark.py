@@ -0,0 +1,270 @@
+"""
+Headless performance benchmark of the capture-to-stream stages.
+
+Frames are replayed from a recorded video (or generated when no video is
+given) through pose detection, landmark smoothing, angle calculation,
+overlay drawing and JPEG encoding. Frames without a detected pose use a
+synthetic moving skeleton for the later stages, so every stage is always
+measured. The report has per-stage p50/p95/p99 latency and throughput plus
+the peak resident memory, and can be compared against a stored baseline.
+
+Usage:
+    python benchmark.py --video session1.mp4 --output bench.json
+    python benchmark.py --save-baseline benchmark_baseline.json
+    python benchmark.py --baseline benchmark_baseline.json
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+
+# Peak memory is read with the Unix-only resource module; elsewhere it is not reported
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import cv2
+import numpy as np
+
+from frame_encoder import FrameEncoder
+from joints import ALL_JOINTS_PLAN, measure_joint_angles
+from landmark_filter import OneEuroFilter
+from overlay_renderer import OverlayRenderer
+
+STAGES = ("pose", "filter", "angles", "overlay", "encode")
+DEFAULT_FRAMES = 300
+DEFAULT_SIZE = (640, 480)
+DEFAULT_TOLERANCE = 0.2 # Allowed slowdown against the baseline before it counts as a regression
+
+
+def synthetic_frames(count, size=DEFAULT_SIZE, seed=0):
+    """Yields count BGR frames of a moving textured scene."""
+    rng = np.random.default_rng(seed)
+    width, height = size
+    background = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    for i in range(count):
+        frame = np.roll(background, 4 * i, axis=1)
+        cv2.circle(frame, (width // 2, height // 2), 40 + i % 40, (0, 255, 0), -1)
+        yield frame
+
+
+def video_frames(path, count):
+    """Yields up to count frames of a video file, rewinding at the end."""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise OSError(f"Could not open video {path}")
+    try:
+        produced = 0
+        while produced < count:
+            success, frame = cap.read()
+            if not success:
+                if produced == 0:
+                    break
+                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                continue
+            produced += 1
+            yield frame
+    finally:
+        cap.release()
+
+
+def synthetic_landmarks(count, seed=0):
+    """
+    Returns a (count, 33, 4) array of a standing pose whose arms and legs
+    swing slowly, with detection noise and an occasional single-frame spike.
+    """
+    rng = np.random.default_rng(seed)
+    base = np.zeros((33, 4))
+    base[:, 0] = np.linspace(0.35, 0.65, 33)
+    base[:, 1] = np.linspace(0.15, 0.9, 33)
+    base[:, 3] = 1.0
+    t = np.arange(count) / 30.0
+    landmarks = np.repeat(base[None], count, axis=0)
+    swing = 0.05 * np.sin(2 * np.pi * 0.5 * t)
+    landmarks[:, 13:17, 0] += swing[:, None] # elbows and wrists
+    landmarks[:, 25:29, 1] -= swing[:, None] # knees and ankles
+    landmarks[:, :, :3] += rng.normal(0.0, 0.003, (count, 33, 3))
+    spikes = rng.random(count) < 0.02
+    landmarks[spikes, 15, :2] += 0.3
+    return landmarks
+
+
+def summarize_latencies(seconds):
+    """Returns count, mean, p50/p95/p99 latency (ms) and throughput (frames/s) of one stage."""
+    values = np.asarray(seconds, dtype=np.float64)
+    if not values.size:
+        return {"count": 0}
+    p50, p95, p99 = np.percentile(values, (50, 95, 99)) * 1000.0
+    total = values.sum()
+    return {
+        "count": int(values.size),
+        "mean_ms": round(float(values.mean() * 1000.0), 4),
+        "p50_ms": round(float(p50), 4),
+        "p95_ms": round(float(p95), 4),
+        "p99_ms": round(float(p99), 4),
+        "throughput_fps": round(float(values.size / total), 1) if total > 0 else None,
+    }
+
+
+def peak_rss_mb():
+    """Returns the peak resident set size of this process in MB, or None if unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def run_benchmark(video=None, frames=DEFAULT_FRAMES, pose=True, complexity=1, warmup=10):
+    """
+    Runs every stage over the frames and returns the report dict. The
+    first warmup frames are processed but not measured.
+    """
+    detector = None
+    if pose:
+        from pose_detector import PoseDetector
+        detector = PoseDetector(complexity=complexity)
+    landmark_filter = OneEuroFilter()
+    encoder = FrameEncoder(skip_unchanged=False)
+    renderer = OverlayRenderer()
+    fallback = synthetic_landmarks(frames + warmup)
+    timings = {stage: [] for stage in STAGES}
+    total = []
+    detected = 0
+
+    source = video_frames(video, frames + warmup) if video else synthetic_frames(frames + warmup)
+    for i, frame in enumerate(source):
+        measured = i >= warmup
+        frame_start = time.perf_counter()
+
+        landmark_list = None
+        if pose:
+            start = time.perf_counter()
+            detector.process(frame)
+            if measured:
+                timings["pose"].append(time.perf_counter() - start)
+            landmark_list = detector.results.pose_landmarks
+        if landmark_list:
+            array = np.array([(lm.x, lm.y, lm.z, lm.visibility) for lm in landmark_list.landmark])
+            detected += measured
+        else:
+            array = fallback[i]
+
+        start = time.perf_counter()
+        filtered = landmark_filter.filter(array, i / 30.0)
+        stage_times = {"filter": time.perf_counter() - start}
+
+        start = time.perf_counter()
+        angles, valid, _ = measure_joint_angles(filtered)
+        stage_times["angles"] = time.perf_counter() - start
+
+        # Skeleton plus the current and max angle labels of every joint
+        start = time.perf_counter()
+        renderer.draw_skeleton(frame, filtered, ALL_JOINTS_PLAN)
+        renderer.draw_labels(frame, [
+            (text, angle if ok else None, origin, (255, 255, 255))
+            for (texts, origins), angle, ok in zip(zip(ALL_JOINTS_PLAN.labels, ALL_JOINTS_PLAN.label_origins),
+                                                   angles, valid)
+            for text, origin in zip(texts, origins)
+        ])
+        stage_times["overlay"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        encoder.encode(frame)
+        stage_times["encode"] = time.perf_counter() - start
+
+        if measured:
+            for stage, seconds in stage_times.items():
+                timings[stage].append(seconds)
+            total.append(time.perf_counter() - frame_start)
+
+    height, width = frame.shape[:2] if total else (0, 0)
+    return {
+        "source": video or "synthetic",
+        "frames": len(total),
+        "resolution": [width, height],
+        "pose_detected_frames": detected,
+        "stages": {stage: summarize_latencies(timings[stage]) for stage in STAGES if timings[stage]},
+        "total": summarize_latencies(total),
+        "peak_rss_mb": peak_rss_mb(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "jpeg_backend": encoder.backend,
+        },
+    }
+
+
+def compare_to_baseline(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compares the p50 and p95 latencies of each stage (and the total) with a
+    baseline report. Returns a list of (stage, metric, baseline, current,
+    ratio) tuples for every metric that got slower by more than tolerance.
+    """
+    regressions = []
+    current_stages = dict(report["stages"], total=report["total"])
+    baseline_stages = dict(baseline.get("stages", {}), total=baseline.get("total", {}))
+    for stage, stats in current_stages.items():
+        reference = baseline_stages.get(stage)
+        if not reference:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            if not reference.get(metric) or metric not in stats:
+                continue
+            ratio = stats[metric] / reference[metric]
+            if ratio > 1.0 + tolerance:
+                regressions.append((stage, metric, reference[metric], stats[metric], round(ratio, 2)))
+    return regressions
+
+
+def print_report(report):
+    print(f"{report['frames']} frames from {report['source']} at {report['resolution'][0]}x{report['resolution'][1]}")
+    print(f"{'stage':<10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'fps':>10}")
+    for stage, stats in dict(report["stages"], total=report["total"]).items():
+        # Stages without measured frames have no latencies or throughput
+        values = [stats.get(key) for key in ("p50_ms", "p95_ms", "p99_ms")]
+        latencies = "".join(f"{value:>10.3f}" if value is not None else f"{'-':>10}" for value in values)
+        throughput = stats.get("throughput_fps")
+        print(f"{stage:<10}{latencies}{throughput if throughput is not None else '-':>10}")
+    peak = report["peak_rss_mb"]
+    print(f"peak RSS: {peak} MB" if peak is not None else "peak RSS: not available on this platform")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the capture-to-stream stages headlessly.")
+    parser.add_argument("--video", help="video file to replay (default: synthetic frames)")
+    parser.add_argument("--frames", type=int, default=DEFAULT_FRAMES, help="frames to measure")
+    parser.add_argument("--no-pose", action="store_true", help="skip pose detection, use synthetic landmarks")
+    parser.add_argument("--complexity", type=int, default=1, choices=(0, 1, 2), help="MediaPipe model complexity")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--baseline", help="compare against this JSON report; exit 1 on regressions")
+    parser.add_argument("--save-baseline", help="write the JSON report as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown against the baseline (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.video, args.frames, pose=not args.no_pose, complexity=args.complexity)
+    print_report(report)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(report, baseline, args.tolerance)
+        for stage, metric, before, after, ratio in regressions:
+            print(f"REGRESSION {stage} {metric}: {before:.3f} -> {after:.3f} ms ({ratio}x)")
+        if regressions:
+            return 1
+        print("No regressions against the baseline.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
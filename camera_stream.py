@@ -0,0 +1,181 @@
+import logging
+import threading
+import time
+
+import cv2
+
+from frame_pipeline import FramePipeline
+
+logger = logging.getLogger(__name__)
+
+
+class FrameBroadcaster:
+    """
+    Holds the most recently published frame packet and wakes up every
+    subscriber waiting for a newer one. Subscribers that fall behind simply
+    receive the latest packet, skipping the ones they missed.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._packet = None
+        self._closed = False
+
+    def publish(self, packet):
+        """Publishes a new packet to all subscribers."""
+        with self._cond:
+            self._seq += 1
+            self._packet = packet
+            self._cond.notify_all()
+
+    def latest(self):
+        """Returns the most recently published packet, or None."""
+        return self._packet
+
+    def wait(self, last_seq):
+        """
+        Waits for a packet newer than last_seq. Returns (seq, packet),
+        or None once the broadcaster is closed.
+        """
+        with self._cond:
+            while self._seq <= last_seq and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                return None
+            return self._seq, self._packet
+
+    def close(self):
+        """Closes the broadcaster and releases all waiting subscribers."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class CameraStream:
+    """
+    A single capture/inference/encode producer for one camera, shared by any
+    number of viewers. The camera is opened when the first viewer subscribes
+    and released when the last one leaves, so N viewers cost one inference
+    and one encode per frame. Streams given the same InferenceScheduler
+    share its inference workers.
+    """
+
+    def __init__(self, source, process, render, open_capture=cv2.VideoCapture, on_delivery=None,
+                 scheduler=None):
+        self.source = source
+        self._scheduler = scheduler
+        self._on_delivery = on_delivery
+        self._process = process
+        self._render = render
+        self._open_capture = open_capture
+        self._lock = threading.Lock()
+        self._subscribers = 0
+        self._pipeline = None
+        self._broadcaster = FrameBroadcaster()
+        self._last_packet = None
+
+    def start(self):
+        """
+        Opens the camera and starts the shared producer if it is not running.
+        Returns False when the camera cannot be opened.
+        """
+        with self._lock:
+            if self._pipeline is not None and self._pipeline.running:
+                return True
+
+            cap = self._open_capture(self.source)
+            if not cap.isOpened():
+                cap.release()
+                logger.error("Could not open camera %r", self.source)
+                return False
+
+            self._broadcaster = FrameBroadcaster()
+            self._pipeline = FramePipeline(cap.read, self._process, self._render,
+                                           scheduler=self._scheduler).start()
+            threading.Thread(target=self._produce, args=(self._pipeline, self._broadcaster, cap),
+                             name=f"camera-{self.source}", daemon=True).start()
+            return True
+
+    def stop(self):
+        """Stops the shared producer and releases the camera."""
+        with self._lock:
+            self._stop_locked()
+
+    def _stop_locked(self):
+        if self._pipeline is not None:
+            self._pipeline.stop()
+            self._pipeline = None
+
+    def subscribe_packets(self):
+        """
+        Yields each new FramePacket for one subscriber. Slow subscribers
+        skip packets instead of holding up the producer.
+        """
+        with self._lock:
+            self._subscribers += 1
+        try:
+            if not self.start():
+                return
+            broadcaster = self._broadcaster
+            last_seq = 0
+            while True:
+                item = broadcaster.wait(last_seq)
+                if item is None:
+                    break
+                last_seq, packet = item
+                yield packet
+        finally:
+            with self._lock:
+                self._subscribers -= 1
+                if self._subscribers == 0:
+                    self._stop_locked()
+
+    def subscribe(self):
+        """
+        Yields the encoded output of each new frame for one viewer. Frames
+        the encoder skipped (no data) are not sent. The time each frame
+        takes to be written is reported to on_delivery(viewer, seconds).
+        """
+        viewer = object()
+        packets = self.subscribe_packets()
+        try:
+            for packet in packets:
+                if packet.data is None:
+                    continue
+                start = time.perf_counter()
+                yield packet.data
+                if self._on_delivery is not None:
+                    self._on_delivery(viewer, time.perf_counter() - start)
+        finally:
+            packets.close()
+
+    @property
+    def subscribers(self):
+        return self._subscribers
+
+    def latest(self):
+        """
+        Returns the latest fully processed FramePacket (frame, inference
+        result and encoded data published together), or None.
+        """
+        return self._last_packet
+
+    def stats(self):
+        """Returns per-stage throughput of the running producer."""
+        pipeline = self._pipeline
+        stats = pipeline.stats() if pipeline is not None else {}
+        stats["subscribers"] = self._subscribers
+        return stats
+
+    def _produce(self, pipeline, broadcaster, cap):
+        try:
+            for packet in pipeline.packets():
+                self._last_packet = packet
+                broadcaster.publish(packet)
+        except Exception:
+            logger.exception("Camera %r producer failed", self.source)
+        finally:
+            pipeline.stop()
+            cap.release()
+            broadcaster.close()
@@ -0,0 +1,232 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+# libjpeg-turbo based encoders are used when installed; OpenCV is the fallback
+try:
+    import simplejpeg
+except ImportError:
+    simplejpeg = None
+
+try:
+    from turbojpeg import TurboJPEG
+    _turbojpeg = TurboJPEG()
+except Exception:
+    _turbojpeg = None
+
+# Thumbnail used to detect unchanged frames; each cell averages a small patch
+# (20x20 pixels at 1280x720), so sensor noise cancels out but a moving limb does not
+SIGNATURE_SIZE = (64, 36)
+MIN_WIDTH = 16 # Narrowest frame the stream is scaled down to
+
+
+def available_backends():
+    """Returns the JPEG backends that can be used on this machine, fastest first."""
+    backends = []
+    if simplejpeg is not None:
+        backends.append("simplejpeg")
+    if _turbojpeg is not None:
+        backends.append("turbojpeg")
+    backends.append("opencv")
+    return backends
+
+
+class AdaptiveController:
+    """
+    Adjusts JPEG quality and resolution scale from the delivery rate of the
+    slowest viewer and the encode time. When frames are not delivered at the
+    target rate, quality is lowered first and then resolution; when there is
+    headroom, resolution is restored first and then quality.
+    """
+
+    def __init__(self, target_fps=20.0, min_quality=40, max_quality=90, min_scale=0.4,
+                 quality_step=5, scale_step=0.1, interval=1.0):
+        self.target_fps = target_fps
+        self.min_quality = min_quality
+        self.max_quality = max_quality
+        self.min_scale = min_scale
+        self.quality_step = quality_step
+        self.scale_step = scale_step
+        self.interval = interval
+
+    def update(self, quality, scale, delivered_fps, encode_ms):
+        """
+        Returns the new (quality, scale) given the slowest viewer's delivered
+        frames per second and the average encode time in milliseconds.
+        """
+        frame_budget_ms = 1000.0 / self.target_fps
+        too_slow = delivered_fps < 0.9 * self.target_fps or encode_ms > 0.3 * frame_budget_ms
+        headroom = delivered_fps >= 0.98 * self.target_fps and encode_ms < 0.15 * frame_budget_ms
+
+        if too_slow:
+            if quality > self.min_quality:
+                quality = max(self.min_quality, quality - self.quality_step)
+            else:
+                scale = max(self.min_scale, scale - self.scale_step)
+        elif headroom:
+            if scale < 1.0:
+                scale = min(1.0, scale + self.scale_step)
+            else:
+                quality = min(self.max_quality, quality + self.quality_step)
+        return quality, scale
+
+
+class FrameEncoder:
+    """
+    JPEG encoder stage for the video stream. Frames are downscaled to at most
+    max_width pixels wide (times the adaptive scale) and encoded at the
+    configured quality. Frames that look unchanged from the previous one are
+    skipped: encode() returns None for them. A frame counts as changed when
+    any thumbnail cell differs by change_threshold gray levels, so small
+    moving regions are sent even when the rest of the scene is still.
+    """
+
+    def __init__(self, max_width=None, quality=80, backend="auto", controller=None,
+                 skip_unchanged=True, change_threshold=2.0, max_skipped=15):
+        self.max_width = max_width
+        self.quality = quality
+        self.quality_limit = quality # The adaptive controller never goes above the configured quality
+        self.scale = 1.0
+        self.backend = available_backends()[0] if backend == "auto" else backend
+        self.controller = controller
+        self.skip_unchanged = skip_unchanged
+        self.change_threshold = change_threshold
+        # Re-send a static scene now and then so newly joined viewers get a frame
+        self.max_skipped = max_skipped
+        self._skipped_in_row = 0
+
+        self._lock = threading.Lock()
+        self._signature = None
+        self._frames = 0
+        self._skipped = 0
+        self._bytes = 0
+        self._encode_time = 0.0
+        self._window_encode_time = 0.0
+        self._window_frames = 0
+        self._window_start = time.perf_counter()
+        self._delivery = {} # viewer id -> (frames, seconds) in the current window
+
+    def configure(self, max_width=None, quality=None, adaptive=None, backend=None):
+        """
+        Changes encoder settings on the fly; arguments left as None are kept.
+        max_width (0 for the full width) and quality must be integers and are
+        clamped to at least MIN_WIDTH and to 1-100. Raises ValueError for
+        invalid settings.
+        """
+        for name, value in (("max_width", max_width), ("quality", quality)):
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (int, np.integer))):
+                raise ValueError(f"{name} must be an integer")
+        with self._lock:
+            if max_width is not None:
+                self.max_width = max(MIN_WIDTH, int(max_width)) if max_width else None
+                self.scale = 1.0
+            if quality is not None:
+                self.quality = self.quality_limit = min(100, max(1, int(quality)))
+            if adaptive is not None:
+                self.controller = (self.controller or AdaptiveController()) if adaptive else None
+                self.scale = 1.0
+            if backend is not None:
+                if backend not in available_backends():
+                    raise ValueError(f"JPEG backend {backend!r} is not available")
+                self.backend = backend
+
+    def encode(self, frame):
+        """
+        Encodes a BGR frame as JPEG bytes, or returns None if the frame is
+        unchanged from the previously encoded one.
+        """
+        if self.skip_unchanged:
+            signature = cv2.resize(frame, SIGNATURE_SIZE, interpolation=cv2.INTER_AREA).astype(np.int16)
+            if self._skipped_in_row < self.max_skipped and self._is_unchanged(signature):
+                self._skipped += 1
+                self._skipped_in_row += 1
+                return None
+            # Compare later frames against the last one actually sent
+            self._signature = signature
+            self._skipped_in_row = 0
+
+        start = time.perf_counter()
+        frame = self._resize(frame)
+        data = self._encode(frame, self.quality)
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self._frames += 1
+            self._bytes += len(data)
+            self._encode_time += elapsed
+            self._window_encode_time += elapsed
+            self._window_frames += 1
+        self._adapt()
+        return data
+
+    def report_delivery(self, viewer, seconds):
+        """
+        Records that writing one frame to a viewer took `seconds`. The
+        adaptive controller uses the frame rate the slowest viewer's
+        connection can sustain.
+        """
+        with self._lock:
+            frames, total = self._delivery.get(viewer, (0, 0.0))
+            self._delivery[viewer] = (frames + 1, total + seconds)
+
+    def stats(self):
+        with self._lock:
+            frames = self._frames
+            return {
+                "backend": self.backend,
+                "max_width": self.max_width,
+                "quality": self.quality,
+                "scale": round(self.scale, 2),
+                "adaptive": self.controller is not None,
+                "frames": frames,
+                "skipped": self._skipped,
+                "avg_bytes": self._bytes / frames if frames else 0,
+                "avg_encode_ms": 1000.0 * self._encode_time / frames if frames else 0.0,
+            }
+
+    def _is_unchanged(self, signature):
+        previous = self._signature
+        if previous is None or previous.shape != signature.shape:
+            return False
+        # Largest change of any cell, averaged over the color channels
+        difference = cv2.absdiff(signature, previous).sum(axis=2).max() / signature.shape[2]
+        return difference < self.change_threshold
+
+    def _resize(self, frame):
+        width = frame.shape[1]
+        target = width if self.max_width is None else min(width, self.max_width)
+        target = max(1, int(target * self.scale))
+        if target >= width:
+            return frame
+        height = int(round(frame.shape[0] * target / width))
+        return cv2.resize(frame, (target, height), interpolation=cv2.INTER_AREA)
+
+    def _encode(self, frame, quality):
+        if self.backend == "simplejpeg":
+            return simplejpeg.encode_jpeg(np.ascontiguousarray(frame), quality=quality, colorspace="BGR")
+        if self.backend == "turbojpeg":
+            return _turbojpeg.encode(frame, quality=quality)
+        ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        return buffer.tobytes()
+
+    def _adapt(self):
+        if self.controller is None:
+            return
+        with self._lock:
+            elapsed = time.perf_counter() - self._window_start
+            if elapsed < self.controller.interval or not self._window_frames:
+                return
+            encode_ms = 1000.0 * self._window_encode_time / self._window_frames
+            # Without viewer feedback only the encode time is taken into account
+            delivered_fps = float("inf")
+            for frames, seconds in self._delivery.values():
+                if seconds > 0:
+                    delivered_fps = min(delivered_fps, frames / seconds)
+            quality, self.scale = self.controller.update(self.quality, self.scale, delivered_fps, encode_ms)
+            self.quality = min(quality, self.quality_limit)
+            self._window_start = time.perf_counter()
+            self._window_encode_time = 0.0
+            self._window_frames = 0
+            self._delivery = {}
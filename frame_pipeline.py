@@ -0,0 +1,348 @@
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class LatestQueue:
+    """
+    A bounded, thread-safe queue that drops its oldest item instead of
+    blocking when full, so slow consumers always see the freshest frame.
+    """
+
+    def __init__(self, maxsize=1):
+        self._items = deque()
+        self._maxsize = maxsize
+        self._cond = threading.Condition()
+        self._closed = False
+        self.dropped = 0
+        # Called (without the queue lock held) after every put or close
+        self.listener = None
+
+    def put(self, item):
+        """Adds an item, discarding the oldest one if the queue is full."""
+        with self._cond:
+            if self._closed:
+                return
+            if len(self._items) >= self._maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+        if self.listener is not None:
+            self.listener()
+
+    def get_nowait(self):
+        """Returns the next item, or None if the queue is empty."""
+        with self._cond:
+            return self._items.popleft() if self._items else None
+
+    @property
+    def exhausted(self):
+        """True once the queue is closed and all queued items were taken."""
+        with self._cond:
+            return self._closed and not self._items
+
+    def get(self):
+        """
+        Waits for the next item. Returns None once the queue is closed
+        and no queued items remain.
+        """
+        with self._cond:
+            while not self._items and not self._closed:
+                self._cond.wait()
+            if not self._items:
+                return None
+            return self._items.popleft()
+
+    def close(self, drain=False):
+        """
+        Closes the queue and wakes up any waiting consumer. With drain=True
+        the items already queued are still handed out before get returns None.
+        """
+        with self._cond:
+            self._closed = True
+            if not drain:
+                self._items.clear()
+            self._cond.notify_all()
+        if self.listener is not None:
+            self.listener()
+
+
+class FramePacket:
+    """
+    A single camera frame travelling through the pipeline stages.
+    """
+    __slots__ = ("index", "timestamp", "frame", "result", "data")
+
+    def __init__(self, index, timestamp, frame):
+        self.index = index
+        self.timestamp = timestamp
+        self.frame = frame
+        self.result = None
+        self.data = None
+
+
+class StageStats:
+    """
+    Throughput counters for one pipeline stage.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.frames = 0
+        self.busy_time = 0.0
+        self.latency_total = 0.0
+
+    def record(self, busy_time, latency=0.0):
+        with self._lock:
+            self.frames += 1
+            self.busy_time += busy_time
+            self.latency_total += latency
+
+    def snapshot(self, dropped=0):
+        with self._lock:
+            elapsed = max(time.perf_counter() - self.started, 1e-9)
+            frames = self.frames
+            return {
+                "frames": frames,
+                "dropped": dropped,
+                "fps": frames / elapsed,
+                "avg_ms": 1000.0 * self.busy_time / frames if frames else 0.0,
+                "avg_latency_ms": 1000.0 * self.latency_total / frames if frames else 0.0,
+            }
+
+
+class FramePipeline:
+    """
+    Runs camera capture, pose inference and annotate/encode as separate
+    threads connected by bounded queues. Each queue keeps only the newest
+    frames, so a slow stage drops stale frames instead of building latency.
+
+    capture() returns (success, frame) like cv2.VideoCapture.read,
+    process(frame) returns the inference result for a frame and
+    render(frame, result) returns the encoded bytes to stream. When an
+    InferenceScheduler is given, its shared workers run the inference
+    stage instead of a dedicated thread.
+    """
+
+    STAGES = ("capture", "inference", "encode")
+
+    def __init__(self, capture, process, render, queue_size=1, scheduler=None):
+        self._capture = capture
+        self._process = process
+        self._render = render
+        self._scheduler = scheduler
+        self._inference_queue = LatestQueue(queue_size)
+        self._encode_queue = LatestQueue(queue_size)
+        self._output_queue = LatestQueue(queue_size)
+        self._stats = {stage: StageStats() for stage in self.STAGES + ("output",)}
+        self._running = threading.Event()
+        self._threads = []
+
+    def start(self):
+        """Starts the capture, inference and encode threads."""
+        if self._running.is_set():
+            return self
+        self._running.set()
+        # Downstream stages start first so they are waiting when frames arrive
+        self._threads = [
+            threading.Thread(target=self._stage_loop, name="pipeline-encode", daemon=True,
+                             args=("encode", self._encode_queue, self._output_queue, self._run_encode)),
+        ]
+        if self._scheduler is not None:
+            self._scheduler.register(self)
+        else:
+            self._threads.append(
+                threading.Thread(target=self._stage_loop, name="pipeline-inference", daemon=True,
+                                 args=("inference", self._inference_queue, self._encode_queue, self._run_inference)))
+        self._threads.append(threading.Thread(target=self._capture_loop, name="pipeline-capture", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        """Stops all stages and waits for their threads to finish."""
+        self._running.clear()
+        if self._scheduler is not None:
+            self._scheduler.unregister(self, timeout)
+        for stage_queue in (self._inference_queue, self._encode_queue, self._output_queue):
+            stage_queue.close()
+        for thread in self._threads:
+            if thread is not threading.current_thread() and thread.is_alive():
+                thread.join(timeout)
+        self._threads = []
+
+    @property
+    def running(self):
+        return self._running.is_set()
+
+    def packets(self):
+        """
+        Yields each fully processed FramePacket until the pipeline stops.
+        """
+        stats = self._stats["output"]
+        while True:
+            packet = self._output_queue.get()
+            if packet is None:
+                break
+            stats.record(0.0, time.perf_counter() - packet.timestamp)
+            yield packet
+
+    def frames(self):
+        """
+        Yields the encoded output of each processed frame until the pipeline stops.
+        """
+        for packet in self.packets():
+            yield packet.data
+
+    def stats(self):
+        """
+        Returns per-stage throughput: frames handled, frames dropped while
+        waiting for that stage, frames per second and average time per frame.
+        """
+        dropped = {
+            "capture": 0,
+            "inference": self._inference_queue.dropped,
+            "encode": self._encode_queue.dropped,
+            "output": self._output_queue.dropped,
+        }
+        return {stage: stats.snapshot(dropped[stage]) for stage, stats in self._stats.items()}
+
+    def _capture_loop(self):
+        stats = self._stats["capture"]
+        index = 0
+        try:
+            while self._running.is_set():
+                start = time.perf_counter()
+                success, frame = self._capture()
+                if not success:
+                    break
+                stats.record(time.perf_counter() - start)
+                self._inference_queue.put(FramePacket(index, time.perf_counter(), frame))
+                index += 1
+        except Exception:
+            logger.exception("Frame capture failed")
+            self.stop()
+        else:
+            # End of stream: let the frames already captured finish processing
+            self._inference_queue.close(drain=True)
+
+    def _stage_loop(self, name, source, sink, func):
+        stats = self._stats[name]
+        try:
+            while True:
+                packet = source.get()
+                if packet is None:
+                    break
+                start = time.perf_counter()
+                func(packet)
+                stats.record(time.perf_counter() - start)
+                sink.put(packet)
+            sink.close(drain=self._running.is_set())
+        except Exception:
+            logger.exception("Pipeline stage '%s' failed", name)
+            self.stop()
+
+    def _run_inference(self, packet):
+        packet.result = self._process(packet.frame)
+
+    def _run_encode(self, packet):
+        packet.data = self._render(packet.frame, packet.result)
+
+
+class InferenceScheduler:
+    """
+    A fixed pool of inference worker threads shared by several pipelines.
+
+    Workers serve the pipelines' inference queues round-robin and run at most
+    one frame per pipeline at a time, so every camera gets a fair share, frames
+    of one camera stay in order, and no more than `workers` inferences run at
+    once. Each pipeline's queue holds only its newest frame, so a camera that
+    is not served in time drops stale frames instead of building a backlog.
+    """
+
+    def __init__(self, workers=2):
+        self.workers = workers
+        self._cond = threading.Condition()
+        self._pipelines = []
+        self._busy = set()
+        self._next = 0
+        self._threads = [
+            threading.Thread(target=self._worker_loop, name=f"inference-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def register(self, pipeline):
+        """Starts serving a pipeline's inference queue."""
+        with self._cond:
+            pipeline._inference_queue.listener = self._wake
+            self._pipelines.append(pipeline)
+            self._cond.notify_all()
+
+    def unregister(self, pipeline, timeout=None):
+        """
+        Stops serving a pipeline and waits up to timeout seconds for its
+        inference in flight, so a pipeline started next for the same camera
+        never runs process() concurrently with it.
+        """
+        with self._cond:
+            if pipeline in self._pipelines:
+                self._pipelines.remove(pipeline)
+            # A worker stopping its own pipeline after a failure must not wait on itself
+            if threading.current_thread() not in self._threads:
+                self._cond.wait_for(lambda: pipeline not in self._busy, timeout)
+
+    def stats(self):
+        with self._cond:
+            return {"workers": self.workers, "pipelines": len(self._pipelines), "busy": len(self._busy)}
+
+    def _wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def _next_job(self):
+        # Called with the condition held: pick the next idle pipeline with a frame
+        count = len(self._pipelines)
+        for offset in range(count):
+            index = (self._next + offset) % count
+            pipeline = self._pipelines[index]
+            if pipeline in self._busy:
+                continue
+            packet = pipeline._inference_queue.get_nowait()
+            if packet is not None:
+                self._busy.add(pipeline)
+                self._next = index + 1
+                return pipeline, packet
+            if pipeline._inference_queue.exhausted:
+                # End of stream: let the encode stage drain and finish
+                self._pipelines.remove(pipeline)
+                pipeline._encode_queue.close(drain=pipeline.running)
+                return self._next_job()
+        return None
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None:
+                    self._cond.wait()
+                    job = self._next_job()
+            pipeline, packet = job
+            try:
+                start = time.perf_counter()
+                pipeline._run_inference(packet)
+                pipeline._stats["inference"].record(time.perf_counter() - start)
+                pipeline._encode_queue.put(packet)
+            except Exception:
+                logger.exception("Scheduled inference failed")
+                pipeline.stop()
+            finally:
+                with self._cond:
+                    self._busy.discard(pipeline)
+                    self._cond.notify_all()
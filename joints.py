@@ -0,0 +1,165 @@
+from collections import namedtuple
+
+import numpy as np
+
+from angle_calculator import calculate_joint_angles, calculate_world_joint_angles, compile_joint_table
+
+# MediaPipe Pose landmark indices (mediapipe.solutions.pose.PoseLandmark), kept
+# as a static table so importing this module does not load MediaPipe
+POSE_LANDMARKS = {
+    "NOSE": 0,
+    "LEFT_EYE_INNER": 1,
+    "LEFT_EYE": 2,
+    "LEFT_EYE_OUTER": 3,
+    "RIGHT_EYE_INNER": 4,
+    "RIGHT_EYE": 5,
+    "RIGHT_EYE_OUTER": 6,
+    "LEFT_EAR": 7,
+    "RIGHT_EAR": 8,
+    "MOUTH_LEFT": 9,
+    "MOUTH_RIGHT": 10,
+    "LEFT_SHOULDER": 11,
+    "RIGHT_SHOULDER": 12,
+    "LEFT_ELBOW": 13,
+    "RIGHT_ELBOW": 14,
+    "LEFT_WRIST": 15,
+    "RIGHT_WRIST": 16,
+    "LEFT_PINKY": 17,
+    "RIGHT_PINKY": 18,
+    "LEFT_INDEX": 19,
+    "RIGHT_INDEX": 20,
+    "LEFT_THUMB": 21,
+    "RIGHT_THUMB": 22,
+    "LEFT_HIP": 23,
+    "RIGHT_HIP": 24,
+    "LEFT_KNEE": 25,
+    "RIGHT_KNEE": 26,
+    "LEFT_ANKLE": 27,
+    "RIGHT_ANKLE": 28,
+    "LEFT_HEEL": 29,
+    "RIGHT_HEEL": 30,
+    "LEFT_FOOT_INDEX": 31,
+    "RIGHT_FOOT_INDEX": 32,
+}
+
+# Define a mapping from joint identifiers to MediaPipe landmark indices
+# This map is used to determine which landmarks are associated with each joint
+# and will be crucial for conditional drawing and angle calculation.
+JOINT_LANDMARK_MAP = {
+    "left_shoulder_flexion": [POSE_LANDMARKS["LEFT_HIP"], POSE_LANDMARKS["LEFT_SHOULDER"], POSE_LANDMARKS["LEFT_ELBOW"]],
+    "right_shoulder_flexion": [POSE_LANDMARKS["RIGHT_HIP"], POSE_LANDMARKS["RIGHT_SHOULDER"], POSE_LANDMARKS["RIGHT_ELBOW"]],
+    "left_shoulder_abduction": [POSE_LANDMARKS["LEFT_EAR"], POSE_LANDMARKS["LEFT_SHOULDER"], POSE_LANDMARKS["LEFT_ELBOW"]],
+    "right_shoulder_abduction": [POSE_LANDMARKS["RIGHT_EAR"], POSE_LANDMARKS["RIGHT_SHOULDER"], POSE_LANDMARKS["RIGHT_ELBOW"]],
+    "left_elbow": [POSE_LANDMARKS["LEFT_SHOULDER"], POSE_LANDMARKS["LEFT_ELBOW"], POSE_LANDMARKS["LEFT_WRIST"]],
+    "right_elbow": [POSE_LANDMARKS["RIGHT_SHOULDER"], POSE_LANDMARKS["RIGHT_ELBOW"], POSE_LANDMARKS["RIGHT_WRIST"]],
+    "left_hip": [POSE_LANDMARKS["LEFT_SHOULDER"], POSE_LANDMARKS["LEFT_HIP"], POSE_LANDMARKS["LEFT_KNEE"]],
+    "right_hip": [POSE_LANDMARKS["RIGHT_SHOULDER"], POSE_LANDMARKS["RIGHT_HIP"], POSE_LANDMARKS["RIGHT_KNEE"]],
+    "left_knee": [POSE_LANDMARKS["LEFT_HIP"], POSE_LANDMARKS["LEFT_KNEE"], POSE_LANDMARKS["LEFT_ANKLE"]],
+    "right_knee": [POSE_LANDMARKS["RIGHT_HIP"], POSE_LANDMARKS["RIGHT_KNEE"], POSE_LANDMARKS["RIGHT_ANKLE"]],
+    "left_ankle": [POSE_LANDMARKS["LEFT_KNEE"], POSE_LANDMARKS["LEFT_ANKLE"], POSE_LANDMARKS["LEFT_FOOT_INDEX"]],
+    "right_ankle": [POSE_LANDMARKS["RIGHT_KNEE"], POSE_LANDMARKS["RIGHT_ANKLE"], POSE_LANDMARKS["RIGHT_FOOT_INDEX"]]
+}
+
+# Constants
+VISIBILITY_THRESHOLD = 0.7
+VIEW_THRESHOLD = 0.1 # Threshold for determining frontal vs. sagittal body view (shoulder x-difference)
+ELBOW_CUTOFF = 155 # Elbow readings above this are discarded as unreliable
+
+# Compiled joint table for batch angle calculation
+JOINT_TABLE = compile_joint_table(JOINT_LANDMARK_MAP)
+
+# Skeleton connections between pose landmarks (mediapipe.solutions.pose.POSE_CONNECTIONS)
+POSE_CONNECTIONS = (
+    (0, 1), (0, 4), (1, 2), (2, 3), (3, 7), (4, 5), (5, 6), (6, 8), (9, 10), (11, 12), (11, 13),
+    (11, 23), (12, 14), (12, 24), (13, 15), (14, 16), (15, 17), (15, 19), (15, 21), (16, 18),
+    (16, 20), (16, 22), (17, 19), (18, 20), (23, 24), (23, 25), (24, 26), (25, 27), (26, 28),
+    (27, 29), (27, 31), (28, 30), (28, 32), (29, 31), (30, 32),
+)
+
+# Layout of angle labels burned into the video: first baseline and line spacing in pixels
+LABEL_ORIGIN = (10, 30)
+LABEL_LINE_HEIGHT = 40
+
+# Everything the per-frame code needs for a set of active joints, compiled once
+# when the selection changes: the active joint names (in joint table order), their
+# indices into the joint table and a (J,) mask, the landmark indices and (K, 2)
+# skeleton connections to draw, the current and max angle label prefixes and the
+# (x, y) origins of each joint's two label rows
+JointPlan = namedtuple("JointPlan", ["names", "indices", "mask", "landmarks", "connections",
+                                     "labels", "label_origins"])
+
+def joint_label(joint):
+    """Returns the display name of a joint, e.g. "Left Shoulder Flexion"."""
+    return " ".join(word.capitalize() for word in joint.split("_"))
+
+def compile_joint_plan(active_joints, joint_table=JOINT_TABLE):
+    """
+    Compiles the immutable evaluation plan for the active joints. Unknown
+    joint names are ignored.
+    """
+    active = set(active_joints)
+    mask = np.array([joint in active for joint in joint_table.names], dtype=bool)
+    indices = np.flatnonzero(mask)
+    names = tuple(joint_table.names[i] for i in indices)
+    landmarks = np.unique(joint_table.indices[indices]) if indices.size else np.empty(0, dtype=np.intp)
+    drawn = set(landmarks.tolist())
+    connections = np.array([connection for connection in POSE_CONNECTIONS
+                            if connection[0] in drawn and connection[1] in drawn], dtype=np.intp).reshape(-1, 2)
+    x, y = LABEL_ORIGIN
+    rows = y + LABEL_LINE_HEIGHT * np.arange(2 * len(names)).reshape(-1, 2)
+    label_origins = tuple(((x, int(current)), (x, int(maximum))) for current, maximum in rows)
+    for array in (mask, indices, landmarks, connections):
+        array.flags.writeable = False
+    labels = tuple((f"{joint_label(joint)}: ", f"Max {joint_label(joint)}: ") for joint in names)
+    return JointPlan(names, indices, mask, landmarks, connections, labels, label_origins)
+
+ALL_JOINTS_PLAN = compile_joint_plan(JOINT_TABLE.names)
+
+def joint_masks(names):
+    """
+    Returns boolean masks over the joint names for shoulder flexion,
+    shoulder abduction and elbow joints.
+    """
+    flexion = np.array([joint.endswith("_flexion") for joint in names], dtype=bool)
+    abduction = np.array([joint.endswith("_abduction") for joint in names], dtype=bool)
+    elbow = np.array([joint.endswith("_elbow") for joint in names], dtype=bool)
+    return flexion, abduction, elbow
+
+FLEXION_MASK, ABDUCTION_MASK, ELBOW_MASK = joint_masks(JOINT_TABLE.names)
+
+def measure_joint_angles(landmark_array, joint_table=JOINT_TABLE, active_mask=None, world_array=None):
+    """
+    Applies the goniometry measurement rules to a (33, 4) landmark array or
+    an (N, 33, 4) stack of frames.
+
+    From image landmarks, shoulder flexion is only measured in sagittal view
+    and shoulder abduction only in frontal view, judged by the shoulder
+    x-difference. Given the matching world landmark array, angles are
+    measured in 3D in the body's own planes instead, so every joint is
+    measured in any view. A measured joint is valid when its landmarks are
+    visible, it is active and, for elbows, the reading is below ELBOW_CUTOFF.
+    Returns (angles, valid, measured).
+    """
+    landmark_array = np.asarray(landmark_array, dtype=np.float64)
+    if joint_table is JOINT_TABLE:
+        flexion, abduction, elbow = FLEXION_MASK, ABDUCTION_MASK, ELBOW_MASK
+    else:
+        flexion, abduction, elbow = joint_masks(joint_table.names)
+
+    if world_array is not None:
+        angles, visible = calculate_world_joint_angles(world_array, joint_table, VISIBILITY_THRESHOLD)
+        # A degenerate body frame (e.g. overlapping shoulders) leaves NaN angles
+        visible &= ~np.isnan(angles)
+        measured = np.ones(angles.shape, dtype=bool)
+    else:
+        angles, visible = calculate_joint_angles(landmark_array, joint_table, VISIBILITY_THRESHOLD)
+
+        # Determine view (frontal or sagittal) from the shoulder x-difference
+        shoulder_x_diff = np.abs(landmark_array[..., 12, 0] - landmark_array[..., 11, 0])
+        is_frontal_view = (shoulder_x_diff > VIEW_THRESHOLD)[..., np.newaxis]
+        measured = np.where(is_frontal_view, ~flexion, ~abduction)
+
+    valid = measured & visible & ~(elbow & (angles > ELBOW_CUTOFF))
+    if active_mask is not None:
+        valid &= active_mask
+    return angles, valid, measured
@@ -0,0 +1,115 @@
+import math
+
+import numpy as np
+
+NUM_LANDMARKS = 33
+IMAGE_OUTLIER_THRESHOLD = 0.15 # Spike threshold in normalized image units
+# Spike threshold for MediaPipe world landmarks, which are in meters rather
+# than normalized image units; a fast arm covers ~0.15 m between a few frames
+WORLD_OUTLIER_THRESHOLD = 0.3
+
+
+class OneEuroFilter:
+    """
+    Temporal smoothing of pose landmarks with a One Euro filter, vectorized
+    over all landmarks.
+
+    Slow movements are smoothed strongly (min_cutoff Hz) while fast ones pass
+    with little lag (the cutoff grows by beta per unit of speed). Before
+    smoothing, a landmark whose x/y position jumps more than
+    outlier_threshold (normalized image units) away from the median of its
+    last median_window raw positions is treated as a detection spike and replaced with the filtered value. A
+    jump that persists for hysteresis_frames frames is real movement, and the
+    landmark is snapped to the new position. With world=True the landmarks
+    are MediaPipe world landmarks in meters: the jump includes z, since depth
+    is measured rather than estimated, and outlier_threshold defaults to
+    WORLD_OUTLIER_THRESHOLD.
+
+    All filter state lives in one (2 + median_window, N, 3) array: the
+    filtered x/y/z, their filtered derivative, and a ring of recent raw
+    positions. Visibility is passed through unchanged.
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=5.0, d_cutoff=1.0, median_window=5,
+                 outlier_threshold=None, hysteresis_frames=3, num_landmarks=NUM_LANDMARKS, world=False):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.median_window = median_window
+        if outlier_threshold is None:
+            outlier_threshold = WORLD_OUTLIER_THRESHOLD if world else IMAGE_OUTLIER_THRESHOLD
+        self.outlier_threshold = outlier_threshold
+        self._jump_axes = 3 if world else 2
+        self.hysteresis_frames = hysteresis_frames
+        self.state = np.zeros((2 + median_window, num_landmarks, 3), dtype=np.float64)
+        self._outlier_frames = np.zeros(num_landmarks, dtype=np.int32)
+        self._output = np.zeros((num_landmarks, 4), dtype=np.float64)
+        self._samples = 0
+        self._last_time = None
+        self.rejected = 0 # Landmark positions replaced as outliers so far
+
+    def reset(self):
+        """Forgets the filter state, e.g. when the pose is lost."""
+        self._samples = 0
+        self._last_time = None
+        self._outlier_frames[:] = 0
+
+    def filter(self, landmarks, timestamp):
+        """
+        Filters one (N, 4) landmark array (x, y, z, visibility) taken at
+        timestamp seconds. Returns the filtered (N, 4) array, which is
+        reused by the next call.
+        """
+        raw = landmarks[:, :3]
+        position, velocity, history = self.state[0], self.state[1], self.state[2:]
+        output = self._output
+        output[:, 3] = landmarks[:, 3]
+
+        if self._samples == 0 or timestamp <= self._last_time:
+            if self._samples == 0:
+                position[:] = raw
+                velocity[:] = 0.0
+                history[:] = raw
+                self._samples = 1
+                self._last_time = timestamp
+            output[:, :3] = position
+            return output
+
+        # Outlier rejection against the median of the recent raw positions
+        # (the ring starts filled with the first position)
+        median = np.median(history, axis=0)
+        axes = self._jump_axes
+        jumped = np.sqrt(((raw[:, :axes] - median[:, :axes]) ** 2).sum(axis=1)) > self.outlier_threshold
+        self._outlier_frames = np.where(jumped, self._outlier_frames + 1, 0)
+        persistent = self._outlier_frames >= self.hysteresis_frames
+        rejected = jumped & ~persistent
+        self.rejected += int(rejected.sum())
+        measurement = np.where(rejected[:, None], position, raw)
+
+        history[self._samples % self.median_window] = raw
+        self._samples += 1
+
+        dt = timestamp - self._last_time
+        self._last_time = timestamp
+
+        # One Euro: smooth the speed, then the position with a speed-dependent cutoff
+        derivative = (measurement - position) / dt
+        velocity += _alpha(dt, self.d_cutoff) * (derivative - velocity)
+        cutoff = self.min_cutoff + self.beta * np.abs(velocity)
+        position += _alpha(dt, cutoff) * (measurement - position)
+
+        # Landmarks that really moved start over at their new position
+        if persistent.any():
+            position[persistent] = raw[persistent]
+            velocity[persistent] = 0.0
+            history[:, persistent] = raw[persistent]
+            self._outlier_frames[persistent] = 0
+
+        output[:, :3] = position
+        return output
+
+
+def _alpha(dt, cutoff):
+    # Smoothing factor of an exponential filter with the given cutoff frequency
+    tau = 1.0 / (2.0 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
@@ -0,0 +1,322 @@
+import csv
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+
+from joints import JOINT_TABLE
+from rom_analytics import (AGGREGATE_FIELDS, DEFAULT_PERCENTILES, new_aggregate, session_summary,
+                           update_aggregate, visit_percentiles)
+
+DEFAULT_FLUSH_SIZE = 32
+DEFAULT_FLUSH_INTERVAL = 1.0 # Seconds a buffered row may wait before being written
+MAX_CACHED_SESSIONS = 1024 # Sessions whose aggregates are kept in memory
+
+
+class MeasurementStore:
+    """
+    Append-only measurement store backed by SQLite in WAL mode.
+
+    Every row has the same fixed schema: patient and session identifiers,
+    a timestamp (seconds since the epoch), the captured image file and one
+    angle and max angle column per joint, NULL where a joint was not measured.
+    Rows are indexed by patient/session/timestamp and written in buffered
+    batches; query() returns the matching rows as NumPy columns.
+
+    Each written batch is also folded into per-session, per-joint ROM
+    aggregates (see rom_analytics) kept in the session_aggregates table, so
+    session and patient reports never rescan the raw rows. Rows without a
+    session_id are not aggregated, and a session's rows are expected to
+    arrive in timestamp order.
+    """
+
+    def __init__(self, path="measurements.db", joints=JOINT_TABLE.names,
+                 flush_size=DEFAULT_FLUSH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.path = path
+        self.joints = tuple(joints)
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.columns = ["patient_id", "session_id", "timestamp", "image_file"]
+        for joint in self.joints:
+            self.columns += [joint + "_angle", "max_" + joint + "_angle"]
+
+        self._lock = threading.RLock()
+        self._buffer = []
+        self._timer = None
+        self._aggregates = OrderedDict() # session_id -> (patient_id, {joint: aggregate state})
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._create_schema()
+
+    def _create_schema(self):
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS measurements ("
+                "id INTEGER PRIMARY KEY, patient_id TEXT, session_id TEXT, "
+                "timestamp REAL NOT NULL, image_file TEXT)"
+            )
+            # Joints added after the database was created get their columns appended
+            existing = {row[1] for row in self._conn.execute("PRAGMA table_info(measurements)")}
+            for column in self.columns:
+                if column not in existing:
+                    self._conn.execute(f'ALTER TABLE measurements ADD COLUMN "{column}" REAL')
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_measurements_patient_session_time "
+                "ON measurements (patient_id, session_id, timestamp)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_measurements_time ON measurements (timestamp)"
+            )
+            has_aggregates = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'session_aggregates'"
+            ).fetchone()
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS session_aggregates ("
+                "session_id TEXT NOT NULL, joint TEXT NOT NULL, patient_id TEXT, "
+                "samples INTEGER, min_angle REAL, max_angle REAL, start_time REAL, last_time REAL, "
+                "peak_time REAL, repetitions INTEGER, direction INTEGER, extreme REAL, "
+                "PRIMARY KEY (session_id, joint))"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_session_aggregates_patient ON session_aggregates (patient_id)"
+            )
+        if not has_aggregates:
+            # Databases created before aggregation get their aggregates built once
+            self.rebuild_aggregates()
+
+    def append(self, angles, max_angles, image_file=None, timestamp=None, patient_id=None, session_id=None):
+        """
+        Buffers one measurement row. angles and max_angles map joint
+        identifiers to angles; missing or None values are stored as NULL.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        row = [patient_id, session_id, float(timestamp), image_file]
+        for joint in self.joints:
+            angle = angles.get(joint)
+            max_angle = max_angles.get(joint)
+            row.append(float(angle) if angle is not None else None)
+            row.append(float(max_angle) if max_angle is not None else None)
+
+        with self._lock:
+            self._buffer.append(row)
+            if len(self._buffer) >= self.flush_size:
+                self.flush()
+            elif self._timer is None:
+                # Make sure a partially filled buffer is written soon
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Writes all buffered rows in a single transaction."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._buffer:
+                return
+            rows, self._buffer = self._buffer, []
+            column_list = ", ".join(f'"{column}"' for column in self.columns)
+            placeholders = ", ".join("?" for _ in self.columns)
+            with self._conn:
+                self._conn.executemany(
+                    f"INSERT INTO measurements ({column_list}) VALUES ({placeholders})", rows
+                )
+                self._aggregate(rows)
+
+    def _aggregate(self, rows):
+        """Folds rows into their sessions' aggregates and writes the changed ones."""
+        touched = {}
+        for row in rows:
+            patient_id, session_id, timestamp = row[0], row[1], row[2]
+            if session_id is None:
+                continue
+            session = touched.get(session_id)
+            if session is None:
+                session = touched[session_id] = self._session_aggregates(session_id)
+            if patient_id is not None and session[0] != patient_id:
+                session = touched[session_id] = self._aggregates[session_id] = (patient_id, session[1])
+            states = session[1]
+            for joint, angle in zip(self.joints, row[4::2]):
+                if angle is not None:
+                    update_aggregate(states.setdefault(joint, new_aggregate()), timestamp, angle)
+
+        fields = ", ".join(AGGREGATE_FIELDS)
+        placeholders = ", ".join("?" for _ in range(len(AGGREGATE_FIELDS) + 3))
+        self._conn.executemany(
+            f"INSERT OR REPLACE INTO session_aggregates (session_id, joint, patient_id, {fields}) "
+            f"VALUES ({placeholders})",
+            [(session_id, joint, patient_id, *(state[field] for field in AGGREGATE_FIELDS))
+             for session_id, (patient_id, states) in touched.items() for joint, state in states.items()]
+        )
+
+    def _session_aggregates(self, session_id):
+        # Recently written sessions stay in memory; others are loaded once
+        session = self._aggregates.get(session_id)
+        if session is not None:
+            self._aggregates.move_to_end(session_id)
+            return session
+        patient_id, states = None, {}
+        for row in self._conn.execute(
+                f"SELECT joint, patient_id, {', '.join(AGGREGATE_FIELDS)} FROM session_aggregates "
+                "WHERE session_id = ?", (session_id,)):
+            states[row[0]] = dict(zip(AGGREGATE_FIELDS, row[2:]))
+            patient_id = patient_id or row[1]
+        session = self._aggregates[session_id] = (patient_id, states)
+        if len(self._aggregates) > MAX_CACHED_SESSIONS:
+            self._aggregates.popitem(last=False)
+        return session
+
+    def rebuild_aggregates(self):
+        """Recomputes all session aggregates from the stored rows."""
+        with self._lock:
+            self.flush()
+            column_list = ", ".join(f'"{column}"' for column in self.columns)
+            rows = self._conn.execute(
+                f"SELECT {column_list} FROM measurements WHERE session_id IS NOT NULL "
+                "ORDER BY session_id, timestamp"
+            ).fetchall()
+            self._aggregates.clear()
+            with self._conn:
+                self._conn.execute("DELETE FROM session_aggregates")
+                self._aggregate(rows)
+            self._aggregates.clear()
+
+    def session_report(self, session_id):
+        """
+        Returns the ROM report of a session: per-joint samples, min, max, ROM,
+        time to peak (seconds from the joint's first measurement) and
+        repetitions, plus left/right asymmetry. None if nothing is stored.
+        """
+        with self._lock:
+            self.flush()
+            patient_id, states = self._session_aggregates(session_id)
+        if not states:
+            return None
+        return session_summary(session_id, patient_id, states)
+
+    def session_reports(self, patient_id=None, start=None, end=None):
+        """
+        Returns the reports of all aggregated sessions of a patient (or of
+        every patient) that started in [start, end), ordered by start time.
+        """
+        sql = f"SELECT session_id, patient_id, joint, {', '.join(AGGREGATE_FIELDS)} FROM session_aggregates"
+        params = []
+        if patient_id is not None:
+            sql += " WHERE patient_id = ?"
+            params.append(patient_id)
+        with self._lock:
+            self.flush()
+            rows = self._conn.execute(sql, params).fetchall()
+
+        sessions = {}
+        for row in rows:
+            patient, states = sessions.setdefault(row[0], (row[1], {}))
+            states[row[2]] = dict(zip(AGGREGATE_FIELDS, row[3:]))
+        reports = [session_summary(session_id, patient, states) for session_id, (patient, states) in sessions.items()]
+        reports = [report for report in reports
+                   if (start is None or report["start"] >= start) and (end is None or report["start"] < end)]
+        return sorted(reports, key=lambda report: report["start"])
+
+    def patient_report(self, patient_id, percentiles=DEFAULT_PERCENTILES):
+        """
+        Returns a patient's visits (session reports in time order) and, per
+        joint, percentiles of ROM and max angle across the visits.
+        """
+        visits = self.session_reports(patient_id=patient_id)
+        return {
+            "patient_id": patient_id,
+            "visits": visits,
+            "percentiles": visit_percentiles(visits, percentiles),
+        }
+
+    def query(self, patient_id=None, session_id=None, start=None, end=None):
+        """
+        Returns the rows matching the given patient, session and timestamp
+        range [start, end) as a dict of NumPy columns, ordered by timestamp.
+        Angle columns are float arrays with NaN where no angle was stored.
+        """
+        conditions, params = [], []
+        for column, value in (("patient_id", patient_id), ("session_id", session_id)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if start is not None:
+            conditions.append("timestamp >= ?")
+            params.append(float(start))
+        if end is not None:
+            conditions.append("timestamp < ?")
+            params.append(float(end))
+
+        sql = "SELECT " + ", ".join(f'"{column}"' for column in self.columns) + " FROM measurements"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY timestamp"
+
+        with self._lock:
+            self.flush()
+            rows = self._conn.execute(sql, params).fetchall()
+
+        values = list(zip(*rows)) if rows else [()] * len(self.columns)
+        result = {}
+        for column, column_values in zip(self.columns, values):
+            if column in ("patient_id", "session_id", "image_file"):
+                result[column] = np.array(column_values, dtype=object)
+            else:
+                result[column] = np.array(column_values, dtype=np.float64)
+        return result
+
+    def query_rows(self, **filters):
+        """Like query, but returns a list of row dicts with None for missing angles."""
+        columns = self.query(**filters)
+        count = len(columns["timestamp"])
+        rows = []
+        for i in range(count):
+            row = {}
+            for column, values in columns.items():
+                value = values[i]
+                if isinstance(value, float) and np.isnan(value):
+                    value = None
+                row[column] = value.item() if isinstance(value, np.generic) else value
+            rows.append(row)
+        return rows
+
+    def import_csv(self, csv_path, patient_id=None, session_id=None):
+        """
+        Imports rows from a legacy measurements.csv. Rows whose field count
+        does not match the header (written after the joint selection changed)
+        are skipped. Returns (imported, skipped).
+        """
+        imported = skipped = 0
+        with open(csv_path, newline='') as csvfile:
+            reader = csv.reader(csvfile)
+            header = next(reader, None)
+            if header is None:
+                return 0, 0
+            for values in reader:
+                if len(values) != len(header):
+                    skipped += 1
+                    continue
+                record = dict(zip(header, values))
+                angles, max_angles = {}, {}
+                for joint in self.joints:
+                    if record.get(joint + "_angle"):
+                        angles[joint] = float(record[joint + "_angle"])
+                    if record.get("max_" + joint + "_angle"):
+                        max_angles[joint] = float(record["max_" + joint + "_angle"])
+                timestamp = datetime.strptime(record["timestamp"], "%Y%m%d_%H%M%S").timestamp()
+                self.append(angles, max_angles, record.get("image_file"), timestamp, patient_id, session_id)
+                imported += 1
+        self.flush()
+        return imported, skipped
+
+    def close(self):
+        """Flushes any buffered rows and closes the database."""
+        with self._lock:
+            self.flush()
+            self._conn.close()
@@ -0,0 +1,170 @@
+import bisect
+import logging
+import threading
+import time
+
+import numpy as np
+
+from joints import JOINT_TABLE
+
+logger = logging.getLogger(__name__)
+
+# Sub-stages timed inside the inference and encode stages of a camera
+STAGES = ("pose", "filter", "angles", "overlay", "labels", "jpeg")
+# Upper bounds (seconds) of the stage latency histogram buckets
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+
+
+class PipelineMetrics:
+    """
+    Hot-path counters and stage latency histograms of one camera.
+
+    The inference stage of a camera runs one frame at a time and its encode
+    stage runs on a single thread, so every field has a single writer and
+    nothing is locked. Readers may see a frame half counted, which is fine
+    for monitoring. Code that times a stage does so only when the camera has
+    metrics, so disabled metrics cost nothing.
+    """
+
+    def __init__(self, joints=JOINT_TABLE.names):
+        self.joints = tuple(joints)
+        self.stage_buckets = {stage: [0] * (len(BUCKETS) + 1) for stage in STAGES}
+        self.stage_seconds = dict.fromkeys(STAGES, 0.0)
+        self.frames_processed = 0
+        self.pose_frames = 0
+        self.joint_rejections = np.zeros(len(self.joints), dtype=np.int64)
+        self.frames_encoded = 0
+        self.encoded_bytes = 0
+
+    def observe(self, stage, seconds):
+        """Records one stage latency."""
+        self.stage_buckets[stage][bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.stage_seconds[stage] += seconds
+
+    def lap(self, stage, start):
+        """Records the time since start for stage and returns the current time."""
+        now = time.perf_counter()
+        self.observe(stage, now - start)
+        return now
+
+    def count_frame(self, pose_found, rejected=None):
+        """
+        Counts one processed frame. rejected is the (J,) mask of joints that
+        were measured in this view but rejected (landmarks not visible or
+        the angle implausible).
+        """
+        self.frames_processed += 1
+        if pose_found:
+            self.pose_frames += 1
+            if rejected is not None:
+                self.joint_rejections += rejected
+
+    def count_encoded(self, data):
+        if data is not None:
+            self.frames_encoded += 1
+            self.encoded_bytes += len(data)
+
+    def summary(self):
+        """Returns a compact dict of averages for the periodic log line."""
+        stage_ms = {}
+        for stage in STAGES:
+            count = sum(self.stage_buckets[stage])
+            if count:
+                stage_ms[stage] = round(1000.0 * self.stage_seconds[stage] / count, 2)
+        processed = self.frames_processed
+        return {
+            "frames": processed,
+            "pose_ratio": round(self.pose_frames / processed, 3) if processed else 0.0,
+            "avg_ms": stage_ms,
+            "avg_kb": round(self.encoded_bytes / self.frames_encoded / 1024, 1) if self.frames_encoded else 0.0,
+        }
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _escape(value):
+    # Label values escape backslash, double quote and line feed in the text format
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus(cameras, scheduler_stats=None):
+    """
+    Renders the Prometheus text exposition format for
+    cameras, a list of (camera_id, PipelineMetrics, pipeline stats) tuples.
+    """
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            lines.append(f"{name}{labels} {value}")
+
+    metric("goniometry_frames_captured_total", "counter", "Frames read from the camera.",
+           [(_labels(camera=cid), stats.get("capture", {}).get("frames", 0)) for cid, _, stats in cameras])
+    metric("goniometry_frames_dropped_total", "counter", "Stale frames dropped between stages.",
+           [(_labels(camera=cid, stage=stage), stats[stage]["dropped"])
+            for cid, _, stats in cameras for stage in ("inference", "encode") if stage in stats])
+    metric("goniometry_pipeline_stage_avg_seconds", "gauge",
+           "Average busy time per frame of the capture, inference and encode threads.",
+           [(_labels(camera=cid, stage=stage), round(stats[stage]["avg_ms"] / 1000.0, 6))
+            for cid, _, stats in cameras for stage in ("capture", "inference", "encode") if stage in stats])
+    metric("goniometry_frames_processed_total", "counter", "Frames that went through pose inference.",
+           [(_labels(camera=cid), m.frames_processed) for cid, m, _ in cameras])
+    metric("goniometry_pose_frames_total", "counter", "Processed frames with a detected pose.",
+           [(_labels(camera=cid), m.pose_frames) for cid, m, _ in cameras])
+    metric("goniometry_pose_detected_ratio", "gauge", "Share of processed frames with a detected pose.",
+           [(_labels(camera=cid), round(m.pose_frames / m.frames_processed, 4) if m.frames_processed else 0)
+            for cid, m, _ in cameras])
+    metric("goniometry_joint_rejections_total", "counter",
+           "Joint measurements rejected because landmarks were not visible or the angle was implausible.",
+           [(_labels(camera=cid, joint=joint), int(count))
+            for cid, m, _ in cameras for joint, count in zip(m.joints, m.joint_rejections)])
+    metric("goniometry_encoded_frames_total", "counter", "JPEG frames sent to viewers.",
+           [(_labels(camera=cid), m.frames_encoded) for cid, m, _ in cameras])
+    metric("goniometry_encoded_bytes_total", "counter", "JPEG bytes sent to viewers.",
+           [(_labels(camera=cid), m.encoded_bytes) for cid, m, _ in cameras])
+
+    histogram = []
+    for cid, m, _ in cameras:
+        for stage in STAGES:
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), m.stage_buckets[stage]):
+                cumulative += count
+                histogram.append((_labels(camera=cid, stage=stage, le=bound), cumulative))
+    lines.append("# HELP goniometry_stage_seconds Latency of each hot-path stage.")
+    lines.append("# TYPE goniometry_stage_seconds histogram")
+    for labels, value in histogram:
+        lines.append(f"goniometry_stage_seconds_bucket{labels} {value}")
+    for cid, m, _ in cameras:
+        for stage in STAGES:
+            lines.append(f"goniometry_stage_seconds_sum{_labels(camera=cid, stage=stage)} {m.stage_seconds[stage]:.6f}")
+            lines.append(f"goniometry_stage_seconds_count{_labels(camera=cid, stage=stage)} {sum(m.stage_buckets[stage])}")
+
+    if scheduler_stats is not None:
+        metric("goniometry_inference_workers", "gauge", "Inference worker threads.",
+               [("", scheduler_stats["workers"])])
+        metric("goniometry_inference_workers_busy", "gauge", "Inference workers running a frame.",
+               [("", scheduler_stats["busy"])])
+    return "\n".join(lines) + "\n"
+
+
+def start_periodic_log(interval, collect):
+    """
+    Logs collect() (a dict of camera ID -> summary) every interval seconds
+    on a daemon thread.
+    """
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                for camera_id, summary in collect().items():
+                    logger.info("camera %s: %s", camera_id, summary)
+            except Exception:
+                logger.exception("Could not log metrics")
+
+    thread = threading.Thread(target=run, name="metrics-log", daemon=True)
+    thread.start()
+    return thread
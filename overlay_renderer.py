@@ -0,0 +1,128 @@
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+SKELETON_COLOR = (0, 255, 0)
+CURRENT_LABEL_COLOR = (255, 255, 255)
+MAX_LABEL_COLOR = (0, 255, 0)
+MAX_CACHED_GLYPHS = 1024
+
+
+class OverlayRenderer:
+    """
+    Draws the pose skeleton and angle labels onto video frames at a small,
+    nearly constant cost.
+
+    The skeleton is drawn from a landmark array with one cv2.polylines call
+    for all connections and one for all landmark dots. Label text is
+    rendered once into cached anti-aliased glyph masks: the joint name part
+    of a label is rendered when first used, and each angle value only when it
+    first appears. All glyphs of a frame are composed into one mask and
+    blended onto the frame in a single pass.
+    """
+
+    def __init__(self, color=SKELETON_COLOR, thickness=2, point_radius=3,
+                 font=cv2.FONT_HERSHEY_SIMPLEX, font_scale=1.5, font_thickness=3):
+        self.color = color
+        self.thickness = thickness
+        self.point_radius = point_radius
+        self.font = font
+        self.font_scale = font_scale
+        self.font_thickness = font_thickness
+        self._glyphs = OrderedDict() # (text, color) -> (premultiplied, alpha, x offset, y offset, advance)
+        self._buffers = {}
+
+    def draw_skeleton(self, img, landmarks, plan):
+        """
+        Draws the landmarks and connections selected by a joint plan.
+        landmarks is a (33, >=2) array of normalized x, y coordinates.
+        """
+        if not len(plan.landmarks):
+            return img
+        height, width = img.shape[:2]
+        points = np.rint(landmarks[:, :2] * (width, height)).astype(np.int32)
+        if len(plan.connections):
+            cv2.polylines(img, list(points[plan.connections]), False, self.color, self.thickness, cv2.LINE_AA)
+        # A zero-length thick line is a filled dot
+        dots = points[np.repeat(plan.landmarks, 2)].reshape(-1, 2, 2)
+        cv2.polylines(img, list(dots), False, self.color, 2 * self.point_radius, cv2.LINE_AA)
+        return img
+
+    def draw_labels(self, img, labels):
+        """
+        Draws labels, an iterable of (prefix, value, origin, color) where the
+        text is prefix followed by the integer value, at the putText-style
+        baseline origin (x, y). Labels whose value is None are skipped.
+        """
+        placed = []
+        for prefix, value, (x, y), color in labels:
+            if value is None:
+                continue
+            for text in (prefix, str(int(value))):
+                premultiplied, alpha, left, top, advance = self._glyph(text, color)
+                placed.append((premultiplied, alpha, x + left, y + top))
+                x += advance
+        if not placed:
+            return img
+
+        # Compose all glyphs into one region, then blend it once
+        height, width = img.shape[:2]
+        x0 = max(0, min(x for _, _, x, _ in placed))
+        y0 = max(0, min(y for _, _, _, y in placed))
+        x1 = min(width, max(x + alpha.shape[1] for _, alpha, x, _ in placed))
+        y1 = min(height, max(y + alpha.shape[0] for _, alpha, _, y in placed))
+        if x1 <= x0 or y1 <= y0:
+            return img
+        color_layer = self._buffer("color", (y1 - y0, x1 - x0, 3))
+        alpha_layer = self._buffer("alpha", (y1 - y0, x1 - x0, 3))
+        color_layer[:] = 0
+        alpha_layer[:] = 0
+        for premultiplied, alpha, x, y in placed:
+            # Clip the glyph to the region
+            gx0, gy0 = max(x, x0), max(y, y0)
+            gx1, gy1 = min(x + alpha.shape[1], x1), min(y + alpha.shape[0], y1)
+            if gx1 <= gx0 or gy1 <= gy0:
+                continue
+            glyph = (slice(gy0 - y, gy1 - y), slice(gx0 - x, gx1 - x))
+            region = (slice(gy0 - y0, gy1 - y0), slice(gx0 - x0, gx1 - x0))
+            cv2.max(color_layer[region], premultiplied[glyph], dst=color_layer[region])
+            cv2.max(alpha_layer[region], alpha[glyph], dst=alpha_layer[region])
+
+        # roi = roi * (1 - alpha) + color * alpha, with the color premultiplied
+        roi = img[y0:y1, x0:x1]
+        cv2.multiply(roi, cv2.bitwise_not(alpha_layer), dst=roi, scale=1 / 255)
+        cv2.add(roi, color_layer, dst=roi)
+        return img
+
+    def glyph_count(self):
+        return len(self._glyphs)
+
+    def _glyph(self, text, color):
+        key = (text, tuple(color))
+        glyph = self._glyphs.get(key)
+        if glyph is not None:
+            self._glyphs.move_to_end(key)
+            return glyph
+        (width, height), baseline = cv2.getTextSize(text, self.font, self.font_scale, self.font_thickness)
+        pad = self.font_thickness
+        canvas = np.zeros((height + baseline + 2 * pad, width + 2 * pad), dtype=np.uint8)
+        cv2.putText(canvas, text, (pad, height + pad), self.font, self.font_scale, 255,
+                    self.font_thickness, cv2.LINE_AA)
+        # Crop to the ink and keep its offset from the baseline origin
+        left, top, ink_width, ink_height = cv2.boundingRect(canvas)
+        alpha = cv2.cvtColor(canvas[top:top + ink_height, left:left + ink_width], cv2.COLOR_GRAY2BGR)
+        premultiplied = cv2.multiply(alpha, np.full_like(alpha, color), scale=1 / 255)
+        for array in (premultiplied, alpha):
+            array.flags.writeable = False
+        glyph = (premultiplied, alpha, left - pad, top - height - pad, width)
+        self._glyphs[key] = glyph
+        if len(self._glyphs) > MAX_CACHED_GLYPHS:
+            self._glyphs.popitem(last=False)
+        return glyph
+
+    def _buffer(self, name, shape):
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.shape != shape:
+            buffer = self._buffers[name] = np.zeros(shape, dtype=np.uint8)
+        return buffer
@@ -1,76 +1,480 @@
 
+import logging
+import threading
+import time
+from types import SimpleNamespace
+
 import cv2
-import mediapipe as mp
+import numpy as np
+
+from angle_calculator import compile_joint_table, landmarks_to_array
+from joints import JOINT_LANDMARK_MAP, JOINT_TABLE, compile_joint_plan
+from overlay_renderer import OverlayRenderer
+
+logger = logging.getLogger(__name__)
+
+# MediaPipe Pose model complexities, lightest first
+MODEL_COMPLEXITIES = (0, 1, 2)
+
+def _is_number(value):
+    # bool is an int subclass, but true/false are not valid settings
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+class TierController:
+    """
+    Picks the heaviest model complexity whose inference time still fits the
+    frame budget of target_fps.
+
+    The tiers are measured on live frames: when the current tier's average
+    inference time exceeds the budget, the next lighter tier is used; when
+    the next heavier tier is estimated to fit within margin of the budget,
+    it is tried. The estimate scales the current time by the cost ratio
+    between the two tiers, learned whenever the controller moves between
+    them (default_ratio until then), so it follows changes in host load.
+    """
+
+    def __init__(self, target_fps=15.0, interval=2.0, margin=0.8, default_ratio=2.0):
+        self.target_fps = target_fps
+        self.interval = interval
+        self.margin = margin
+        self.default_ratio = default_ratio
+        self.ratios = {} # complexity -> inference time of the next tier / this tier
+        self._previous = None # (complexity, inference ms) of the last update
+
+    def update(self, complexity, inference_ms, available=MODEL_COMPLEXITIES):
+        """
+        Returns the complexity to use given the current one, its average
+        inference time in milliseconds and the complexities that can be loaded.
+        """
+        previous, self._previous = self._previous, (complexity, inference_ms)
+        if previous is not None and abs(previous[0] - complexity) == 1:
+            (low, low_ms), (high, high_ms) = sorted([previous, (complexity, inference_ms)])
+            if low_ms > 0:
+                self.ratios[low] = high_ms / low_ms
+
+        budget_ms = 1000.0 / self.target_fps
+        lighter = [tier for tier in available if tier < complexity]
+        heavier = [tier for tier in available if tier > complexity]
+        if inference_ms > budget_ms:
+            return max(lighter) if lighter else complexity
+        if heavier:
+            target = min(heavier)
+            estimate = inference_ms
+            for tier in range(complexity, target):
+                estimate *= self.ratios.get(tier, self.default_ratio)
+            if estimate < self.margin * budget_ms:
+                return target
+        return complexity
 
 class PoseDetector:
     """
     A class to detect human poses in an image or video stream using MediaPipe.
     """
 
-    def __init__(self, mode=False, complexity=1, smooth=True, detection_con=0.5, track_con=0.5):
+    def __init__(self, mode=False, complexity=1, smooth=True, detection_con=0.5, track_con=0.5,
+                 roi_tracking=False, inference_size=None, roi_margin=0.2,
+                 inference_interval=1, motion_threshold=None, tier_controller=None):
         """
         Initializes the PoseDetector with MediaPipe Pose.
+
+        With roi_tracking, inference runs on a square crop around the person
+        found in the previous frame instead of the whole image. inference_size
+        caps the longest side of the image handed to MediaPipe; larger
+        images or crops are downscaled first. Landmarks are always reported
+        in full-frame coordinates.
+
+        inference_interval=k runs MediaPipe on every k-th frame only; the
+        frames in between get landmarks extrapolated at constant velocity from
+        the last two keyframes. With a motion_threshold, inference instead runs
+        whenever the image changed by more than the threshold (mean absolute
+        difference of small grayscale thumbnails, 0-255), and at least every
+        inference_interval frames.
+
+        MediaPipe is imported and the pose graph built by the first frame
+        processed, or ahead of time by load(). With a TierController, the
+        model complexity follows the measured inference time.
+        """
+        self.pose_options = dict(static_image_mode=mode,
+                                 model_complexity=complexity,
+                                 smooth_landmarks=smooth,
+                                 min_detection_confidence=detection_con,
+                                 min_tracking_confidence=track_con)
+        self.pose = None
+        self._pending_pose = None # Graph built for new options, swapped in by the next frame
+        self._load_lock = threading.Lock()
+        self.tier_controller = tier_controller
+        self.unavailable_tiers = set() # Complexities whose model could not be loaded
+        self._switching = False
+        self._inference_time = 0.0
+        self._frame_inference = 0.0 # Time spent in MediaPipe for the current frame
+        self._window_time = 0.0
+        self._window_inferences = 0
+        self._window_start = None
+        self.renderer = OverlayRenderer()
+
+        self.roi_tracking = roi_tracking
+        self.inference_size = inference_size
+        self.roi_margin = roi_margin
+        self.roi = None # (x, y, side) of the current square crop in pixels
+        self.results = None
+        # Preallocated resize/RGB buffers, reused while the input shape stays the same
+        self._buffers = {}
+
+        self.inference_interval = max(1, int(inference_interval))
+        self.motion_threshold = motion_threshold
+        self.frame_count = 0
+        self.inference_count = 0
+        self._keyframes = [] # Last two (frame number, (33, 4) landmark array) keyframes
+        self._key_thumbnail = None
+        self._started = None
+
+    @property
+    def ready(self):
+        """Whether the pose graph is loaded, so the next frame runs at full speed."""
+        return self.pose is not None
+
+    def load(self):
+        """
+        Imports MediaPipe and builds the pose graph if that has not happened
+        yet, then runs it once on a blank image so its one-time setup does not
+        delay the first real frame. Safe to call from any thread, e.g. to warm
+        the detector up in the background.
+        """
+        with self._load_lock:
+            if self.pose is None:
+                self.pose = self._build(self.pose_options)
+                self._reset_window()
+        return self.pose
+
+    def configure(self, complexity=None, detection_con=None, track_con=None, auto=None, target_fps=None):
+        """
+        Changes the model complexity (0, 1 or 2), the detection and tracking
+        confidence thresholds, whether the complexity is picked automatically
+        and the frame rate it targets; arguments left as None are kept. A loaded detector
+        builds the new pose graph on the calling thread and switches to it on
+        its next frame, so the stream keeps running meanwhile. Raises
+        ValueError for invalid settings and RuntimeError if the model cannot
+        be loaded.
+        """
+        options = dict(self.pose_options)
+        if complexity is not None:
+            if isinstance(complexity, bool) or complexity not in MODEL_COMPLEXITIES:
+                raise ValueError(f"Model complexity must be one of {MODEL_COMPLEXITIES}")
+            options["model_complexity"] = int(complexity)
+        for key, value in (("min_detection_confidence", detection_con), ("min_tracking_confidence", track_con)):
+            if value is not None:
+                if not _is_number(value) or not 0.0 <= value <= 1.0:
+                    raise ValueError("Confidence thresholds must be numbers between 0 and 1")
+                options[key] = float(value)
+        if target_fps is not None and (not _is_number(target_fps) or not 0 < target_fps < float("inf")):
+            raise ValueError("Target FPS must be a positive number")
+        if auto is not None and not isinstance(auto, bool):
+            raise ValueError("auto must be true or false")
+        if auto is not None:
+            self.tier_controller = (self.tier_controller or TierController()) if auto else None
+        if target_fps is not None and self.tier_controller is not None:
+            self.tier_controller.target_fps = float(target_fps)
+        if options != self.pose_options:
+            self._prepare(options)
+
+    def model_stats(self):
+        """
+        Returns the pose model settings and the average inference time.
+        """
+        options = self.pose_options
+        return {
+            "complexity": options["model_complexity"],
+            "detection_confidence": options["min_detection_confidence"],
+            "tracking_confidence": options["min_tracking_confidence"],
+            "auto": self.tier_controller is not None,
+            "target_fps": self.tier_controller.target_fps if self.tier_controller is not None else None,
+            "unavailable_complexities": sorted(self.unavailable_tiers),
+            "loaded": self.ready,
+            "avg_inference_ms": 1000.0 * self._inference_time / self.inference_count if self.inference_count else 0.0,
+        }
+
+    def _build(self, options):
+        import mediapipe as mp
+        pose = mp.solutions.pose.Pose(**options)
+        pose.process(np.zeros((64, 64, 3), dtype=np.uint8))
+        return pose
+
+    def _prepare(self, options):
+        """Builds the graph for new options and queues it for the next frame."""
+        with self._load_lock:
+            if self.pose is None:
+                # Not loaded yet; load() picks the options up
+                self.pose_options = options
+                return
+        try:
+            pose = self._build(options)
+        except Exception as e:
+            raise RuntimeError(f"Could not load the pose model (complexity {options['model_complexity']}): {e}") from e
+        with self._load_lock:
+            replaced, self._pending_pose = self._pending_pose, pose
+            self.pose_options = options
+        if replaced is not None:
+            replaced.close()
+
+    def _swap_pose(self):
+        # Runs on the inference thread, so the old graph is not in use
+        with self._load_lock:
+            old, self.pose, self._pending_pose = self.pose, self._pending_pose, None
+        old.close()
+        self._reset_window()
+
+    def _reset_window(self):
+        # Samples taken before a load or swap do not describe the current graph
+        self._window_time = 0.0
+        self._window_inferences = 0
+        self._window_start = None
+
+    def _adapt(self, seconds):
+        """
+        Feeds one frame's MediaPipe time to the tier controller and switches
+        tiers in the background. A window starts with its first inference, so
+        idle time before it does not cut the window short.
         """
-        self.mp_pose = mp.solutions.pose
-        self.pose = self.mp_pose.Pose(static_image_mode=mode,
-                                      model_complexity=complexity,
-                                      smooth_landmarks=smooth,
-                                      min_detection_confidence=detection_con,
-                                      min_tracking_confidence=track_con)
-        self.mp_draw = mp.solutions.drawing_utils
-        # Define drawing specs once to avoid creating them on every frame
-        self.visible_spec = self.mp_draw.DrawingSpec(color=(0, 255, 0), thickness=2, circle_radius=2)
-        self.invisible_spec = self.mp_draw.DrawingSpec(color=(0, 0, 0), thickness=0, circle_radius=0)
+        self._inference_time += seconds
+        controller = self.tier_controller
+        if controller is None:
+            return
+        if self._window_start is None:
+            self._window_start = time.perf_counter()
+        self._window_time += seconds
+        self._window_inferences += 1
+        if self._switching or time.perf_counter() - self._window_start < controller.interval:
+            return
+        current = self.pose_options["model_complexity"]
+        available = [tier for tier in MODEL_COMPLEXITIES if tier not in self.unavailable_tiers]
+        complexity = controller.update(current, 1000.0 * self._window_time / self._window_inferences, available)
+        self._reset_window()
+        if complexity != current:
+            self._switching = True
+            threading.Thread(target=self._switch_tier, args=(complexity,), name="pose-tier", daemon=True).start()
 
+    def _switch_tier(self, complexity):
+        try:
+            self._prepare(dict(self.pose_options, model_complexity=complexity))
+            logger.info("Switched pose model complexity to %d", complexity)
+        except RuntimeError:
+            logger.exception("Pose model complexity %d is unavailable", complexity)
+            self.unavailable_tiers.add(complexity)
+        finally:
+            self._switching = False
 
     def find_pose(self, img, active_joints, joint_landmark_map, draw=True):
         """
         Finds the pose in an image and draws the landmarks and connections.
         Conditionally draws based on active_joints.
         """
-        img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        self.results = self.pose.process(img_rgb)
+        self.process(img)
 
         if self.results.pose_landmarks and draw:
-            # Determine which landmarks and connections should be visible
-            visible_landmarks_indices = set()
-            for joint_id in active_joints:
-                if joint_id in joint_landmark_map:
-                    visible_landmarks_indices.update(joint_landmark_map[joint_id])
-
-            # Create a filtered list of connections to draw
-            visible_connections = [
-                connection for connection in self.mp_pose.POSE_CONNECTIONS
-                if connection[0] in visible_landmarks_indices and connection[1] in visible_landmarks_indices
-            ]
-            
-            # Draw only the visible landmarks by iterating and drawing one by one
-            # This is necessary because draw_landmarks doesn't support hiding individual landmarks easily
-            for idx, landmark in enumerate(self.results.pose_landmarks.landmark):
-                if idx in visible_landmarks_indices:
-                    cv2.circle(img, (int(landmark.x * img.shape[1]), int(landmark.y * img.shape[0])),
-                               radius=3, color=(0, 255, 0), thickness=-1)
-
-            # Draw only the visible connections
-            self.mp_draw.draw_landmarks(
-                img,
-                self.results.pose_landmarks,
-                connections=visible_connections,
-                # landmark_drawing_spec is None because we drew them manually
-                connection_drawing_spec=self.visible_spec
-            )
+            self.draw_pose(img, self.results.pose_landmarks, active_joints, joint_landmark_map)
         
         return img
 
+    def process(self, img):
+        """
+        Finds the pose in a BGR image, either by running inference or, between
+        keyframes, by extrapolating the last keyframes' landmarks. Stores and
+        returns the results with landmarks in full-frame coordinates.
+        """
+        if self._started is None:
+            self._started = time.perf_counter()
+        self.frame_count += 1
+
+        thumbnail = None
+        if self.motion_threshold is not None:
+            thumbnail = cv2.resize(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY), (64, 48),
+                                   interpolation=cv2.INTER_AREA).astype(np.int16)
+        if not self._should_infer(thumbnail):
+            self.results = self._extrapolate()
+            return self.results
+
+        self.inference_count += 1
+        self._key_thumbnail = thumbnail
+        # Only MediaPipe itself is timed, not loading or swapping graphs
+        self._frame_inference = 0.0
+        self._infer(img)
+        self._adapt(self._frame_inference)
+        if self.results.pose_landmarks:
+            array = landmarks_to_array(self.results.pose_landmarks.landmark)
+            world = getattr(self.results, "pose_world_landmarks", None)
+            world_array = landmarks_to_array(world.landmark) if world else None
+            self._keyframes = (self._keyframes + [(self.frame_count, array, world_array)])[-2:]
+        else:
+            self._keyframes = []
+        return self.results
+
+    def inference_stats(self):
+        """
+        Returns the skip policy and how often inference actually runs.
+        """
+        elapsed = time.perf_counter() - self._started if self._started is not None else 0.0
+        return {
+            "policy": "motion" if self.motion_threshold is not None else "interval",
+            "inference_interval": self.inference_interval,
+            "motion_threshold": self.motion_threshold,
+            "frames": self.frame_count,
+            "inferences": self.inference_count,
+            "inference_ratio": self.inference_count / self.frame_count if self.frame_count else 0.0,
+            "inference_fps": self.inference_count / elapsed if elapsed > 0 else 0.0,
+        }
+
+    def _should_infer(self, thumbnail):
+        if not self._keyframes:
+            return True
+        if self.frame_count - self._keyframes[-1][0] >= self.inference_interval:
+            return True
+        if thumbnail is not None and self._key_thumbnail is not None:
+            return np.mean(np.abs(thumbnail - self._key_thumbnail)) > self.motion_threshold
+        return False
+
+    def _extrapolate(self):
+        """
+        Predicts this frame's image and world landmarks at constant velocity
+        from the last two keyframes.
+        """
+        predicted = []
+        for slot in (1, 2):
+            frame, landmarks = self._keyframes[-1][0], self._keyframes[-1][slot]
+            if landmarks is not None and len(self._keyframes) == 2 and self._keyframes[0][slot] is not None:
+                previous_frame, previous = self._keyframes[0][0], self._keyframes[0][slot]
+                velocity = (landmarks[:, :3] - previous[:, :3]) / (frame - previous_frame)
+                landmarks = landmarks.copy()
+                landmarks[:, :3] += velocity * (self.frame_count - frame)
+            predicted.append(landmarks)
+        landmarks, world = predicted
+
+        # Only reached after a keyframe, so MediaPipe is already imported
+        from mediapipe.framework.formats import landmark_pb2
+        pose_landmarks = landmark_pb2.NormalizedLandmarkList(landmark=[
+            landmark_pb2.NormalizedLandmark(x=x, y=y, z=z, visibility=visibility)
+            for x, y, z, visibility in landmarks
+        ])
+        pose_world_landmarks = None
+        if world is not None:
+            pose_world_landmarks = landmark_pb2.LandmarkList(landmark=[
+                landmark_pb2.Landmark(x=x, y=y, z=z, visibility=visibility)
+                for x, y, z, visibility in world
+            ])
+        return SimpleNamespace(pose_landmarks=pose_landmarks, pose_world_landmarks=pose_world_landmarks)
+
+    def _infer(self, img):
+        if self._pending_pose is not None:
+            self._swap_pose()
+        roi = self.roi if self.roi_tracking else None
+        self.results = self._process_region(img, roi)
+        if roi is not None and not self.results.pose_landmarks:
+            # The person left the tracked region; search the whole frame again
+            self.results = self._process_region(img, None)
+        if self.roi_tracking:
+            self._update_roi(img.shape[1], img.shape[0])
+
+    def _buffer(self, name, shape):
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.shape != shape:
+            buffer = self._buffers[name] = np.empty(shape, dtype=np.uint8)
+        return buffer
+
+    def _process_region(self, img, roi):
+        height, width = img.shape[:2]
+        if roi is None:
+            x, y, region_width, region_height = 0, 0, width, height
+        else:
+            x, y, side = roi
+            region_width = region_height = side
+        region = img[y:y + region_height, x:x + region_width]
+
+        # Downscale so the longest side fits the inference size
+        if self.inference_size and max(region_width, region_height) > self.inference_size:
+            scale = self.inference_size / max(region_width, region_height)
+            size = (max(1, round(region_width * scale)), max(1, round(region_height * scale)))
+            region = cv2.resize(region, size, dst=self._buffer("resized", (size[1], size[0], 3)),
+                                interpolation=cv2.INTER_AREA)
+
+        img_rgb = cv2.cvtColor(region, cv2.COLOR_BGR2RGB, dst=self._buffer("rgb", region.shape))
+        pose = self.pose if self.pose is not None else self.load()
+        start = time.perf_counter()
+        results = pose.process(img_rgb)
+        self._frame_inference += time.perf_counter() - start
+
+        # Map crop-relative landmarks back to full-frame normalized coordinates
+        if results.pose_landmarks and roi is not None:
+            for landmark in results.pose_landmarks.landmark:
+                landmark.x = (x + landmark.x * region_width) / width
+                landmark.y = (y + landmark.y * region_height) / height
+                landmark.z = landmark.z * region_width / width
+        return results
+
+    def _update_roi(self, width, height):
+        """
+        Updates the square crop from the current landmarks. The crop only moves
+        when the person's bounding box leaves its inner area or becomes much
+        smaller than the crop, so MediaPipe sees a stable image region.
+        """
+        if not self.results.pose_landmarks:
+            self.roi = None
+            return
+
+        points = np.array([(lm.x, lm.y) for lm in self.results.pose_landmarks.landmark])
+        points = np.clip(points, 0.0, 1.0) * (width, height)
+        (x0, y0), (x1, y1) = points.min(axis=0), points.max(axis=0)
+        box_side = max(x1 - x0, y1 - y0)
+
+        if self.roi is not None:
+            x, y, side = self.roi
+            inset = side * self.roi_margin / 2
+            inside = (x0 >= x + inset and y0 >= y + inset and
+                      x1 <= x + side - inset and y1 <= y + side - inset)
+            if inside and box_side * (1 + 2 * self.roi_margin) > 0.6 * side:
+                return
+
+        side = int(min(box_side * (1 + 2 * self.roi_margin), width, height))
+        if side < 32:
+            self.roi = None
+            return
+        center_x, center_y = (x0 + x1) / 2, (y0 + y1) / 2
+        x = int(np.clip(center_x - side / 2, 0, width - side))
+        y = int(np.clip(center_y - side / 2, 0, height - side))
+        self.roi = (x, y, side)
+
+    def draw_pose(self, img, pose_landmarks, active_joints, joint_landmark_map):
+        """
+        Draws the landmarks and connections of the active joints onto an image.
+        Takes the landmarks explicitly so drawing can run apart from inference.
+        Per-frame callers should compile the joint plan once and use draw_plan.
+        """
+        table = JOINT_TABLE if joint_landmark_map is JOINT_LANDMARK_MAP else compile_joint_table(joint_landmark_map)
+        return self.draw_plan(img, pose_landmarks, compile_joint_plan(active_joints, table))
+
+    def draw_plan(self, img, pose_landmarks, plan):
+        """
+        Draws the landmarks and skeleton connections selected by a compiled
+        joint plan onto an image.
+        """
+        return self.renderer.draw_skeleton(img, landmarks_to_array(pose_landmarks.landmark), plan)
+
+    def find_landmark_array(self, img):
+        """
+        Runs pose detection on an image without drawing.
+        Returns a (33, 4) array of x, y, z and visibility, or None if no pose was found.
+        """
+        self.process(img)
+        if not self.results.pose_landmarks:
+            return None
+        return landmarks_to_array(self.results.pose_landmarks.landmark)
+
     def find_landmarks(self, img):
         """
         Finds the pose landmarks in an image without drawing.
         Returns the list of landmarks.
         """
-        if not hasattr(self, 'results') or self.results is None:
+        if self.results is None:
             # Process the image if landmarks haven't been found yet
-            img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-            self.results = self.pose.process(img_rgb)
+            self.process(img)
 
         landmarks = []
         if self.results.pose_landmarks:
@@ -0,0 +1,125 @@
+import numpy as np
+
+# A movement reverses when the angle comes back this many degrees from its
+# last extreme; a rise followed by such a fall counts as one repetition
+REPETITION_THRESHOLD = 20.0
+DEFAULT_PERCENTILES = (25, 50, 75)
+
+# Running per-session, per-joint state kept by the measurement store. It is
+# updated one sample at a time in timestamp order, so no raw rows are rescanned.
+AGGREGATE_FIELDS = ("samples", "min_angle", "max_angle", "start_time", "last_time", "peak_time",
+                    "repetitions", "direction", "extreme")
+
+
+def new_aggregate():
+    state = dict.fromkeys(AGGREGATE_FIELDS)
+    state.update(samples=0, repetitions=0, direction=0)
+    return state
+
+
+def update_aggregate(state, timestamp, angle, threshold=REPETITION_THRESHOLD):
+    """
+    Folds one measured angle into a joint's aggregate state: sample count,
+    min/max, the time the max was reached and the repetition count.
+    """
+    if state["samples"] == 0:
+        state.update(samples=1, min_angle=angle, max_angle=angle, start_time=timestamp,
+                     last_time=timestamp, peak_time=timestamp, extreme=angle)
+        return state
+    state["samples"] += 1
+    state["last_time"] = timestamp
+    if angle < state["min_angle"]:
+        state["min_angle"] = angle
+    if angle > state["max_angle"]:
+        state["max_angle"] = angle
+        state["peak_time"] = timestamp
+
+    # Repetitions: track the current extreme of the movement direction and
+    # flip direction when the angle reverses by threshold
+    direction, extreme = state["direction"], state["extreme"]
+    if direction == 0:
+        if angle >= state["min_angle"] + threshold:
+            direction, extreme = 1, angle
+        elif angle <= state["max_angle"] - threshold:
+            direction, extreme = -1, angle
+    elif direction == 1:
+        if angle > extreme:
+            extreme = angle
+        elif extreme - angle >= threshold:
+            state["repetitions"] += 1
+            direction, extreme = -1, angle
+    else:
+        if angle < extreme:
+            extreme = angle
+        elif angle - extreme >= threshold:
+            direction, extreme = 1, angle
+    state["direction"], state["extreme"] = direction, extreme
+    return state
+
+
+def joint_summary(state):
+    """Returns the reported figures of one joint's aggregate state."""
+    return {
+        "samples": state["samples"],
+        "min": state["min_angle"],
+        "max": state["max_angle"],
+        "rom": state["max_angle"] - state["min_angle"],
+        "time_to_peak": state["peak_time"] - state["start_time"],
+        "repetitions": state["repetitions"],
+    }
+
+
+def asymmetry(joints):
+    """
+    Compares the ROM of every left/right joint pair in a {joint: summary}
+    dict. The asymmetry is the ROM difference in percent of the larger ROM.
+    """
+    pairs = {}
+    for joint, left in joints.items():
+        if not joint.startswith("left_"):
+            continue
+        movement = joint[len("left_"):]
+        right = joints.get("right_" + movement)
+        if right is None:
+            continue
+        larger = max(left["rom"], right["rom"])
+        pairs[movement] = {
+            "left_rom": left["rom"],
+            "right_rom": right["rom"],
+            "asymmetry_pct": 100.0 * abs(left["rom"] - right["rom"]) / larger if larger > 0 else 0.0,
+        }
+    return pairs
+
+
+def session_summary(session_id, patient_id, states):
+    """Builds the report of one session from its {joint: aggregate state} dict."""
+    joints = {joint: joint_summary(state) for joint, state in states.items() if state["samples"]}
+    return {
+        "session_id": session_id,
+        "patient_id": patient_id,
+        "start": min((state["start_time"] for state in states.values() if state["samples"]), default=None),
+        "end": max((state["last_time"] for state in states.values() if state["samples"]), default=None),
+        "joints": joints,
+        "asymmetry": asymmetry(joints),
+    }
+
+
+def visit_percentiles(sessions, percentiles=DEFAULT_PERCENTILES):
+    """
+    Returns, per joint, the given percentiles of ROM and max angle across
+    session summaries (a patient's visits).
+    """
+    values = {}
+    for session in sessions:
+        for joint, summary in session["joints"].items():
+            values.setdefault(joint, []).append((summary["rom"], summary["max"]))
+    result = {}
+    for joint, pairs in values.items():
+        array = np.array(pairs, dtype=np.float64)
+        rom, max_angle = np.percentile(array, percentiles, axis=0).T
+        result[joint] = {
+            "visits": len(pairs),
+            "rom": {f"p{p:g}": round(float(v), 2) for p, v in zip(percentiles, rom)},
+            "max": {f"p{p:g}": round(float(v), 2) for p, v in zip(percentiles, max_angle)},
+        }
+    return result
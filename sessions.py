@@ -0,0 +1,161 @@
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from angle_calculator import compile_joint_table
+from joints import JOINT_LANDMARK_MAP, JOINT_TABLE, compile_joint_plan
+
+DEFAULT_IDLE_TIMEOUT = 30 * 60 # Seconds without activity before a session is evicted
+
+
+class AssessmentSession:
+    """
+    State of one patient assessment: the joints being measured, the per-joint
+    max/min angles (and so the range of motion) seen during the session and
+    the captures taken. Angles are kept as compact float32 arrays in joint
+    table order. update() (camera inference thread) and reset() (requests)
+    change them in place under the session lock; readers see each joint's
+    latest value without locking.
+    """
+
+    def __init__(self, session_id, camera_id, joints=JOINT_TABLE.names, patient_id=None, active_joints=None):
+        self.session_id = session_id
+        self.camera_id = camera_id
+        self.patient_id = patient_id
+        self.joints = tuple(joints)
+        self._table = JOINT_TABLE if self.joints == JOINT_TABLE.names else compile_joint_table(JOINT_LANDMARK_MAP, self.joints)
+        self.created = time.time()
+        self.last_seen = time.monotonic()
+        self.captures = []
+        self.closed = False
+        self._lock = threading.Lock()
+        self.set_active_joints(self.joints if active_joints is None else active_joints)
+        self.max_angles = np.full(len(self.joints), np.nan, dtype=np.float32)
+        self.min_angles = np.full(len(self.joints), np.nan, dtype=np.float32)
+
+    def set_active_joints(self, active_joints):
+        """
+        Selects the joints measured in this session, compiling their joint
+        plan; unknown names are ignored.
+        """
+        self.plan = compile_joint_plan(active_joints, self._table)
+        self.active_joints = list(self.plan.names)
+        self.active_mask = self.plan.mask
+
+    def reset(self):
+        """Clears the max/min angles, e.g. before measuring the next movement."""
+        with self._lock:
+            self.max_angles.fill(np.nan)
+            self.min_angles.fill(np.nan)
+
+    def update(self, angles, valid):
+        """Folds one frame's (J,) angles into the max/min of the valid, active joints."""
+        values = np.where(valid & self.active_mask, angles, np.nan)
+        with self._lock:
+            np.fmax(self.max_angles, values, out=self.max_angles)
+            np.fmin(self.min_angles, values, out=self.min_angles)
+
+    @property
+    def rom(self):
+        """Range of motion (max - min) per joint, NaN where not measured."""
+        return self.max_angles - self.min_angles
+
+    def touch(self):
+        self.last_seen = time.monotonic()
+
+    def add_capture(self, capture_id):
+        self.captures.append({"capture_id": capture_id, "timestamp": time.time()})
+
+    def angle_dict(self, values):
+        """Maps a (J,) array to {joint: angle} for the active joints with a value."""
+        return {joint: float(value) for joint, value, active in zip(self.joints, values, self.active_mask)
+                if active and not np.isnan(value)}
+
+    def summary(self):
+        return {
+            "session_id": self.session_id,
+            "camera_id": self.camera_id,
+            "patient_id": self.patient_id,
+            "created": self.created,
+            "active_joints": self.active_joints,
+            "max_angles": self.angle_dict(self.max_angles),
+            "min_angles": self.angle_dict(self.min_angles),
+            "rom": self.angle_dict(self.rom),
+            "captures": list(self.captures),
+        }
+
+
+class SessionManager:
+    """
+    Registry of open assessment sessions with O(1) lookup by ID. Sessions
+    that have not been touched for idle_timeout seconds are evicted when
+    sessions are created or looked up, at most once every tenth of the
+    timeout so lookups stay cheap; pinned sessions are kept. on_close(session)
+    is called for every closed or evicted session.
+    """
+
+    def __init__(self, idle_timeout=DEFAULT_IDLE_TIMEOUT, on_close=None):
+        self.idle_timeout = idle_timeout
+        self._on_close = on_close
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._pinned = set()
+        self._next_eviction = time.monotonic() + idle_timeout / 10
+
+    def create(self, camera_id, patient_id=None, active_joints=None, session_id=None, pinned=False):
+        """Opens a new session on a camera and returns it."""
+        session = AssessmentSession(session_id or uuid.uuid4().hex[:12], camera_id,
+                                    patient_id=patient_id, active_joints=active_joints)
+        with self._lock:
+            if session.session_id in self._sessions:
+                raise ValueError(f"Session {session.session_id!r} already exists")
+            self._sessions[session.session_id] = session
+            if pinned:
+                self._pinned.add(session.session_id)
+        self._maybe_evict()
+        return session
+
+    def get(self, session_id):
+        """Returns an open session and marks it as active, or None."""
+        self._maybe_evict()
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.touch()
+        return session
+
+    def close(self, session_id):
+        """Closes a session. Returns it, or None if it was not open."""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            self._pinned.discard(session_id)
+        if session is not None and self._on_close is not None:
+            self._on_close(session)
+        return session
+
+    def sessions(self):
+        with self._lock:
+            return list(self._sessions.values())
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def evict_idle(self, now=None):
+        """Closes the sessions idle for longer than idle_timeout. Returns how many."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            evicted = [session for session_id, session in self._sessions.items()
+                       if session_id not in self._pinned and now - session.last_seen > self.idle_timeout]
+            for session in evicted:
+                del self._sessions[session.session_id]
+        for session in evicted:
+            if self._on_close is not None:
+                self._on_close(session)
+        return len(evicted)
+
+    def _maybe_evict(self):
+        now = time.monotonic()
+        if now >= self._next_eviction:
+            self._next_eviction = now + self.idle_timeout / 10
+            self.evict_idle(now)
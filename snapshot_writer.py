@@ -0,0 +1,120 @@
+import logging
+import os
+import queue
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+import cv2
+
+from overlay_renderer import OverlayRenderer
+
+logger = logging.getLogger(__name__)
+
+MAX_TRACKED_CAPTURES = 256 # Capture statuses kept for /capture_status lookups
+
+
+class SnapshotWriter:
+    """
+    Persists measurement captures on a background thread. submit() only
+    queues a reference to the (read-only) frame and returns a capture ID;
+    the writer thread encodes the JPEG and appends the angles to the
+    measurement store, so a capture never stalls the request or the stream.
+    Angle labels given with a capture are drawn onto a copy of the frame
+    before it is saved.
+    """
+
+    def __init__(self, image_dir, store, max_pending=64):
+        self.image_dir = image_dir
+        self.store = store
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._statuses = OrderedDict()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._renderer = OverlayRenderer() # Used by the writer thread only
+
+    def start(self):
+        """Starts the background writer thread."""
+        os.makedirs(self.image_dir, exist_ok=True)
+        self._thread = threading.Thread(target=self._write_loop, name="snapshot-writer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Writes all pending captures and stops the writer thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, frame, angles, max_angles, patient_id=None, session_id=None, labels=None):
+        """
+        Queues a capture of frame with its angles and optional labels for
+        OverlayRenderer.draw_labels. The frame must not be modified
+        afterwards. Returns the capture ID, or raises queue.Full when too many
+        captures are still pending.
+        """
+        now = datetime.now()
+        capture_id = uuid.uuid4().hex[:12]
+        job = {
+            "capture_id": capture_id,
+            "frame": frame,
+            "angles": angles,
+            "max_angles": max_angles,
+            "image_file": f"captured_image_{now.strftime('%Y%m%d_%H%M%S')}_{capture_id}.jpg",
+            "timestamp": now.timestamp(),
+            "patient_id": patient_id,
+            "session_id": session_id,
+            "labels": labels,
+        }
+        # Marked pending first, so the writer thread's "saved" is never overwritten
+        self._set_status(capture_id, "pending")
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._statuses.pop(capture_id, None)
+            raise
+        return capture_id
+
+    def status(self, capture_id):
+        """Returns "pending", "saved" or "error" for a capture ID, or None if unknown."""
+        with self._lock:
+            return self._statuses.get(capture_id)
+
+    def _set_status(self, capture_id, status):
+        with self._lock:
+            self._statuses[capture_id] = status
+            self._statuses.move_to_end(capture_id)
+            while len(self._statuses) > MAX_TRACKED_CAPTURES:
+                self._statuses.popitem(last=False)
+
+    def _write_loop(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            try:
+                self._write(job)
+                self._set_status(job["capture_id"], "saved")
+            except Exception:
+                logger.exception("Failed to save capture %s", job["capture_id"])
+                self._set_status(job["capture_id"], "error")
+
+    def _write(self, job):
+        path = os.path.join(self.image_dir, job["image_file"])
+        frame = job["frame"]
+        if job["labels"]:
+            frame = frame.copy()
+            self._renderer.draw_labels(frame, job["labels"])
+        if not cv2.imwrite(path, frame):
+            raise OSError(f"Could not write {path}")
+        self.store.append(
+            job["angles"],
+            job["max_angles"],
+            image_file=job["image_file"],
+            timestamp=job["timestamp"],
+            patient_id=job["patient_id"],
+            session_id=job["session_id"],
+        )
@@ -3,6 +3,37 @@ document.addEventListener('DOMContentLoaded', function() {
     const captureBtn = document.getElementById('capture-btn');
     const messageArea = document.getElementById('message-area');
     const jointCheckboxesDiv = document.querySelector('.joint-checkboxes');
+    const videoFeed = document.getElementById('video-feed');
+    const angleOverlay = document.getElementById('angle-overlay');
+    const resetBtn = document.getElementById('reset-btn');
+    let sessionId = null; // This page's assessment session
+
+    // Controls act on this page's session, so they stay disabled until it is open
+    function setControlsEnabled(enabled) {
+        jointCheckboxesDiv.querySelectorAll('input[type="checkbox"]').forEach(checkbox => {
+            checkbox.disabled = !enabled;
+        });
+        [captureBtn, resetBtn].forEach(button => {
+            if (button) {
+                button.disabled = !enabled;
+            }
+        });
+    }
+
+    // Opens an assessment session so this page's joints and max angles are its own
+    function openSession() {
+        return fetch('/sessions', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({}),
+        })
+        .then(response => response.json())
+        .then(session => {
+            sessionId = session.session_id;
+        });
+    }
 
     // Function to fetch all joints and populate checkboxes
     function populateJointCheckboxes() {
@@ -19,6 +50,7 @@ document.addEventListener('DOMContentLoaded', function() {
                     checkbox.id = joint;
                     checkbox.value = joint;
                     checkbox.checked = true; // All joints active by default
+                    checkbox.disabled = sessionId === null;
                     checkbox.addEventListener('change', sendActiveJoints);
 
                     const label = document.createElement('label');
@@ -43,7 +75,7 @@ document.addEventListener('DOMContentLoaded', function() {
             headers: {
                 'Content-Type': 'application/json',
             },
-            body: JSON.stringify({ active_joints: activeJoints }),
+            body: JSON.stringify({ session_id: sessionId, active_joints: activeJoints }),
         })
         .then(response => response.json())
         .then(data => {
@@ -63,16 +95,38 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
+    // Polls the background writer until a capture has been saved
+    function waitForCaptureSaved(captureId, attempts = 20) {
+        fetch('/capture_status/' + captureId)
+            .then(response => response.json())
+            .then(data => {
+                if (data.status === 'saved') {
+                    messageArea.textContent = 'Measurement captured and saved!';
+                } else if (data.status === 'pending' && attempts > 1) {
+                    setTimeout(() => waitForCaptureSaved(captureId, attempts - 1), 250);
+                } else {
+                    messageArea.textContent = 'Error: measurement could not be saved.';
+                    messageArea.style.color = 'red';
+                }
+            })
+            .catch(error => console.error('Error checking capture status:', error));
+    }
+
     if (captureBtn) {
         captureBtn.addEventListener('click', function() {
             fetch('/capture_measurement', {
                 method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({ session_id: sessionId }),
             })
             .then(response => response.json())
             .then(data => {
                 if (data.status === 'success') {
-                    messageArea.textContent = 'Measurement captured and saved!';
+                    messageArea.textContent = 'Measurement captured!';
                     messageArea.style.color = 'green';
+                    waitForCaptureSaved(data.capture_id);
                 } else {
                     messageArea.textContent = 'Error: ' + data.message;
                     messageArea.style.color = 'red';
@@ -86,6 +140,88 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
+    if (resetBtn) {
+        resetBtn.addEventListener('click', function() {
+            fetch('/sessions/' + sessionId + '/reset', { method: 'POST' })
+                .then(response => response.json())
+                .then(() => {
+                    messageArea.textContent = 'Max angles reset.';
+                    messageArea.style.color = 'green';
+                })
+                .catch(error => console.error('Error resetting session:', error));
+        });
+    }
+
+    // Formats a joint identifier as an overlay label, e.g. "Left Shoulder Flexion"
+    function formatLabel(jointName) {
+        return jointName.split('_').map(word => word.charAt(0).toUpperCase() + word.slice(1)).join(' ');
+    }
+
+    // Draws the angle labels for one /angles payload onto the overlay canvas.
+    // Sizes are given in video pixels and scaled to the displayed size, so
+    // labels stay readable whatever resolution the stream is sent at.
+    function drawAngleOverlay(payload) {
+        const width = videoFeed.clientWidth;
+        const height = videoFeed.clientHeight;
+        if (angleOverlay.width !== width || angleOverlay.height !== height) {
+            angleOverlay.width = width;
+            angleOverlay.height = height;
+        }
+
+        const ctx = angleOverlay.getContext('2d');
+        ctx.clearRect(0, 0, width, height);
+        if (!payload.pose) {
+            return;
+        }
+
+        const scale = width / 640;
+        const lineHeight = 28 * scale;
+        ctx.font = `bold ${Math.round(22 * scale)}px sans-serif`;
+        ctx.lineWidth = Math.max(2, 4 * scale);
+        ctx.strokeStyle = 'rgba(0, 0, 0, 0.8)';
+
+        let y = 30 * scale;
+        function drawLabel(text, color) {
+            ctx.strokeText(text, 10, y);
+            ctx.fillStyle = color;
+            ctx.fillText(text, 10, y);
+            y += lineHeight;
+        }
+
+        payload.joints.forEach(([joint, angle, maxAngle]) => {
+            const label = formatLabel(joint);
+            if (angle !== null) {
+                drawLabel(`${label}: ${Math.trunc(angle)}`, '#ffffff');
+            }
+            if (maxAngle !== null) {
+                drawLabel(`Max ${label}: ${Math.trunc(maxAngle)}`, '#00ff00');
+            }
+        });
+    }
+
+    // Subscribes to the per-frame angle stream pushed by the server
+    function subscribeToAngles() {
+        const source = new EventSource('/angles?session_id=' + encodeURIComponent(sessionId));
+        source.onmessage = event => drawAngleOverlay(JSON.parse(event.data));
+        source.onerror = () => angleOverlay.getContext('2d').clearRect(0, 0, angleOverlay.width, angleOverlay.height);
+    }
+
     // Initial population of checkboxes
+    setControlsEnabled(false);
     populateJointCheckboxes();
+    openSession()
+        .then(() => {
+            setControlsEnabled(true);
+            if (videoFeed && angleOverlay) {
+                subscribeToAngles();
+            }
+        })
+        .catch(error => console.error('Error opening session:', error));
+
+    // Close the session when the page goes away; idle sessions are evicted otherwise
+    window.addEventListener('pagehide', function() {
+        if (sessionId) {
+            navigator.sendBeacon('/sessions/' + sessionId + '/close');
+        }
+    });
 });
@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from angle_recorder import AngleRecorder, load_recording
+
+JOINTS = ("left_knee", "right_knee", "left_elbow")
+
+class TestAngleRecorder(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.output_dir = os.path.join(self.tmp.name, "session")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_records_every_frame_in_chunks(self):
+        """Test that all frames, including a partial last chunk, are written in order."""
+        recorder = AngleRecorder(self.output_dir, JOINTS, chunk_frames=10, chunks=6).start()
+        for i in range(55):
+            recorder.record(float(i), np.full(3, i, dtype=np.float32), np.array([True, i % 2 == 0, False]))
+        recorder.stop()
+
+        self.assertEqual(recorder.stats()["chunks"], 6)
+        self.assertEqual(recorder.dropped, 0)
+        recording = load_recording(self.output_dir)
+        np.testing.assert_array_equal(recording["timestamps"], np.arange(55))
+        np.testing.assert_array_equal(recording["angles"][:, 0], np.arange(55))
+        self.assertEqual(recording["valid"][:, 1].sum(), 28)
+        self.assertEqual(recording["joints"], JOINTS)
+
+    def test_does_not_overwrite_earlier_recording(self):
+        """Test that recording again under the same name is refused and keeps the first recording."""
+        recorder = AngleRecorder(self.output_dir, JOINTS, chunk_frames=10, chunks=6).start()
+        for i in range(25):
+            recorder.record(float(i), np.zeros(3, dtype=np.float32), np.ones(3, dtype=bool))
+        recorder.stop()
+
+        with self.assertRaises(FileExistsError):
+            AngleRecorder(self.output_dir, JOINTS, chunk_frames=10, chunks=6).start()
+        np.testing.assert_array_equal(load_recording(self.output_dir)["timestamps"], np.arange(25))
+
+    def test_memory_is_bounded_by_ring_capacity(self):
+        """Test that the ring buffer is preallocated at a fixed size."""
+        recorder = AngleRecorder(self.output_dir, JOINTS, chunk_frames=10, chunks=3)
+        self.assertEqual(recorder.capacity, 30)
+        self.assertEqual(recorder._angles.shape, (30, 3))
+
+    def test_drops_frames_when_flusher_falls_behind(self):
+        """Test that frames beyond the ring capacity are counted as dropped, not overwritten."""
+        recorder = AngleRecorder(self.output_dir, JOINTS, chunk_frames=5, chunks=2)
+        for i in range(12):
+            recorder.record(float(i), np.zeros(3), np.ones(3, dtype=bool))
+        self.assertEqual(recorder.dropped, 2)
+
+if __name__ == '__main__':
+    unittest.main()
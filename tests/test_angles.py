@@ -1,7 +1,52 @@
 
 import unittest
+from types import SimpleNamespace
+
 import numpy as np
-from angle_calculator import calculate_angle
+from angle_calculator import (
+    calculate_angle,
+    calculate_joint_angles,
+    calculate_left_elbow_angle,
+    calculate_left_knee_angle,
+    calculate_left_shoulder_abduction_angle,
+    calculate_world_joint_angles,
+    compile_joint_table,
+    landmarks_to_array,
+)
+from joints import JOINT_TABLE, compile_joint_plan, measure_joint_angles
+
+# Joint -> landmark indices matching the scalar calculate_left_*_angle functions
+TEST_JOINT_MAP = {
+    "left_shoulder_abduction": [7, 11, 13],
+    "left_elbow": [11, 13, 15],
+    "left_knee": [24, 26, 28],
+}
+
+def make_landmarks(seed=0, visibility=1.0):
+    """Creates 33 random MediaPipe-like landmarks."""
+    rng = np.random.default_rng(seed)
+    return [SimpleNamespace(x=x, y=y, z=0.0, visibility=visibility) for x, y in rng.random((33, 2))]
+
+def make_world_landmarks(left_arm=(0.0, 0.3, 0.0), left_forearm=(0.0, 0.25, 0.0)):
+    """
+    Creates a (33, 4) standing pose in world coordinates (meters, y down,
+    facing -z) with the given left upper arm and forearm vectors.
+    """
+    world = np.zeros((33, 4))
+    world[:, 3] = 1.0
+    points = {7: (0.2, -0.65, 0.0), 8: (-0.2, -0.65, 0.0), 11: (0.2, -0.5, 0.0), 12: (-0.2, -0.5, 0.0),
+              23: (0.1, 0.0, 0.0), 24: (-0.1, 0.0, 0.0)}
+    for index, point in points.items():
+        world[index, :3] = point
+    world[13, :3] = world[11, :3] + left_arm
+    world[15, :3] = world[13, :3] + left_forearm
+    world[14, :3] = world[12, :3] + (0.0, 0.3, 0.0)
+    world[16, :3] = world[14, :3] + (0.0, 0.25, 0.0)
+    for hip, knee, ankle, foot in ((23, 25, 27, 31), (24, 26, 28, 32)):
+        world[knee, :3] = world[hip, :3] + (0.0, 0.45, 0.0)
+        world[ankle, :3] = world[knee, :3] + (0.0, 0.45, 0.0)
+        world[foot, :3] = world[ankle, :3] + (0.0, 0.05, -0.15)
+    return world
 
 class TestAngleCalculations(unittest.TestCase):
 
@@ -25,5 +70,114 @@ class TestAngleCalculations(unittest.TestCase):
         p3 = (1, 1)
         self.assertAlmostEqual(calculate_angle(p1, p2, p3), 45.0, places=1)
 
+class TestBatchAngleCalculations(unittest.TestCase):
+
+    def test_batch_matches_scalar_functions(self):
+        """Test that the batch engine reproduces the per-joint functions."""
+        landmarks = make_landmarks()
+        table = compile_joint_table(TEST_JOINT_MAP)
+        angles, visible = calculate_joint_angles(landmarks_to_array(landmarks), table)
+
+        self.assertEqual(table.names, tuple(TEST_JOINT_MAP))
+        self.assertTrue(visible.all())
+        self.assertAlmostEqual(angles[0], calculate_left_shoulder_abduction_angle(landmarks), places=6)
+        self.assertAlmostEqual(angles[1], calculate_left_elbow_angle(landmarks), places=6)
+        self.assertAlmostEqual(angles[2], calculate_left_knee_angle(landmarks), places=6)
+
+    def test_batch_over_frame_stack(self):
+        """Test that an (N, 33, 4) stack returns one row per frame."""
+        frames = np.stack([landmarks_to_array(make_landmarks(seed)) for seed in range(5)])
+        table = compile_joint_table(TEST_JOINT_MAP)
+        angles, visible = calculate_joint_angles(frames, table)
+
+        self.assertEqual(angles.shape, (5, 3))
+        self.assertEqual(visible.shape, (5, 3))
+        single, _ = calculate_joint_angles(frames[3], table)
+        np.testing.assert_allclose(angles[3], single)
+
+    def test_visibility_mask(self):
+        """Test that joints with a hidden landmark are flagged as not visible."""
+        landmark_array = landmarks_to_array(make_landmarks())
+        landmark_array[15, 3] = 0.2  # Hide the left wrist
+        table = compile_joint_table(TEST_JOINT_MAP, joints=["left_elbow", "left_knee"])
+        _, visible = calculate_joint_angles(landmark_array, table, visibility_threshold=0.7)
+
+        self.assertEqual(visible.tolist(), [False, True])
+
+class TestWorldJointAngles(unittest.TestCase):
+
+    def angle(self, world, joint):
+        angles, _ = calculate_world_joint_angles(world, JOINT_TABLE)
+        return angles[JOINT_TABLE.names.index(joint)]
+
+    def test_flexion_and_abduction_in_body_planes(self):
+        """Test that shoulder flexion and abduction are measured in the sagittal and frontal planes."""
+        forward = make_world_landmarks(left_arm=0.3 * np.array([0.0, np.cos(np.pi / 4), -np.sin(np.pi / 4)]))
+        self.assertAlmostEqual(self.angle(forward, "left_shoulder_flexion"), 45.0, places=4)
+        self.assertAlmostEqual(self.angle(forward, "left_shoulder_abduction"), 0.0, places=4)
+
+        sideways = make_world_landmarks(left_arm=0.3 * np.array([np.sin(np.pi / 3), np.cos(np.pi / 3), 0.0]))
+        self.assertAlmostEqual(self.angle(sideways, "left_shoulder_abduction"), 60.0, places=4)
+        self.assertAlmostEqual(self.angle(sideways, "left_shoulder_flexion"), 0.0, places=4)
+
+    def test_flexion_of_abducted_arm_is_not_measured(self):
+        """Test that flexion of an arm abducted near 90 degrees is invalid despite depth noise."""
+        rng = np.random.default_rng(0)
+        flexion = JOINT_TABLE.names.index("left_shoulder_flexion")
+        abduction = JOINT_TABLE.names.index("left_shoulder_abduction")
+        for degrees in (88.0, 89.0, 90.0):
+            arm = 0.3 * np.array([np.sin(np.radians(degrees)), np.cos(np.radians(degrees)), 0.0])
+            world = make_world_landmarks(left_arm=arm)
+            world[13, 2] += rng.uniform(-0.02, 0.02) # depth jitter of the elbow
+            _, valid, _ = measure_joint_angles(np.zeros((33, 4)), world_array=world)
+            self.assertFalse(valid[flexion])
+            self.assertTrue(valid[abduction])
+
+    def test_elbow_toward_camera(self):
+        """Test that an elbow bent toward the camera reads its true 3D angle."""
+        world = make_world_landmarks(left_forearm=(0.0, 0.0, -0.25))
+        self.assertAlmostEqual(self.angle(world, "left_elbow"), 90.0, places=4)
+
+    def test_independent_of_body_orientation(self):
+        """Test that turning and tilting the whole body does not change any angle."""
+        world = make_world_landmarks(left_arm=(0.2, 0.1, -0.2), left_forearm=(0.0, -0.1, -0.2))
+        yaw, tilt = np.radians(70.0), np.radians(20.0)
+        rotation = (np.array([[np.cos(yaw), 0, np.sin(yaw)], [0, 1, 0], [-np.sin(yaw), 0, np.cos(yaw)]]) @
+                    np.array([[1, 0, 0], [0, np.cos(tilt), -np.sin(tilt)], [0, np.sin(tilt), np.cos(tilt)]]))
+        turned = world.copy()
+        turned[:, :3] = world[:, :3] @ rotation.T
+
+        expected, _ = calculate_world_joint_angles(world, JOINT_TABLE)
+        angles, _ = calculate_world_joint_angles(np.stack([world, turned]), JOINT_TABLE)
+        np.testing.assert_allclose(angles, [expected, expected], atol=1e-6)
+
+    def test_measures_every_joint_in_any_view(self):
+        """Test that world landmarks measure flexion and abduction without a view guess."""
+        world = make_world_landmarks(left_arm=(0.2, 0.1, -0.2))
+        _, valid, measured = measure_joint_angles(np.zeros((33, 4)), world_array=world)
+        self.assertTrue(measured.all())
+        self.assertTrue(valid[JOINT_TABLE.names.index("left_shoulder_flexion")])
+        self.assertTrue(valid[JOINT_TABLE.names.index("left_shoulder_abduction")])
+
+class TestJointPlan(unittest.TestCase):
+
+    def test_plan_selects_active_joints(self):
+        """Test that a compiled plan holds the indices, landmarks and labels of the active joints."""
+        plan = compile_joint_plan(["right_knee", "left_elbow", "unknown"])
+        self.assertEqual(plan.names, ("left_elbow", "right_knee"))
+        self.assertEqual([JOINT_TABLE.names[i] for i in plan.indices], list(plan.names))
+        self.assertEqual(plan.mask.sum(), 2)
+        self.assertEqual(plan.landmarks.tolist(), [11, 13, 15, 24, 26, 28])
+        self.assertIn([11, 13], plan.connections.tolist())
+        self.assertNotIn([11, 12], plan.connections.tolist())
+        self.assertEqual(plan.labels[0], ("Left Elbow: ", "Max Left Elbow: "))
+        self.assertEqual(len(plan.label_origins), 2)
+
+    def test_plan_is_immutable(self):
+        """Test that the plan's arrays cannot be modified."""
+        plan = compile_joint_plan(JOINT_TABLE.names)
+        with self.assertRaises(ValueError):
+            plan.mask[0] = False
+
 if __name__ == '__main__':
     unittest.main()
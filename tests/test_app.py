@@ -0,0 +1,132 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+import app
+
+class TestImport(unittest.TestCase):
+
+    def test_import_does_not_load_mediapipe(self):
+        """Test that importing the app neither imports MediaPipe nor starts loading a model."""
+        code = "import sys, time, app; time.sleep(0.5); print('mediapipe' in sys.modules)"
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        self.assertEqual(output.stdout.strip(), "False")
+
+class TestSessionRoutes(unittest.TestCase):
+
+    def setUp(self):
+        self.client = app.app.test_client()
+        self.session_id = self.client.post('/sessions', json={}).get_json()["session_id"]
+
+    def tearDown(self):
+        self.client.post(f'/sessions/{self.session_id}/close')
+
+    def test_unchecked_joints_are_not_drawn(self):
+        """Test that unchecking joints in a page's session shrinks the camera's draw plan."""
+        response = self.client.post('/update_active_joints',
+                                    json={"session_id": self.session_id, "active_joints": ["left_elbow"]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(app.cameras[app.DEFAULT_CAMERA].draw_plan.names, ("left_elbow",))
+
+        self.client.post(f'/sessions/{self.session_id}/close')
+        self.assertEqual(len(app.cameras[app.DEFAULT_CAMERA].draw_plan.names), len(app.JOINT_TABLE.names))
+
+    def test_null_session_id_uses_default_session(self):
+        """Test that requests sent before the page's session is open fall back to the default session."""
+        response = self.client.post('/update_active_joints',
+                                    json={"session_id": None, "active_joints": list(app.JOINT_TABLE.names)})
+        self.assertEqual(response.status_code, 200)
+
+class TestAngleStream(unittest.TestCase):
+
+    def setUp(self):
+        self.client = app.app.test_client()
+        self.session = app.session_manager.create(app.DEFAULT_CAMERA, active_joints=["left_elbow", "left_knee"])
+        names = app.JOINT_TABLE.names
+        angles = np.full(len(names), np.nan)
+        angles[names.index("left_elbow")] = 90.04
+        valid = np.zeros(len(names), dtype=bool)
+        valid[[names.index("left_elbow"), names.index("left_knee")]] = True # knee angle is NaN
+        self.result = app.FrameResult(np.zeros((33, 4)), angles, valid, valid, 12.3456)
+        self.session.update(angles, valid)
+
+    def tearDown(self):
+        app.session_manager.close(self.session.session_id)
+
+    def test_angle_payload(self):
+        """Test that the payload lists the session's active joints with current and max angles."""
+        payload = json.loads(app.angle_payload(self.session, self.result))
+        self.assertEqual(payload, {"time": 12.346, "pose": True,
+                                   "joints": [["left_elbow", 90.0, 90.0], ["left_knee", None, None]]})
+
+    def test_stream_sends_payload_events(self):
+        """Test that /angles streams the session's payloads as server-sent events."""
+        stream = SimpleNamespace(subscribe_packets=lambda: iter([SimpleNamespace(result=self.result)]))
+        with mock.patch.object(app.cameras[app.DEFAULT_CAMERA], "stream", stream):
+            response = self.client.get(f'/angles?session_id={self.session.session_id}')
+            body = response.get_data(as_text=True)
+        self.assertEqual(response.mimetype, "text/event-stream")
+        event = body.split("\n\n")[0]
+        self.assertTrue(event.startswith("data: "))
+        self.assertEqual(json.loads(event[len("data: "):])["joints"][0], ["left_elbow", 90.0, 90.0])
+
+class TestSettingsRoutes(unittest.TestCase):
+
+    def setUp(self):
+        self.client = app.app.test_client()
+
+    def test_invalid_stream_settings_are_rejected(self):
+        """Test that invalid encoder settings return 400 and leave the encoder unchanged."""
+        before = self.client.get('/stream_settings').get_json()
+        for data in ({"max_width": -5}, {"max_width": "wide"}, {"quality": 0}, {"quality": True}):
+            self.assertEqual(self.client.post('/stream_settings', json=data).status_code, 400)
+        after = self.client.get('/stream_settings').get_json()
+        self.assertEqual((after["max_width"], after["quality"]), (before["max_width"], before["quality"]))
+
+    def test_invalid_model_settings_are_rejected(self):
+        """Test that non-numeric or out-of-range model settings return 400."""
+        for data in ({"detection_confidence": "high"}, {"tracking_confidence": 2}, {"complexity": "1"},
+                     {"auto": True, "target_fps": "fast"}, {"target_fps": 0}):
+            self.assertEqual(self.client.post('/model_settings', json=data).status_code, 400)
+
+    def test_invalid_cameras_are_rejected(self):
+        """Test that camera ids with other characters and non-string sources return 400."""
+        for data in ({"camera_id": "../x", "source": 1}, {"camera_id": 'a"b', "source": 1},
+                     {"camera_id": ["cam"], "source": 1}, {"camera_id": "cam2", "source": {"url": "x"}},
+                     {"camera_id": "cam2", "source": True}):
+            self.assertEqual(self.client.post('/cameras', json=data).status_code, 400)
+        self.assertEqual(list(app.cameras), [app.DEFAULT_CAMERA])
+
+class TestRecordingRoutes(unittest.TestCase):
+
+    def test_recording_name_cannot_leave_recordings_directory(self):
+        """Test that a session_id containing a path is rejected instead of recorded."""
+        client = app.app.test_client()
+        for session_id in ("../../x", "/tmp/x", "a/b"):
+            response = client.post('/recording/start', json={"session_id": session_id})
+            self.assertEqual(response.status_code, 400)
+        self.assertIsNone(app.cameras[app.DEFAULT_CAMERA].recorder)
+
+    def test_recording_name_cannot_be_reused(self):
+        """Test that starting a recording under an existing name returns 409."""
+        client = app.app.test_client()
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                self.assertEqual(client.post('/recording/start', json={"session_id": "s1"}).status_code, 200)
+                client.post('/recording/stop', json={})
+                self.assertEqual(client.post('/recording/start', json={"session_id": "s1"}).status_code, 409)
+            finally:
+                os.chdir(cwd)
+        self.assertIsNone(app.cameras[app.DEFAULT_CAMERA].recorder)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+from batch_processor import process_videos, split_segments, summarize_angles, write_results
+
+def write_blank_video(path, frames=12, size=(160, 120)):
+    """Writes a short black test video."""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 10, size)
+    for _ in range(frames):
+        writer.write(np.zeros((size[1], size[0], 3), dtype=np.uint8))
+    writer.release()
+
+class TestBatchProcessor(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.video = os.path.join(self.tmp.name, "session.avi")
+        write_blank_video(self.video)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_split_segments(self):
+        """Test that a video is split into consecutive frame segments."""
+        self.assertEqual(split_segments(self.video, 5),
+                         [(self.video, 0, 5), (self.video, 5, 10), (self.video, 10, 12)])
+
+    def test_summarize_angles(self):
+        """Test that max/min/ROM use only valid frames."""
+        angles = np.array([[10.0, 5.0], [50.0, 7.0], [90.0, 9.0]])
+        valid = np.array([[True, False], [True, False], [False, False]])
+        summary = summarize_angles(angles, valid, names=("left_knee", "right_knee"))
+
+        self.assertEqual(summary["left_knee"], {"max": 50.0, "min": 10.0, "rom": 40.0, "frames": 2})
+        self.assertEqual(summary["right_knee"]["frames"], 0)
+
+    def test_process_videos_merges_segments_in_order(self):
+        """Test that a blank video yields one row per frame and no valid angles."""
+        results = process_videos([self.video], workers=2, segment_frames=5)
+        result = results[self.video]
+
+        self.assertEqual(result["angles"].shape[0], 12)
+        self.assertFalse(result["valid"].any())
+
+        write_results(self.video, result, self.tmp.name)
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, "session_angles.csv")))
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, "session_summary.json")))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+
+from benchmark import STAGES, compare_to_baseline, print_report, run_benchmark, summarize_latencies
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_summarize_latencies(self):
+        """Test that latencies are reported as millisecond percentiles and throughput."""
+        stats = summarize_latencies([0.001] * 99 + [0.1])
+        self.assertEqual(stats["count"], 100)
+        self.assertAlmostEqual(stats["p50_ms"], 1.0)
+        self.assertGreater(stats["p99_ms"], stats["p95_ms"])
+        self.assertAlmostEqual(stats["throughput_fps"], 100 / 0.199, places=0)
+
+    def test_compare_to_baseline_flags_slower_stages(self):
+        """Test that only stages slower than the tolerance are reported."""
+        baseline = {"stages": {"encode": {"p50_ms": 2.0, "p95_ms": 3.0}, "angles": {"p50_ms": 0.2, "p95_ms": 0.3}},
+                    "total": {"p50_ms": 10.0, "p95_ms": 12.0}}
+        report = {"stages": {"encode": {"p50_ms": 3.0, "p95_ms": 3.1}, "angles": {"p50_ms": 0.1, "p95_ms": 0.2}},
+                  "total": {"p50_ms": 10.5, "p95_ms": 12.0}}
+        regressions = compare_to_baseline(report, baseline, tolerance=0.2)
+        self.assertEqual(regressions, [("encode", "p50_ms", 2.0, 3.0, 1.5)])
+
+    def test_runs_headless_with_synthetic_input(self):
+        """Test that the benchmark runs without a camera or video file."""
+        report = run_benchmark(frames=5, pose=False, warmup=1)
+        self.assertEqual(report["frames"], 5)
+        self.assertEqual(set(report["stages"]), set(STAGES) - {"pose"})
+        self.assertGreater(report["peak_rss_mb"], 0)
+
+    def test_report_without_frames_or_memory_stats(self):
+        """Test that the report prints when no frame was measured and peak memory is unknown."""
+        report = run_benchmark(frames=0, pose=False, warmup=0)
+        report["peak_rss_mb"] = None
+        report["stages"]["encode"] = dict(summarize_latencies([0.0]), throughput_fps=None)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            print_report(report)
+        self.assertIn("encode", output.getvalue())
+        self.assertIn("not available", output.getvalue())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import threading
+import time
+import unittest
+
+import numpy as np
+from camera_stream import CameraStream, FrameBroadcaster
+
+class FakeCapture:
+    """Stands in for cv2.VideoCapture, producing numbered frames."""
+    opened = 0
+
+    def __init__(self, source, count=200, interval=0.01):
+        FakeCapture.opened += 1
+        self.count = count
+        self.interval = interval
+        self.index = 0
+
+    def isOpened(self):
+        return True
+
+    def read(self):
+        if self.index >= self.count:
+            return False, None
+        time.sleep(self.interval)
+        self.index += 1
+        return True, np.full((2, 2, 3), self.index % 256, dtype=np.uint8)
+
+    def release(self):
+        pass
+
+class TestFrameBroadcaster(unittest.TestCase):
+
+    def test_wait_returns_latest_packet(self):
+        """Test that a lagging subscriber receives only the newest packet."""
+        broadcaster = FrameBroadcaster()
+        for packet in ("a", "b", "c"):
+            broadcaster.publish(packet)
+        self.assertEqual(broadcaster.wait(0), (3, "c"))
+
+    def test_close_releases_waiters(self):
+        """Test that closing the broadcaster ends waiting subscribers."""
+        broadcaster = FrameBroadcaster()
+        threading.Timer(0.05, broadcaster.close).start()
+        self.assertIsNone(broadcaster.wait(0))
+
+class TestCameraStream(unittest.TestCase):
+
+    def test_viewers_share_one_camera_and_inference(self):
+        """Test that several viewers are served by a single producer."""
+        FakeCapture.opened = 0
+        inference_calls = []
+
+        def process(frame):
+            inference_calls.append(1)
+            return int(frame[0, 0, 0])
+
+        stream = CameraStream(0, process, lambda frame, result: result, open_capture=FakeCapture)
+        results = [[], [], []]
+
+        def view(received):
+            for data in stream.subscribe():
+                received.append(data)
+                if len(received) == 10:
+                    break
+
+        viewers = [threading.Thread(target=view, args=(received,)) for received in results]
+        for viewer in viewers:
+            viewer.start()
+        for viewer in viewers:
+            viewer.join(5)
+
+        self.assertEqual(FakeCapture.opened, 1)
+        for received in results:
+            self.assertEqual(len(received), 10)
+        self.assertLessEqual(len(inference_calls), 200)
+        self.assertEqual(stream.subscribers, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+
+import cv2
+import numpy as np
+from frame_encoder import AdaptiveController, FrameEncoder
+
+def make_frame(seed=0, size=(480, 640)):
+    """Creates a random noise frame that compresses poorly."""
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, (size[0], size[1], 3), dtype=np.uint8)
+
+class TestFrameEncoder(unittest.TestCase):
+
+    def test_downscales_to_max_width(self):
+        """Test that frames wider than max_width are resized before encoding."""
+        encoder = FrameEncoder(max_width=320, backend="opencv", skip_unchanged=False)
+        image = cv2.imdecode(np.frombuffer(encoder.encode(make_frame()), np.uint8), cv2.IMREAD_COLOR)
+        self.assertEqual(image.shape[:2], (240, 320))
+
+    def test_lower_quality_produces_fewer_bytes(self):
+        """Test that the quality setting is applied."""
+        frame = make_frame()
+        high = FrameEncoder(quality=95, backend="opencv", skip_unchanged=False).encode(frame)
+        low = FrameEncoder(quality=30, backend="opencv", skip_unchanged=False).encode(frame)
+        self.assertLess(len(low), len(high))
+
+    def test_skips_unchanged_frames(self):
+        """Test that identical frames are skipped, but a static scene is re-sent periodically."""
+        encoder = FrameEncoder(backend="opencv", max_skipped=2)
+        frame = make_frame()
+        results = [encoder.encode(frame) for _ in range(5)]
+        self.assertEqual([result is None for result in results], [False, True, True, False, True])
+        self.assertIsNotNone(encoder.encode(make_frame(seed=1)))
+
+    def test_sends_small_moving_region(self):
+        """Test that a slowly rotating forearm-sized bar is sent while a still scene is skipped."""
+        rng = np.random.default_rng(0)
+        background = cv2.GaussianBlur(make_frame(size=(720, 1280)), (31, 31), 0)
+        def bar_frame(degrees):
+            frame = background.copy()
+            end = (640 + int(220 * np.cos(np.radians(degrees))), 360 + int(220 * np.sin(np.radians(degrees))))
+            cv2.line(frame, (640, 360), end, (200, 180, 160), 25)
+            return cv2.add(frame, rng.integers(0, 4, frame.shape, dtype=np.uint8)) # sensor noise
+
+        encoder = FrameEncoder(backend="opencv")
+        self.assertTrue(all(encoder.encode(bar_frame(0.5 * i)) is not None for i in range(20)))
+        still = [encoder.encode(bar_frame(10.0)) for _ in range(10)]
+        self.assertEqual(sum(result is not None for result in still), 1)
+
+    def test_configure_clamps_and_rejects_invalid_settings(self):
+        """Test that out-of-range settings are clamped and non-integer ones rejected."""
+        encoder = FrameEncoder(backend="opencv", skip_unchanged=False)
+        encoder.configure(max_width=-5, quality=500)
+        self.assertEqual((encoder.max_width, encoder.quality), (16, 100))
+        self.assertIsNotNone(encoder.encode(make_frame()))
+        with self.assertRaises(ValueError):
+            encoder.configure(max_width="wide")
+
+    def test_adaptive_quality_stays_at_or_below_configured(self):
+        """Test that headroom does not raise quality above the configured value."""
+        encoder = FrameEncoder(quality=80, backend="opencv", skip_unchanged=False,
+                               controller=AdaptiveController(max_quality=90, interval=0.0))
+        frame = np.zeros((48, 64, 3), dtype=np.uint8)
+        for _ in range(5):
+            encoder.encode(frame)
+        self.assertEqual(encoder.quality, 80)
+
+class TestAdaptiveController(unittest.TestCase):
+
+    def test_lowers_quality_then_scale_when_too_slow(self):
+        """Test that a slow viewer reduces quality first, then resolution."""
+        controller = AdaptiveController(target_fps=20, min_quality=40, quality_step=10)
+        self.assertEqual(controller.update(60, 1.0, delivered_fps=10, encode_ms=2), (50, 1.0))
+        self.assertEqual(controller.update(40, 1.0, delivered_fps=10, encode_ms=2), (40, 0.9))
+
+    def test_restores_scale_then_quality_with_headroom(self):
+        """Test that spare capacity restores resolution before quality."""
+        controller = AdaptiveController(target_fps=20, max_quality=90, quality_step=10)
+        quality, scale = controller.update(50, 0.5, delivered_fps=30, encode_ms=1)
+        self.assertEqual(quality, 50)
+        self.assertAlmostEqual(scale, 0.6)
+        self.assertEqual(controller.update(50, 1.0, delivered_fps=30, encode_ms=1), (60, 1.0))
+
+if __name__ == '__main__':
+    unittest.main()
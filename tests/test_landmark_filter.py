@@ -0,0 +1,82 @@
+import unittest
+
+import numpy as np
+from landmark_filter import OneEuroFilter
+
+def noisy_pose(rng, base, noise=0.005):
+    landmarks = base.copy()
+    landmarks[:, :3] += rng.normal(0.0, noise, (33, 3))
+    return landmarks
+
+class TestOneEuroFilter(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+        self.base = np.column_stack([self.rng.random((33, 3)), np.ones(33)])
+
+    def test_reduces_jitter(self):
+        """Test that a still pose jitters less after filtering."""
+        landmark_filter = OneEuroFilter()
+        raw_error, filtered_error = [], []
+        for i in range(100):
+            landmarks = noisy_pose(self.rng, self.base)
+            filtered = landmark_filter.filter(landmarks, i / 30)
+            if i >= 10:
+                raw_error.append(np.abs(landmarks[:, :2] - self.base[:, :2]).mean())
+                filtered_error.append(np.abs(filtered[:, :2] - self.base[:, :2]).mean())
+        self.assertLess(np.mean(filtered_error), 0.5 * np.mean(raw_error))
+
+    def test_rejects_single_frame_spike(self):
+        """Test that a one-frame jump of a landmark does not reach the output."""
+        landmark_filter = OneEuroFilter()
+        for i in range(10):
+            landmark_filter.filter(self.base, i / 30)
+        spike = self.base.copy()
+        spike[13, :2] += 0.4
+        filtered = landmark_filter.filter(spike, 10 / 30)
+
+        self.assertAlmostEqual(filtered[13, 0], self.base[13, 0], places=6)
+        self.assertEqual(landmark_filter.rejected, 1)
+
+    def test_follows_persistent_jump(self):
+        """Test that a jump lasting hysteresis_frames frames is accepted."""
+        landmark_filter = OneEuroFilter(hysteresis_frames=3)
+        for i in range(10):
+            landmark_filter.filter(self.base, i / 30)
+        moved = self.base.copy()
+        moved[13, :2] += 0.4
+        for i in range(10, 13):
+            filtered = landmark_filter.filter(moved, i / 30)
+
+        np.testing.assert_allclose(filtered[13, :2], moved[13, :2])
+
+    def test_world_threshold_keeps_fast_movement_in_meters(self):
+        """Test that world landmarks moving at arm speed are not rejected, but a spike still is."""
+        world = np.zeros((33, 4))
+        world[:, 3] = 1.0
+        image_threshold, world_threshold = OneEuroFilter(), OneEuroFilter(world=True)
+        for i in range(10):
+            world[15, 0] = 2.5 * i / 30 # wrist moving at 2.5 m/s
+            image_threshold.filter(world, i / 30)
+            world_threshold.filter(world, i / 30)
+        self.assertGreater(image_threshold.rejected, 0)
+        self.assertEqual(world_threshold.rejected, 0)
+
+        world[15, 0] += 0.6
+        world_threshold.filter(world, 10 / 30)
+        self.assertEqual(world_threshold.rejected, 1)
+
+    def test_world_filter_rejects_depth_spike(self):
+        """Test that a single-frame jump in z alone is rejected for world landmarks."""
+        world = np.zeros((33, 4))
+        world[:, 3] = 1.0
+        world_filter = OneEuroFilter(world=True)
+        for i in range(5):
+            world_filter.filter(world, i / 30)
+        world[15, 2] = 0.6
+        filtered = world_filter.filter(world, 5 / 30)
+        self.assertEqual(world_filter.rejected, 1)
+        self.assertLess(abs(filtered[15, 2]), 0.01)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from measurement_store import MeasurementStore
+
+JOINTS = ("left_knee", "right_knee")
+
+class TestMeasurementStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "measurements.db")
+        self.store = MeasurementStore(self.path, joints=JOINTS, flush_size=4)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_fixed_schema_with_changing_joint_selection(self):
+        """Test that rows with different measured joints share one schema."""
+        self.store.append({"left_knee": 45.0}, {"left_knee": 60.0}, timestamp=1.0, patient_id="p1")
+        self.store.append({"right_knee": 30.0}, {"right_knee": 35.0}, timestamp=2.0, patient_id="p1")
+
+        columns = self.store.query(patient_id="p1")
+        np.testing.assert_array_equal(columns["timestamp"], [1.0, 2.0])
+        np.testing.assert_array_equal(columns["left_knee_angle"], [45.0, np.nan])
+        np.testing.assert_array_equal(columns["max_right_knee_angle"], [np.nan, 35.0])
+
+    def test_range_query_by_patient_session_and_time(self):
+        """Test filtering by patient, session and timestamp range."""
+        for t in range(10):
+            self.store.append({"left_knee": float(t)}, {}, timestamp=float(t),
+                              patient_id="p1" if t % 2 else "p2", session_id="s1")
+
+        rows = self.store.query_rows(patient_id="p1", session_id="s1", start=3, end=8)
+        self.assertEqual([row["timestamp"] for row in rows], [3.0, 5.0, 7.0])
+        self.assertIsNone(rows[0]["right_knee_angle"])
+
+    def test_buffered_rows_persist_on_close(self):
+        """Test that buffered rows are written when the store is closed."""
+        self.store.append({"left_knee": 10.0}, {}, timestamp=1.0)
+        self.store.close()
+
+        self.store = MeasurementStore(self.path, joints=JOINTS)
+        self.assertEqual(len(self.store.query()["timestamp"]), 1)
+
+    def test_import_legacy_csv_skips_ragged_rows(self):
+        """Test that CSV rows not matching the header are skipped on import."""
+        csv_path = os.path.join(self.tmp.name, "measurements.csv")
+        with open(csv_path, "w") as f:
+            f.write("timestamp,image_file,left_knee_angle,max_left_knee_angle\n")
+            f.write("20240101_120000,a.jpg,40,50\n")
+            f.write("20240101_120100,b.jpg,40,50,10,20\n")
+
+        self.assertEqual(self.store.import_csv(csv_path, patient_id="p1"), (1, 1))
+        self.assertEqual(self.store.query_rows()[0]["max_left_knee_angle"], 50.0)
+
+    def test_session_reports_are_aggregated_at_write_time(self):
+        """Test that session reports come from aggregates kept up to date as rows are written."""
+        for t, angle in enumerate([20.0, 90.0, 130.0, 40.0]):
+            self.store.append({"left_knee": angle, "right_knee": angle / 2}, {}, timestamp=100.0 + t,
+                              patient_id="p1", session_id="s1")
+        report = self.store.session_report("s1")
+        self.assertEqual(report["joints"]["left_knee"]["rom"], 110.0)
+        self.assertEqual(report["joints"]["left_knee"]["time_to_peak"], 2.0)
+        self.assertEqual(report["joints"]["left_knee"]["repetitions"], 1)
+        self.assertAlmostEqual(report["asymmetry"]["knee"]["asymmetry_pct"], 50.0)
+
+        # A later row updates the cached aggregate; a reopened store reads it back
+        self.store.append({"left_knee": 150.0}, {}, timestamp=110.0, patient_id="p1", session_id="s1")
+        self.store.close()
+        self.store = MeasurementStore(self.path, joints=JOINTS)
+        report = self.store.session_report("s1")
+        self.assertEqual(report["joints"]["left_knee"]["max"], 150.0)
+        self.assertEqual(report["joints"]["left_knee"]["samples"], 5)
+        self.assertIsNone(self.store.session_report("unknown"))
+
+    def test_patient_report_across_visits(self):
+        """Test that a patient report lists visits in order with percentiles of their ROM."""
+        for visit, rom in enumerate((60.0, 100.0, 80.0)):
+            for t, angle in enumerate((10.0, 10.0 + rom)):
+                self.store.append({"left_knee": angle}, {}, timestamp=1000.0 * visit + t,
+                                  patient_id="p1", session_id=f"visit{visit}")
+        self.store.append({"left_knee": 5.0}, {}, timestamp=1.0, patient_id="p2", session_id="other")
+
+        report = self.store.patient_report("p1", percentiles=(50,))
+        self.assertEqual([visit["session_id"] for visit in report["visits"]], ["visit0", "visit1", "visit2"])
+        self.assertEqual(report["percentiles"]["left_knee"]["rom"], {"p50": 80.0})
+        self.assertEqual(len(self.store.session_reports(start=500.0)), 2)
+
+    def test_rebuild_matches_incremental_aggregates(self):
+        """Test that aggregates recomputed from the stored rows match the incremental ones."""
+        for t in range(20):
+            self.store.append({"left_knee": float((t * 37) % 140)}, {}, timestamp=float(t), session_id="s1")
+        incremental = self.store.session_report("s1")
+        self.store.rebuild_aggregates()
+        self.assertEqual(self.store.session_report("s1"), incremental)
+
+if __name__ == '__main__':
+    unittest.main()
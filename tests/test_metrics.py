@@ -0,0 +1,49 @@
+import unittest
+
+import numpy as np
+from metrics import PipelineMetrics, render_prometheus
+
+class TestPipelineMetrics(unittest.TestCase):
+
+    def test_counts_frames_and_rejections(self):
+        """Test that pose frames and per-joint rejections are counted."""
+        metrics = PipelineMetrics(joints=("left_knee", "right_knee"))
+        metrics.count_frame(True, np.array([True, False]))
+        metrics.count_frame(True, np.array([True, True]))
+        metrics.count_frame(False, np.array([False, False]))
+        metrics.count_encoded(b"x" * 100)
+        metrics.count_encoded(None)
+
+        self.assertEqual(metrics.frames_processed, 3)
+        self.assertEqual(metrics.pose_frames, 2)
+        self.assertEqual(metrics.joint_rejections.tolist(), [2, 1])
+        self.assertEqual((metrics.frames_encoded, metrics.encoded_bytes), (1, 100))
+
+    def test_prometheus_output(self):
+        """Test that counters and cumulative stage histograms are rendered."""
+        metrics = PipelineMetrics(joints=("left_knee",))
+        metrics.observe("pose", 0.02)
+        metrics.observe("pose", 0.3)
+        metrics.count_frame(True, np.array([True]))
+        stats = {"capture": {"frames": 5, "dropped": 0, "avg_ms": 1.0},
+                 "inference": {"frames": 2, "dropped": 3, "avg_ms": 20.0}}
+
+        text = render_prometheus([("bay1", metrics, stats)], {"workers": 2, "busy": 1})
+
+        lines = text.splitlines()
+        self.assertIn('goniometry_frames_captured_total{camera="bay1"} 5', lines)
+        self.assertIn('goniometry_frames_dropped_total{camera="bay1",stage="inference"} 3', lines)
+        self.assertIn('goniometry_joint_rejections_total{camera="bay1",joint="left_knee"} 1', lines)
+        self.assertIn('goniometry_stage_seconds_bucket{camera="bay1",stage="pose",le="0.025"} 1', lines)
+        self.assertIn('goniometry_stage_seconds_bucket{camera="bay1",stage="pose",le="+Inf"} 2', lines)
+        self.assertIn('goniometry_stage_seconds_count{camera="bay1",stage="pose"} 2', lines)
+        self.assertIn('goniometry_inference_workers_busy 1', lines)
+
+    def test_label_values_are_escaped(self):
+        """Test that quotes, backslashes and newlines in a camera id are escaped."""
+        stats = {"capture": {"frames": 1, "dropped": 0, "avg_ms": 1.0}}
+        text = render_prometheus([('bay "1"\\\n', PipelineMetrics(joints=()), stats)])
+        self.assertIn('goniometry_frames_captured_total{camera="bay \\"1\\"\\\\\\n"} 1', text.splitlines())
+
+if __name__ == '__main__':
+    unittest.main()
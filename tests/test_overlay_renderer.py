@@ -0,0 +1,61 @@
+import unittest
+
+import cv2
+import numpy as np
+from joints import compile_joint_plan
+from overlay_renderer import OverlayRenderer
+
+class TestOverlayRenderer(unittest.TestCase):
+
+    def setUp(self):
+        self.renderer = OverlayRenderer()
+        self.frame = np.zeros((480, 640, 3), dtype=np.uint8)
+
+    def test_draw_skeleton(self):
+        """Test that the plan's connections are drawn and other landmarks are not."""
+        landmarks = np.zeros((33, 4))
+        landmarks[:, 0] = 0.9 # unused landmarks on the right edge
+        landmarks[:, 1] = 0.5
+        landmarks[11, :2] = (0.2, 0.2) # left shoulder
+        landmarks[13, :2] = (0.2, 0.5) # left elbow
+        landmarks[15, :2] = (0.2, 0.8) # left wrist
+        self.renderer.draw_skeleton(self.frame, landmarks, compile_joint_plan(["left_elbow"]))
+
+        self.assertTrue(self.frame[240, 128].any()) # on the upper arm
+        self.assertTrue(self.frame[384, 128].any()) # on the forearm
+        self.assertFalse(self.frame[:, 400:].any())
+
+    def test_labels_match_put_text(self):
+        """Test that labels look like the same text drawn with cv2.putText."""
+        labels = [("Left Elbow: ", 90, (10, 30), (255, 255, 255)),
+                  ("Max Left Elbow: ", 120.7, (10, 70), (0, 255, 0))]
+        self.renderer.draw_labels(self.frame, labels)
+
+        expected = np.zeros_like(self.frame)
+        for prefix, value, origin, color in labels:
+            cv2.putText(expected, f"{prefix}{int(value)}", origin, cv2.FONT_HERSHEY_SIMPLEX,
+                        1.5, color, 3, cv2.LINE_AA)
+        # Glyphs are placed at whole pixels, so edges may be off by one
+        drawn_ys, drawn_xs = np.nonzero(self.frame.any(axis=2))
+        expected_ys, expected_xs = np.nonzero(expected.any(axis=2))
+        for drawn, reference in ((drawn_xs, expected_xs), (drawn_ys, expected_ys)):
+            self.assertLessEqual(abs(drawn.min() - reference.min()), 1)
+            self.assertLessEqual(abs(drawn.max() - reference.max()), 1)
+        self.assertAlmostEqual(len(drawn_xs) / len(expected_xs), 1.0, delta=0.05)
+        self.assertEqual(self.frame[:50].reshape(-1, 3).max(axis=0).tolist(), [255, 255, 255])
+        self.assertEqual(self.frame[55:].reshape(-1, 3).max(axis=0).tolist(), [0, 255, 0])
+
+    def test_glyphs_are_cached(self):
+        """Test that repeated labels do not render new glyphs."""
+        for value in (90, 91, 90, 91, 90):
+            self.renderer.draw_labels(self.frame, [("Left Knee: ", value, (10, 30), (255, 255, 255))])
+        self.assertEqual(self.renderer.glyph_count(), 3)
+
+    def test_skips_missing_values(self):
+        """Test that labels without a value are not drawn."""
+        self.renderer.draw_labels(self.frame, [("Left Knee: ", None, (10, 30), (255, 255, 255))])
+        self.assertFalse(self.frame.any())
+        self.assertEqual(self.renderer.glyph_count(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
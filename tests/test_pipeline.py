@@ -0,0 +1,127 @@
+import threading
+import time
+import unittest
+
+import numpy as np
+from frame_pipeline import FramePipeline, InferenceScheduler, LatestQueue
+
+class FakeCamera:
+    """Returns a fixed number of numbered frames at a steady rate."""
+
+    def __init__(self, count, interval=0.002):
+        self.count = count
+        self.interval = interval
+        self.index = 0
+
+    def read(self):
+        if self.index >= self.count:
+            return False, None
+        time.sleep(self.interval)
+        frame = np.full((4, 4, 3), self.index, dtype=np.uint8)
+        self.index += 1
+        return True, frame
+
+class TestLatestQueue(unittest.TestCase):
+
+    def test_drops_oldest_when_full(self):
+        """Test that a full queue keeps only the newest items."""
+        q = LatestQueue(maxsize=2)
+        for item in range(5):
+            q.put(item)
+        self.assertEqual(q.dropped, 3)
+        self.assertEqual(q.get(), 3)
+        self.assertEqual(q.get(), 4)
+
+    def test_get_returns_none_after_close(self):
+        """Test that a closed queue releases its consumer."""
+        q = LatestQueue()
+        q.close()
+        self.assertIsNone(q.get())
+
+class TestFramePipeline(unittest.TestCase):
+
+    def test_frames_flow_through_all_stages_in_order(self):
+        """Test that frames are processed, rendered and delivered in capture order."""
+        camera = FakeCamera(50)
+        pipeline = FramePipeline(
+            camera.read,
+            lambda frame: int(frame[0, 0, 0]),
+            lambda frame, result: result,
+        ).start()
+
+        delivered = list(pipeline.frames())
+        pipeline.stop()
+
+        self.assertTrue(delivered)
+        self.assertEqual(delivered, sorted(set(delivered)))
+        stats = pipeline.stats()
+        self.assertEqual(stats["capture"]["frames"], 50)
+        self.assertEqual(stats["output"]["frames"], len(delivered))
+
+    def test_slow_stage_drops_stale_frames(self):
+        """Test that a slow inference stage skips frames instead of queueing them."""
+        camera = FakeCamera(40, interval=0.001)
+
+        def slow_process(frame):
+            time.sleep(0.01)
+            return int(frame[0, 0, 0])
+
+        pipeline = FramePipeline(camera.read, slow_process, lambda frame, result: result).start()
+        delivered = list(pipeline.frames())
+        pipeline.stop()
+
+        self.assertLess(len(delivered), 40)
+        self.assertGreater(pipeline.stats()["inference"]["dropped"], 0)
+
+class TestInferenceScheduler(unittest.TestCase):
+
+    def test_pipelines_share_bounded_workers(self):
+        """Test that several pipelines are all served without exceeding the worker count."""
+        scheduler = InferenceScheduler(workers=2)
+        lock = threading.Lock()
+        running = [0, 0] # current, peak
+
+        def process(frame):
+            with lock:
+                running[0] += 1
+                running[1] = max(running[1], running[0])
+            time.sleep(0.005)
+            with lock:
+                running[0] -= 1
+            return int(frame[0, 0, 0])
+
+        pipelines = [
+            FramePipeline(FakeCamera(30).read, process, lambda frame, result: result,
+                          scheduler=scheduler).start()
+            for _ in range(4)
+        ]
+        results = [list(pipeline.frames()) for pipeline in pipelines]
+        for pipeline in pipelines:
+            pipeline.stop()
+
+        self.assertLessEqual(running[1], 2)
+        for delivered in results:
+            self.assertTrue(delivered)
+            self.assertEqual(delivered, sorted(set(delivered)))
+        self.assertEqual(scheduler.stats()["pipelines"], 0)
+
+    def test_stop_waits_for_inference_in_flight(self):
+        """Test that a stopped pipeline's inference finishes before stop() returns."""
+        scheduler = InferenceScheduler(workers=2)
+        entered, release, finished = threading.Event(), threading.Event(), threading.Event()
+
+        def process(frame):
+            entered.set()
+            release.wait()
+            finished.set()
+            return None
+
+        pipeline = FramePipeline(FakeCamera(100).read, process, lambda frame, result: result,
+                                 scheduler=scheduler).start()
+        self.assertTrue(entered.wait(1.0))
+        threading.Timer(0.05, release.set).start()
+        pipeline.stop()
+        self.assertTrue(finished.is_set())
+
+if __name__ == '__main__':
+    unittest.main()
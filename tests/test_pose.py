@@ -1,8 +1,26 @@
 
+import time
 import unittest
+from types import SimpleNamespace
+
 import cv2
 import numpy as np
-from pose_detector import PoseDetector
+from pose_detector import PoseDetector, TierController
+
+class StubPose:
+    """Stands in for MediaPipe Pose, returning a fixed box of landmarks relative to its input."""
+
+    def __init__(self, box):
+        self.box = box # (x0, y0, x1, y1) in normalized input coordinates
+        self.inputs = []
+
+    def process(self, img_rgb):
+        self.inputs.append(img_rgb.shape)
+        x0, y0, x1, y1 = self.box
+        xs = np.linspace(x0, x1, 33)
+        ys = np.linspace(y0, y1, 33)
+        landmarks = [SimpleNamespace(x=x, y=y, z=0.0, visibility=1.0) for x, y in zip(xs, ys)]
+        return SimpleNamespace(pose_landmarks=SimpleNamespace(landmark=landmarks))
 
 class TestPoseDetector(unittest.TestCase):
 
@@ -20,5 +38,152 @@ class TestPoseDetector(unittest.TestCase):
         # On a blank image, we expect no landmarks to be found
         self.assertEqual(len(landmarks), 0)
 
+    def test_inference_size_downscales_input(self):
+        """Test that the image handed to the model is capped at inference_size."""
+        detector = PoseDetector(inference_size=320)
+        detector.pose = StubPose((0.4, 0.2, 0.6, 0.8))
+        detector.process(np.zeros((1080, 1920, 3), dtype=np.uint8))
+        self.assertEqual(detector.pose.inputs[-1], (180, 320, 3))
+
+    def test_roi_tracking_crops_and_maps_back(self):
+        """Test that the next frame is cropped around the person and landmarks map back to the full frame."""
+        detector = PoseDetector(roi_tracking=True, inference_size=256)
+        detector.pose = StubPose((0.4, 0.2, 0.6, 0.8))
+        frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+
+        detector.process(frame)
+        x, y, side = detector.roi
+        self.assertLess(side, 1080)
+
+        # The stub reports the crop center, which must map back into the crop's frame position
+        detector.pose.box = (0.5, 0.5, 0.5, 0.5)
+        results = detector.process(frame)
+        self.assertEqual(detector.pose.inputs[-1], (256, 256, 3))
+        landmark = results.pose_landmarks.landmark[0]
+        self.assertAlmostEqual(landmark.x * 1920, x + side / 2, places=3)
+        self.assertAlmostEqual(landmark.y * 1080, y + side / 2, places=3)
+
+    def test_inference_interval_extrapolates_between_keyframes(self):
+        """Test that inference runs every k-th frame and landmarks are extrapolated in between."""
+        detector = PoseDetector(inference_interval=3)
+        detector.pose = StubPose((0.1, 0.1, 0.1, 0.1))
+        frame = np.zeros((48, 64, 3), dtype=np.uint8)
+
+        xs = []
+        for i in range(7):
+            # The stub's landmark moves 0.03 per frame, but it is only seen on keyframes
+            detector.pose.box = (0.1 + 0.03 * i,) * 4
+            xs.append(detector.process(frame).pose_landmarks.landmark[0].x)
+
+        self.assertEqual(len(detector.pose.inputs), 3)
+        self.assertEqual(detector.inference_stats()["inferences"], 3)
+        # Frame 5 is extrapolated from the keyframes at frames 1 and 4
+        self.assertAlmostEqual(xs[4], 0.1 + 0.03 * 4, places=5)
+        self.assertAlmostEqual(xs[6], 0.1 + 0.03 * 6, places=5)
+
+    def test_motion_threshold_triggers_inference(self):
+        """Test that adaptive mode skips still frames and infers when the image changes."""
+        detector = PoseDetector(inference_interval=10, motion_threshold=5.0)
+        detector.pose = StubPose((0.4, 0.2, 0.6, 0.8))
+        still = np.zeros((48, 64, 3), dtype=np.uint8)
+        moved = np.full((48, 64, 3), 255, dtype=np.uint8)
+
+        for img in (still, still, still, moved, moved):
+            detector.process(img)
+
+        self.assertEqual(len(detector.pose.inputs), 2)
+        self.assertEqual(detector.inference_stats()["policy"], "motion")
+
+    def test_model_is_loaded_lazily(self):
+        """Test that the pose graph is only built by load() or the first frame."""
+        detector = PoseDetector()
+        self.assertFalse(detector.ready)
+        pose = detector.load()
+        self.assertTrue(detector.ready)
+        self.assertIs(detector.load(), pose)
+
+    def test_static_landmark_tables_match_mediapipe(self):
+        """Test that the static landmark indices and connections match MediaPipe's."""
+        import mediapipe as mp
+        from joints import POSE_CONNECTIONS, POSE_LANDMARKS
+
+        self.assertEqual(POSE_LANDMARKS, {landmark.name: landmark.value for landmark in mp.solutions.pose.PoseLandmark})
+        self.assertEqual(set(POSE_CONNECTIONS), set(mp.solutions.pose.POSE_CONNECTIONS))
+
+    def test_configure_switches_model_on_next_frame(self):
+        """Test that new model settings take effect on the next frame without a restart."""
+        detector = PoseDetector()
+        detector.pose = StubPose((0.4, 0.2, 0.6, 0.8))
+        detector.pose.close = lambda: None
+        detector._build = lambda options: StubPose((0.1, 0.1, 0.9, 0.9))
+        img = np.zeros((48, 64, 3), dtype=np.uint8)
+
+        detector.configure(complexity=2, detection_con=0.7)
+        self.assertEqual(detector.model_stats()["complexity"], 2)
+        self.assertEqual(detector.model_stats()["detection_confidence"], 0.7)
+        detector.process(img)
+        self.assertEqual(detector.pose.box, (0.1, 0.1, 0.9, 0.9))
+
+    def test_tier_timing_excludes_model_loading(self):
+        """Test that the tier controller only sees MediaPipe time, not the first model load."""
+        controller = TierController(target_fps=15, interval=0.05)
+        samples = []
+        update = controller.update
+        controller.update = lambda complexity, inference_ms, available: samples.append(inference_ms) or update(
+            complexity, inference_ms, available)
+        detector = PoseDetector(tier_controller=controller)
+        detector.unavailable_tiers = {0, 2} # Keep measuring the loaded tier
+
+        def slow_build(options):
+            time.sleep(0.3)
+            return StubPose((0.4, 0.2, 0.6, 0.8))
+        detector._build = slow_build
+        img = np.zeros((48, 64, 3), dtype=np.uint8)
+        deadline = time.perf_counter() + 0.5
+        while time.perf_counter() < deadline:
+            detector.process(img)
+
+        self.assertTrue(samples)
+        self.assertLess(max(samples), 50.0)
+
+    def test_configure_rejects_invalid_settings(self):
+        """Test that unknown complexities and out-of-range thresholds are rejected."""
+        detector = PoseDetector()
+        with self.assertRaises(ValueError):
+            detector.configure(complexity=3)
+        with self.assertRaises(ValueError):
+            detector.configure(track_con=1.5)
+        with self.assertRaises(ValueError):
+            detector.configure(detection_con="high")
+        with self.assertRaises(ValueError):
+            detector.configure(auto=True, target_fps="fast")
+        self.assertIsNone(detector.tier_controller)
+        self.assertEqual(detector.model_stats()["complexity"], 1)
+
+class TestTierController(unittest.TestCase):
+
+    def test_steps_down_when_over_budget(self):
+        """Test that a tier slower than the frame budget is replaced by a lighter one."""
+        controller = TierController(target_fps=20)
+        self.assertEqual(controller.update(2, inference_ms=80), 1)
+        self.assertEqual(controller.update(0, inference_ms=80), 0)
+
+    def test_steps_up_with_headroom(self):
+        """Test that a heavier tier is tried when it is estimated to fit the budget."""
+        controller = TierController(target_fps=20, default_ratio=2.0)
+        self.assertEqual(controller.update(0, inference_ms=10), 1)
+        self.assertEqual(controller.update(1, inference_ms=30), 1)
+        self.assertEqual(controller.update(1, inference_ms=10, available=(0, 1)), 1)
+
+    def test_learns_tier_cost_ratio(self):
+        """Test that a tier found too slow is not retried at the same load."""
+        controller = TierController(target_fps=20)
+        controller.update(1, inference_ms=15)
+        self.assertEqual(controller.update(2, inference_ms=60), 1)
+        self.assertAlmostEqual(controller.ratios[1], 4.0)
+        self.assertEqual(controller.update(1, inference_ms=15), 1)
+        # Under lighter load the heavier tier fits again
+        self.assertEqual(controller.update(1, inference_ms=4), 2)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+
+from rom_analytics import asymmetry, joint_summary, new_aggregate, update_aggregate, visit_percentiles
+
+def aggregate(angles, start=0.0):
+    state = new_aggregate()
+    for i, angle in enumerate(angles):
+        update_aggregate(state, start + i, angle)
+    return state
+
+class TestRomAnalytics(unittest.TestCase):
+
+    def test_joint_summary(self):
+        """Test min, max, ROM and time to peak of one joint."""
+        summary = joint_summary(aggregate([30.0, 80.0, 120.0, 90.0], start=10.0))
+        self.assertEqual(summary["samples"], 4)
+        self.assertEqual((summary["min"], summary["max"], summary["rom"]), (30.0, 120.0, 90.0))
+        self.assertEqual(summary["time_to_peak"], 2.0)
+
+    def test_counts_repetitions(self):
+        """Test that each rise and fall counts once and small wobbles are ignored."""
+        angles = [10, 60, 120, 115, 118, 40, 12, 90, 130, 20, 25, 15]
+        self.assertEqual(joint_summary(aggregate(angles))["repetitions"], 2)
+        self.assertEqual(joint_summary(aggregate([10, 20, 15, 25]))["repetitions"], 0)
+
+    def test_asymmetry_of_left_right_pairs(self):
+        """Test that the ROM difference of left/right joints is reported in percent."""
+        joints = {"left_knee": {"rom": 100.0}, "right_knee": {"rom": 80.0}, "left_elbow": {"rom": 90.0}}
+        pairs = asymmetry(joints)
+        self.assertEqual(list(pairs), ["knee"])
+        self.assertAlmostEqual(pairs["knee"]["asymmetry_pct"], 20.0)
+
+    def test_percentiles_across_visits(self):
+        """Test percentiles of ROM and max angle over a patient's sessions."""
+        sessions = [{"joints": {"left_knee": {"rom": rom, "max": rom + 10.0}}} for rom in (60.0, 80.0, 100.0)]
+        result = visit_percentiles(sessions, (0, 50, 100))
+        self.assertEqual(result["left_knee"]["visits"], 3)
+        self.assertEqual(result["left_knee"]["rom"], {"p0": 60.0, "p50": 80.0, "p100": 100.0})
+        self.assertEqual(result["left_knee"]["max"]["p50"], 90.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+
+import numpy as np
+from sessions import AssessmentSession, SessionManager
+
+JOINTS = ("left_elbow", "right_elbow", "left_knee")
+
+class TestAssessmentSession(unittest.TestCase):
+
+    def test_update_tracks_max_min_of_active_valid_joints(self):
+        """Test that only valid angles of active joints reach the max/min and ROM."""
+        session = AssessmentSession("s1", "default", joints=JOINTS, active_joints=["left_elbow", "left_knee"])
+        session.update(np.array([30.0, 40.0, 10.0]), np.array([True, True, False]))
+        session.update(np.array([90.0, 80.0, 70.0]), np.array([True, True, True]))
+
+        self.assertEqual(session.angle_dict(session.max_angles), {"left_elbow": 90.0, "left_knee": 70.0})
+        self.assertEqual(session.angle_dict(session.min_angles), {"left_elbow": 30.0, "left_knee": 70.0})
+        self.assertEqual(session.angle_dict(session.rom), {"left_elbow": 60.0, "left_knee": 0.0})
+
+    def test_update_keeps_float32_arrays_in_place(self):
+        """Test that float64 angles are folded into the same float32 max/min arrays."""
+        session = AssessmentSession("s1", "default", joints=JOINTS)
+        max_angles = session.max_angles
+        session.update(np.array([30.0, 40.0, 10.0]), np.ones(3, dtype=bool))
+        self.assertIs(session.max_angles, max_angles)
+        self.assertEqual(session.max_angles.dtype, np.float32)
+        self.assertEqual(session.min_angles.dtype, np.float32)
+
+    def test_reset_clears_max_angles(self):
+        """Test that a reset session starts measuring from scratch."""
+        session = AssessmentSession("s1", "default", joints=JOINTS)
+        session.update(np.array([30.0, 40.0, 10.0]), np.ones(3, dtype=bool))
+        session.reset()
+        self.assertEqual(session.summary()["max_angles"], {})
+
+class TestSessionManager(unittest.TestCase):
+
+    def test_sessions_are_isolated(self):
+        """Test that two sessions keep their own active joints and maxima."""
+        manager = SessionManager()
+        first = manager.create("default", active_joints=["left_elbow"])
+        second = manager.create("default", active_joints=["right_elbow"])
+        self.assertIs(manager.get(first.session_id), first)
+
+        first.update(np.full(len(first.joints), 45.0), np.ones(len(first.joints), dtype=bool))
+        self.assertEqual(first.angle_dict(first.max_angles), {"left_elbow": 45.0})
+        self.assertEqual(second.angle_dict(second.max_angles), {})
+
+    def test_idle_sessions_are_evicted(self):
+        """Test that idle sessions are closed while pinned and active ones are kept."""
+        closed = []
+        manager = SessionManager(idle_timeout=10, on_close=closed.append)
+        pinned = manager.create("default", session_id="default", pinned=True)
+        idle = manager.create("default")
+        active = manager.create("default")
+        active.last_seen = idle.last_seen + 20
+        pinned.last_seen = idle.last_seen - 100
+
+        evicted = manager.evict_idle(now=idle.last_seen + 15)
+
+        self.assertEqual(evicted, 1)
+        self.assertEqual(closed, [idle])
+        self.assertIsNone(manager.get(idle.session_id))
+        self.assertIs(manager.get(active.session_id), active)
+        self.assertIs(manager.get(pinned.session_id), pinned)
+
+    def test_close_returns_session_once(self):
+        """Test that closing a session removes it."""
+        manager = SessionManager()
+        session = manager.create("default")
+        self.assertIs(manager.close(session.session_id), session)
+        self.assertIsNone(manager.close(session.session_id))
+        self.assertEqual(len(manager), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import queue
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+from measurement_store import MeasurementStore
+from snapshot_writer import SnapshotWriter
+
+class TestSnapshotWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = MeasurementStore(os.path.join(self.tmp.name, "m.db"), joints=("left_knee",))
+        self.image_dir = os.path.join(self.tmp.name, "images")
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_capture_is_written_in_background(self):
+        """Test that a submitted capture saves its image and measurement row."""
+        writer = SnapshotWriter(self.image_dir, self.store).start()
+        frame = np.zeros((48, 64, 3), dtype=np.uint8)
+        frame.flags.writeable = False
+
+        capture_id = writer.submit(frame, {"left_knee": 42.0}, {"left_knee": 50.0}, patient_id="p1")
+        writer.stop()
+
+        self.assertEqual(writer.status(capture_id), "saved")
+        rows = self.store.query_rows(patient_id="p1")
+        self.assertEqual(rows[0]["left_knee_angle"], 42.0)
+        self.assertTrue(os.path.exists(os.path.join(self.image_dir, rows[0]["image_file"])))
+
+    def test_labels_are_drawn_on_saved_image(self):
+        """Test that capture labels are burnt into the saved image but not into the shared frame."""
+        writer = SnapshotWriter(self.image_dir, self.store).start()
+        frame = np.zeros((120, 400, 3), dtype=np.uint8)
+        frame.flags.writeable = False
+
+        writer.submit(frame, {"left_knee": 42.0}, {}, patient_id="p2",
+                      labels=[("Left Knee: ", 42.0, (10, 50), (255, 255, 255))])
+        writer.stop()
+
+        saved = cv2.imread(os.path.join(self.image_dir, self.store.query_rows(patient_id="p2")[0]["image_file"]))
+        self.assertGreater(saved.max(), 128)
+        self.assertFalse(frame.any())
+
+    def test_submit_raises_when_queue_is_full(self):
+        """Test that captures beyond max_pending are rejected instead of blocking."""
+        writer = SnapshotWriter(self.image_dir, self.store, max_pending=1)
+        frame = np.zeros((4, 4, 3), dtype=np.uint8)
+        writer.submit(frame, {}, {})
+        with self.assertRaises(queue.Full):
+            writer.submit(frame, {}, {})
+        self.assertEqual(len(writer._statuses), 1)
+
+    def test_fast_write_is_not_reported_pending(self):
+        """Test that a capture saved before submit() returns keeps its saved status."""
+        writer = SnapshotWriter(self.image_dir, self.store)
+        # Write synchronously inside the queue, as if the writer thread won the race
+        def put_and_write(job):
+            writer._write(job)
+            writer._set_status(job["capture_id"], "saved")
+        writer._queue.put_nowait = put_and_write
+        os.makedirs(self.image_dir, exist_ok=True)
+
+        capture_id = writer.submit(np.zeros((4, 4, 3), dtype=np.uint8), {"left_knee": 1.0}, {})
+        self.assertEqual(writer.status(capture_id), "saved")
+
+if __name__ == '__main__':
+    unittest.main()